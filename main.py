@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import warnings
 import sys
@@ -13,6 +14,9 @@ warnings.filterwarnings("ignore")
 QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
 
 if __name__ == "__main__":
+    # Needed by the worker processes (e.g. for DVH calculation) of frozen
+    # executables on spawn-based platforms
+    multiprocessing.freeze_support()
 
     # On some configurations error traceback is not being displayed
     #     when the program crashes. This is a workaround.
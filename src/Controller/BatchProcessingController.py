@@ -41,6 +41,7 @@ class BatchProcessingController:
         self.processes = []
         self.dicom_structure = None
         self.suv2roi_weights = None
+        self.suv2roi_levels = None
         self.name_cleaning_options = None
         self.patient_files_loaded = False
         self.progress_window = ProgressWindow(None)
@@ -79,6 +80,14 @@ class BatchProcessingController:
         """
         self.suv2roi_weights = suv2roi_weights
 
+    def set_suv2roi_levels(self, suv2roi_levels):
+        """
+        Function used to set suv2roi_levels.
+        :param suv2roi_levels: List of SUV levels to generate ROIs for,
+                               empty or None for every whole SUV level.
+        """
+        self.suv2roi_levels = suv2roi_levels
+
     def start_processing(self):
         """
         Starts the batch process.
@@ -317,7 +326,8 @@ class BatchProcessingController:
         process = BatchProcessSUV2ROI(progress_callback,
                                       interrupt_flag,
                                       cur_patient_files,
-                                      patient_weight)
+                                      patient_weight,
+                                      self.suv2roi_levels or None)
         success = process.start()
 
         # Add rtss to patient in case it is needed in future
@@ -1,12 +1,9 @@
-from shutil import which
-
 from PySide6 import QtCore, QtWidgets, QtGui
 from PySide6.QtWidgets import QMessageBox
 
 from src.Controller.PathHandler import resource_path
 from src.Model.InitialModel import create_initial_model
 from src.Model.MovingDictContainer import MovingDictContainer
-from src.Model.MovingModel import read_images_for_fusion
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.View.BatchProcessingWindow import UIBatchProcessingWindow
 from src.View.FirstTimeWelcomeWindow import UIFirstTimeWelcomeWindow
@@ -201,36 +198,26 @@ class MainWindow(QtWidgets.QMainWindow, UIMainWindow):
     def update_image_fusion_ui(self):
         mvd = MovingDictContainer()
         if not mvd.is_empty():
-            read_images_for_fusion()
             self.create_image_fusion_tab()
 
     def pyradiomics_handler(self, path, filepaths, hashed_path):
         """
         Sends signal to initiate pyradiomics analysis
         """
-        if which('plastimatch') is not None:
-            if hashed_path == '':
-                confirm_pyradi = QMessageBox.information(
-                    self, "Confirmation",
-                    "Are you sure you want to perform pyradiomics? Once "
-                    "started the process cannot be terminated until it "
-                    "finishes.",
-                    QMessageBox.Yes,
-                    QMessageBox.No)
-                if confirm_pyradi == QMessageBox.Yes:
-                    self.run_pyradiomics.emit(path, filepaths, hashed_path)
-                if confirm_pyradi == QMessageBox.No:
-                    pass
-            else:
+        if hashed_path == '':
+            confirm_pyradi = QMessageBox.information(
+                self, "Confirmation",
+                "Are you sure you want to perform pyradiomics? Once "
+                "started the process cannot be terminated until it "
+                "finishes.",
+                QMessageBox.Yes,
+                QMessageBox.No)
+            if confirm_pyradi == QMessageBox.Yes:
                 self.run_pyradiomics.emit(path, filepaths, hashed_path)
+            if confirm_pyradi == QMessageBox.No:
+                pass
         else:
-            exe_not_found = QMessageBox.information(
-                self, "Error",
-                "Plastimatch not installed. Please install Plastimatch "
-                "(https://sourceforge.net/projects/plastimatch/) to carry out "
-                "pyradiomics analysis. If using Windows, please ensure that "
-                "your system's PATH variable inlcudes the directory where "
-                "Plastimatch's executable is installed.")
+            self.run_pyradiomics.emit(path, filepaths, hashed_path)
 
     def cleanup(self):
         patient_dict_container = PatientDictContainer()
@@ -340,10 +327,10 @@ class PyradiProgressBar(QtWidgets.QWidget):
         :param text:    To display what ROI currently being processed
         """
 
-        # When generating the nrrd file, the percentage starts at 0
+        # When generating the image volume, the percentage starts at 0
         # and reaches 25
         if value == 0:
-            self.label.setText("Generating nrrd file")
+            self.label.setText("Generating image volume")
         # The segmentation masks are generated between the range 25 and
         # 50
         elif value == 25:
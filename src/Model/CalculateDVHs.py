@@ -1,12 +1,10 @@
-import multiprocessing
-
 from dicompylercore.dvh import DVH
 import numpy as np
 import pandas as pd
-from dicompylercore import dvhcalc
 from pydicom.dataset import Dataset
 from pydicom.sequence import Sequence
 from pydicom.tag import Tag
+from src.Model import NativeDVH
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
@@ -36,26 +34,9 @@ def get_roi_info(ds_rtss):
     return dict_roi
 
 
-def multi_get_dvhs(rtss, dose, roi, queue, dose_limit=None):
-    """
-    Calculation of DVHs of a single roi using MultiProcessing.
-
-    :param rtss: Dataset of RTSS
-    :param dose: Dataset of RTDOSE
-    :param roi: ROINumber
-    :param queue: The queue for multiprocessing tasks
-    :param dose_limit:
-    """
-    dvh = {}
-    # Calculate dvh for the roi under dose_limit
-    dvh[roi] = dvhcalc.get_dvh(rtss, dose, roi, dose_limit)
-    # put the result dvh into the multiprocessing queue
-    queue.put(dvh)
-
-
 def calc_dvhs(rtss, rtdose, dict_roi, dose_limit=None):
     """
-    Calculate dvhs of all rois using multiprocesing.
+    Calculate dvhs of all rois using a pool of worker processes.
 
     :param rtss: Dataset of RTSS
     :param rtdose: Dataset of RTDOSE
@@ -64,37 +45,8 @@ def calc_dvhs(rtss, rtdose, dict_roi, dose_limit=None):
     :param dose_limit: Limit of dose
     :return: A dictionary of DVH {ROINumber: DVH}
     """
-    # multiprocessing
-    queue = multiprocessing.Queue()
-    # List of processes
-    processes = []
-
-    # dvh dictionary
-    dict_dvh = {}
-
-    # List of all the rois within current data
-    roi_list = []
-    for key in dict_roi:
-        roi_list.append(key)
-
-    # Allocate tasks and add them into processes list
-    for i in range(len(roi_list)):
-        p = multiprocessing.Process(
-            target=multi_get_dvhs, args=(rtss, rtdose, roi_list[i], queue))
-        processes.append(p)
-        p.start()
-
-    # Get the results of dvh from every processes in the queue
-    # And update the dictionary of dvhs
-    for proc in processes:
-        dvh = queue.get()
-        dict_dvh.update(dvh)
-
-    # join all the prcesses
-    for proc in processes:
-        proc.join()
-
-    return dict_dvh
+    return NativeDVH.multi_calc_dvhs(rtss, rtdose, dict_roi, {},
+                                     dose_limit=dose_limit)
 
 
 def converge_to_zero_dvh(dict_dvh):
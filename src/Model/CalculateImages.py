@@ -1,41 +1,101 @@
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 import pydicom
 from PySide6 import QtCore, QtGui
+from skimage.color import hsv2rgb
 
 import src.constants as constant
 
 
+# Data type of the image volume shared by the pixmaps, 3D view and the
+# image slice datasets
+PIXEL_VOLUME_DTYPE = np.float32
+
+
 def convert_raw_data(ds, rescaled=True, is_ct=False):
     """
-    Convert the raw pixel data to readable pixel data in every image dataset
+    Convert the raw pixel data to readable pixel data in every image dataset.
+    The pixel data of every slice is decoded once into a single
+    preallocated (slices, rows, columns) volume, and the pixel array of
+    each image dataset is replaced by a view of its slice in the volume.
     :param ds: A dictionary of datasets of all the DICOM files of the patient
     :param rescaled: A boolean to determine if the data has already
     been rescaled
     :param is_ct: Boolean to determine if data is CT for rescaling
-    :return: np_pixels, a list of pixel arrays of all slices of the patient
+    :return: volume, a 3D numpy array of the pixels of all slices of the
+        patient
     """
-    non_img_list = ['rtss', 'rtdose', 'rtplan', 'rtimage']
-    np_pixels = []
+    image_keys = get_image_keys(ds)
+
+    # The pixel arrays of the datasets are already views of a volume
+    volume = get_shared_volume(ds, image_keys)
+    if volume is not None and rescaled:
+        return volume
+
+    first_slice = ds[image_keys[0]]
+    first_slice.convert_pixel_data()
+    volume = np.empty((len(image_keys),) + first_slice._pixel_array.shape,
+                      dtype=PIXEL_VOLUME_DTYPE)
 
     # Do the conversion to every slice (except RTSS, RTDOSE, RTPLAN)
+    for i, key in enumerate(image_keys):
+        # dataset of current slice
+        np_tmp = ds[key]
+        np_tmp.convert_pixel_data()
+        if not rescaled:
+            # Perform the rescale
+            slope, intercept = get_rescale(np_tmp, is_ct)
+            volume[i] = np_tmp._pixel_array * slope + intercept
+        else:
+            volume[i] = np_tmp._pixel_array
+        # Store the slice as a view of the volume
+        np_tmp._pixel_array = volume[i]
+
+    return volume
+
+
+def get_image_keys(ds):
+    """
+    Get the keys of the image slice datasets, in slice order.
+    :param ds: A dictionary of datasets of all the DICOM files of the patient
+    :return: List of keys of the image datasets
+    """
+    non_img_list = ['rtss', 'rtdose', 'rtplan', 'rtimage']
+    image_keys = []
     for key in ds:
         if key not in non_img_list:
             if isinstance(key, str) and key[0:3] == 'sr-':
                 continue
-            else:
-                # dataset of current slice
-                np_tmp = ds[key]
-                np_tmp.convert_pixel_data()
-                if not rescaled:
-                    # Perform the rescale
-                    data_arr = np_tmp._pixel_array
-                    slope, intercept = get_rescale(np_tmp, is_ct)
-                    data_arr = (data_arr * slope + intercept)
-                    # Store the rescaled data
-                    ds[key]._pixel_array = data_arr
-                np_pixels.append(np_tmp._pixel_array)
-    return np_pixels
+            image_keys.append(key)
+    return image_keys
+
+
+def get_shared_volume(ds, image_keys):
+    """
+    Get the volume that the pixel arrays of the image datasets are views
+    of, if convert_raw_data has already been called on the datasets.
+    :param ds: A dictionary of datasets of all the DICOM files of the patient
+    :param image_keys: List of keys of the image datasets, in slice order
+    :return: The 3D numpy array shared by the datasets, or None
+    """
+    first_array = getattr(ds[image_keys[0]], "_pixel_array", None)
+    if first_array is None:
+        return None
+
+    volume = first_array.base
+    if volume is None or volume.ndim != 3 \
+            or volume.shape[0] != len(image_keys):
+        return None
+
+    for i, key in enumerate(image_keys):
+        pixel_array = getattr(ds[key], "_pixel_array", None)
+        if pixel_array is None or pixel_array.base is not volume \
+                or pixel_array.ctypes.data != volume[i].ctypes.data:
+            return None
+
+    return volume
 
 
 def get_rescale(np_tmp, is_ct):
@@ -181,26 +241,247 @@ def convert_pt_to_heatmap(np_pixels):
     return qimage
 
 
+# Axis of the (slices, rows, columns) array that each view slices along
+VIEW_AXES = {"axial": 0, "coronal": 1, "sagittal": 2}
+
+# Hue of the pixels of a fused image where the fixed image is brighter,
+# the hue where the moving image is brighter is half a turn further
+FUSION_COLOR_ROTATION = 0.35
+
+
+class LazyPixmaps:
+    """
+    Drop-in replacement for a dictionary of slice pixmaps. Pixmaps are
+    rendered from the pixel array only when a slice is requested, and
+    the most recently requested slices are kept in a bounded LRU cache.
+    Supports len(), indexing by slice number and iteration over the
+    slice numbers, as the previous dictionaries did.
+    """
+
+    def __init__(self, pixel_array_3d, view, window, level, width, height,
+                 fusion=False, color=None, cache_size=None):
+        """
+        :param pixel_array_3d: 3D numpy array (slices, rows, columns)
+        :param view: One of "axial", "coronal" or "sagittal"
+        :param window: Window width of windowing function
+        :param level: Level value of windowing function
+        :param width: Pixel width of the rendered pixmaps
+        :param height: Pixel height of the rendered pixmaps
+        :param fusion: Boolean to set scaling for overlayed images
+        :param color: String for conversion of pixels to specified color map
+        :param cache_size: Maximum number of pixmaps kept in memory
+        """
+        self.pixel_array_3d = pixel_array_3d
+        self.view = view
+        self.window = window
+        self.level = level
+        self.width = width
+        self.height = height
+        self.fusion = fusion
+        self.color = color
+        if cache_size is None:
+            cache_size = constant.PIXMAP_CACHE_SIZE
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def __len__(self):
+        return self.pixel_array_3d.shape[VIEW_AXES[self.view]]
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __contains__(self, key):
+        return isinstance(key, (int, np.integer)) and 0 <= key < len(self)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        pixmap = self.render(key)
+        self.cache[key] = pixmap
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return pixmap
+
+    def keys(self):
+        return range(len(self))
+
+    def render(self, key):
+        """
+        :param key: Slice number within this view
+        :return: QPixmap of the slice
+        """
+        return scaled_pixmap(self.get_slice(key), self.window, self.level,
+                             self.width, self.height, self.fusion, self.color)
+
+    def get_slice(self, key):
+        """
+        :param key: Slice number within this view
+        :return: 2D numpy array of the pixels of the slice
+        """
+        if self.view == "axial":
+            return self.pixel_array_3d[key, :, :]
+        if self.view == "coronal":
+            return self.pixel_array_3d[:, key, :]
+        return self.pixel_array_3d[:, :, key]
+
+    def set_window(self, window, level):
+        """
+        Change the window and level of the pixmaps. Previously rendered
+        pixmaps are discarded and slices are rendered again on demand.
+        :param window: Window width of windowing function
+        :param level: Level value of windowing function
+        """
+        self.window = window
+        self.level = level
+        self.cache.clear()
+
+
+class FusedVolume:
+    """
+    The fixed image and the registered moving image of an image fusion,
+    shared by the fused pixmaps of the three views. Both volumes are
+    windowed once for each window and level, and the color mix of a slice
+    is made from views of the windowed volumes when it is rendered.
+    """
+
+    def __init__(self, fixed_array, moving_array, window, level):
+        """
+        :param fixed_array: 3D numpy array (slices, rows, columns) of the
+            fixed image
+        :param moving_array: 3D numpy array of the moving image, resampled
+            onto the grid of the fixed image
+        :param window: Window width of windowing function
+        :param level: Level value of windowing function
+        """
+        self.fixed_array = fixed_array
+        self.moving_array = moving_array
+        self.shape = fixed_array.shape
+        self.windowing = None
+        self.fixed_windowed = None
+        self.moving_windowed = None
+        self.set_window(window, level)
+
+    def set_window(self, window, level):
+        """
+        Window both volumes, unless they are already windowed with the same
+        window and level.
+        :param window: Window width of windowing function
+        :param level: Level value of windowing function
+        """
+        windowing = (int(level - constant.CT_RESCALE_INTERCEPT), int(window))
+        if windowing == self.windowing:
+            return
+        self.windowing = windowing
+        self.fixed_windowed = window_volume(self.fixed_array, *windowing)
+        self.moving_windowed = window_volume(self.moving_array, *windowing)
+
+    def get_color_slice(self, view, key):
+        """
+        :param view: One of "axial", "coronal" or "sagittal"
+        :param key: Slice number within this view
+        :return: (rows, columns, 3) uint8 numpy array of the RGB color mix
+            of the slice
+        """
+        index = [slice(None)] * 3
+        index[VIEW_AXES[view]] = key
+        index = tuple(index)
+        return color_mix(self.fixed_windowed[index],
+                         self.moving_windowed[index])
+
+
+def window_volume(volume, lower, width):
+    """
+    :param volume: Numpy array of pixel values
+    :param lower: Lowest pixel value of the window
+    :param width: Width of the window. A width of 0 or less thresholds the
+        pixel values at the lowest value of the window.
+    :return: float32 numpy array of the pixel values scaled from the
+        window to between 0 and 1
+    """
+    windowed = np.subtract(volume, lower, dtype=np.float32)
+    windowed /= max(width, 1)
+    np.clip(windowed, 0, 1, out=windowed)
+    return windowed
+
+
+def color_mix(fixed_slice, moving_slice):
+    """
+    Mix two windowed slices into one color slice. Pixels are green where
+    the fixed image is brighter and purple where the moving image is, with
+    a saturation of the difference and a brightness of the mean.
+    :param fixed_slice: 2D numpy array of windowed fixed image pixels
+    :param moving_slice: 2D numpy array of windowed moving image pixels
+    :return: (rows, columns, 3) uint8 numpy array of RGB pixels
+    """
+    hsv = np.empty(fixed_slice.shape + (3,), dtype=np.float32)
+    hsv[..., 0] = np.where(fixed_slice > moving_slice,
+                           FUSION_COLOR_ROTATION, 0.5 + FUSION_COLOR_ROTATION)
+    np.abs(fixed_slice - moving_slice, out=hsv[..., 1])
+    np.add(fixed_slice, moving_slice, out=hsv[..., 2])
+    hsv[..., 2] /= 2
+    return np.ascontiguousarray(
+        (255 * hsv2rgb(hsv)).astype(np.uint8))
+
+
+class FusedPixmaps(LazyPixmaps):
+    """
+    Lazily rendered pixmaps of one view of an image fusion, indexed by
+    slice number like LazyPixmaps.
+    """
+
+    def __init__(self, fused_volume, view, window, level, cache_size=None):
+        """
+        :param fused_volume: FusedVolume shared by the views
+        :param view: One of "axial", "coronal" or "sagittal"
+        :param window: Window width of windowing function
+        :param level: Level value of windowing function
+        :param cache_size: Maximum number of pixmaps kept in memory
+        """
+        super().__init__(None, view, window, level,
+                         constant.DEFAULT_WINDOW_SIZE,
+                         constant.DEFAULT_WINDOW_SIZE, True,
+                         cache_size=cache_size)
+        self.fused_volume = fused_volume
+
+    def __len__(self):
+        return self.fused_volume.shape[VIEW_AXES[self.view]]
+
+    def render(self, key):
+        rgb = self.fused_volume.get_color_slice(self.view, key)
+        qimage = QtGui.QImage(rgb, rgb.shape[1], rgb.shape[0],
+                              rgb.shape[1] * 3, QtGui.QImage.Format_RGB888)
+        return QtGui.QPixmap(qimage).scaled(
+            self.width, self.height, QtCore.Qt.IgnoreAspectRatio,
+            QtCore.Qt.SmoothTransformation)
+
+    def set_window(self, window, level):
+        self.fused_volume.set_window(window, level)
+        super().set_window(window, level)
+
+
 def get_pixmaps(pixel_array, window, level, pixmap_aspect,
                 fusion=False, color=None):
     """
-    Get a dictionary of pixmaps.
+    Get the pixmaps of the three views. The pixmaps are rendered lazily,
+    only when a slice is first displayed.
 
-    :param pixel_array: A list of converted pixel arrays
+    :param pixel_array: 3D numpy array of the pixels of all slices, as
+        returned by convert_raw_data
     :param window: Window width of windowing function
     :param level: Level value of windowing function
     :param pixmap_aspect: Scaling ratio for axial, coronal, and sagittal pixmaps
     :param fusion: Boolean to determine if pixmaps will be fused
     :param color: String for conversion of pixels to specified color map
-    :return: dict_pixmaps, a dictionary of all pixmaps within the patient.
+    :return: Tuple of LazyPixmaps objects for the axial, coronal and
+        sagittal views, each indexed by slice number.
     """
-    # Convert pixel array to numpy 3d array
-    pixel_array_3d = np.array(pixel_array)
-
-    # Pixmaps dictionaries of 3 views
-    dict_pixmaps_axial = {}
-    dict_pixmaps_coronal = {}
-    dict_pixmaps_sagittal = {}
+    # The pixmaps of all three views share the volume without copying it
+    pixel_array_3d = np.asarray(pixel_array)
 
     axial_width, axial_height = scaled_size(
         pixel_array_3d.shape[1] * pixmap_aspect["axial"],
@@ -213,34 +494,15 @@ def get_pixmaps(pixel_array, window, level, pixmap_aspect,
         pixel_array_3d.shape[2] * pixmap_aspect["sagittal"],
         pixel_array_3d.shape[0])
 
-    for i in range(pixel_array_3d.shape[0]):
-        dict_pixmaps_axial[i] = scaled_pixmap(
-            pixel_array_3d[i, :, :],
-            window,
-            level,
-            axial_width,
-            axial_height,
-            fusion,
-            color)
-
-    for i in range(pixel_array_3d.shape[1]):
-        dict_pixmaps_coronal[i] = scaled_pixmap(
-            pixel_array_3d[:, i, :],
-            window,
-            level,
-            coronal_width,
-            coronal_height,
-            fusion,
-            color)
-
-        dict_pixmaps_sagittal[i] = scaled_pixmap(
-            pixel_array_3d[:, :, i],
-            window,
-            level,
-            sagittal_width,
-            sagittal_height,
-            fusion,
-            color)
+    dict_pixmaps_axial = LazyPixmaps(
+        pixel_array_3d, "axial", window, level, axial_width, axial_height,
+        fusion, color)
+    dict_pixmaps_coronal = LazyPixmaps(
+        pixel_array_3d, "coronal", window, level, coronal_width,
+        coronal_height, fusion, color)
+    dict_pixmaps_sagittal = LazyPixmaps(
+        pixel_array_3d, "sagittal", window, level, sagittal_width,
+        sagittal_height, fusion, color)
 
     return dict_pixmaps_axial, dict_pixmaps_coronal, dict_pixmaps_sagittal
 
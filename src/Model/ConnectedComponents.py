@@ -0,0 +1,78 @@
+""" Segments dose and SUV volumes into connected components in 3D """
+
+import math
+
+import numpy as np
+from scipy import ndimage
+from skimage import measure
+
+# Voxels which share a face, an edge or a corner are connected, so that
+# components which touch diagonally within a slice are never split, as
+# they would otherwise share a contour.
+CONNECTIVITY = np.ones((3, 3, 3), dtype=bool)
+
+
+def get_voxel_volume(pixel_spacing, slice_positions):
+    """
+    :param pixel_spacing: PixelSpacing (in mm) of the slices.
+    :param slice_positions: Positions (in mm) of the slices.
+    :return: Volume of a voxel in cm^3. The slice thickness is the median
+        distance between slices, or 1 mm if there is only one slice.
+    """
+    slice_positions = np.sort(np.asarray(slice_positions, dtype=float))
+    thickness = float(np.median(np.diff(slice_positions))) \
+        if len(slice_positions) > 1 else 1.0
+    return float(pixel_spacing[0]) * float(pixel_spacing[1]) \
+        * abs(thickness) / 1000
+
+
+def get_min_voxels(min_volume, voxel_volume):
+    """
+    :param min_volume: Smallest volume of a component in cm^3.
+    :param voxel_volume: Volume of a voxel in cm^3.
+    :return: Smallest number of voxels of a component.
+    """
+    if not voxel_volume:
+        return 1
+    return max(1, math.ceil(min_volume / voxel_volume))
+
+
+def label_components(volume, level, min_voxels=1):
+    """
+    Threshold a volume and keep the connected components which are large
+    enough.
+    :param volume: 3D numpy array (slices, rows, columns).
+    :param level: Threshold of the volume. Voxels above the threshold are
+        inside components.
+    :param min_voxels: Smallest number of voxels of a kept component.
+    :return: 3D boolean numpy array of the voxels of the kept components.
+    """
+    labels, count = ndimage.label(volume > level, structure=CONNECTIVITY)
+    if not count:
+        return np.zeros(volume.shape, dtype=bool)
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    kept = sizes >= min_voxels
+    kept[0] = False
+    return kept[labels]
+
+
+def calc_component_contours(volume, level, min_voxels=1):
+    """
+    Contour the connected components of a volume above a threshold,
+    leaving out the components smaller than min_voxels. The contours of
+    the kept components are the same as those of contouring each slice
+    on its own.
+    :param volume: 3D numpy array (slices, rows, columns).
+    :param level: Threshold of the volume.
+    :param min_voxels: Smallest number of voxels of a kept component.
+    :return: List with a list of contours for each slice, where a contour
+        is an (N, 2) numpy array of (row, column) points.
+    """
+    kept = label_components(volume, level, min_voxels)
+    # Voxels of dropped components are moved below the threshold
+    dropped = (volume > level) & ~kept
+    slice_contours = [[] for _ in range(len(volume))]
+    for slice_id in np.flatnonzero(kept.any(axis=(1, 2))):
+        plane = np.where(dropped[slice_id], level - 1, volume[slice_id])
+        slice_contours[slice_id] = measure.find_contours(plane, level)
+    return slice_contours
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+from pathlib import Path
+
+from pydicom import Dataset
+
+from src.Model.Configuration import set_up_hidden_dir
+
+
+class DICOMDirectoryIndex:
+    """
+    A persistent index of the files found when scanning directories for
+    DICOM files. For every file it stores the size and modification time
+    of the file, and the header tags needed to build a DICOMStructure
+    (or nothing, if the file is not a DICOM file). The index is stored
+    in an SQLite database in the hidden directory, next to the
+    configuration database, so that a rescan of a directory only needs to
+    read the files that are new or have changed since the last scan.
+    Example usage:
+    index = DICOMDirectoryIndex()
+    entries = index.get_entries(path)
+    """
+
+    def __init__(self, db_file='DICOMIndex.db'):
+        set_up_hidden_dir()
+        self.db_file_path = Path(
+            os.environ['USER_ONKODICOM_HIDDEN']).joinpath(db_file)
+        self.connection = sqlite3.connect(self.db_file_path)
+        self.set_up_index_db()
+
+    def set_up_index_db(self):
+        """
+        Create the FILES table inside the SQLite database
+        """
+        self.connection.execute("""
+                    CREATE TABLE IF NOT EXISTS FILES (
+                        path TEXT PRIMARY KEY,
+                        size INTEGER,
+                        mtime INTEGER,
+                        header TEXT
+                    );
+                """)
+        self.connection.commit()
+
+    def get_entries(self, path):
+        """
+        Get the indexed files inside the given directory and its
+        subdirectories.
+        :param path: The root directory of the files.
+        :return: Dictionary where the keys are file paths and the values
+            are tuples (size, mtime, header). header is the JSON of the
+            header tags of the file, or None if the file is not a DICOM
+            file.
+        """
+        prefix = str(path).rstrip(os.sep) + os.sep
+        cursor = self.connection.execute(
+            "SELECT path, size, mtime, header FROM FILES "
+            "WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+        return {row[0]: (row[1], row[2], row[3]) for row in cursor}
+
+    def update_entries(self, entries):
+        """
+        Add or replace files in the index.
+        :param entries: List of tuples (path, size, mtime, header).
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO FILES (path, size, mtime, header) "
+            "VALUES (?, ?, ?, ?)", entries)
+        self.connection.commit()
+
+    def remove_entries(self, paths):
+        """
+        Remove files from the index.
+        :param paths: Iterable of file paths.
+        """
+        self.connection.executemany(
+            "DELETE FROM FILES WHERE path = ?", [(path,) for path in paths])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def get_file_stat(file_path):
+    """
+    :param file_path: Path of a file.
+    :return: Tuple (size, mtime) of the file, with the modification time
+        in nanoseconds, or None if the file could not be accessed.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def header_to_json(dicom_file):
+    """
+    :param dicom_file: Header-only PyDicom dataset, or None.
+    :return: JSON string of the dataset, or None.
+    """
+    if dicom_file is None:
+        return None
+    return dicom_file.to_json()
+
+
+def header_from_json(header):
+    """
+    :param header: JSON string of a header-only dataset, or None.
+    :return: PyDicom dataset, or None.
+    """
+    if header is None:
+        return None
+    return Dataset.from_json(header)
@@ -1,23 +1,56 @@
+import functools
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 from pydicom import dcmread
 from pydicom.errors import InvalidDicomError
 
+from src.Model.DICOMDirectoryIndex import DICOMDirectoryIndex, \
+    get_file_stat, header_from_json, header_to_json
+
 from src.Model.DICOMStructure import DICOMStructure, Patient, Study, \
     Series, Image
 
 
-def get_dicom_structure(path, interrupt_flag, progress_callback):
+# The only tags read from each file when scanning a directory in header
+# only mode. These are all the tags used to build the DICOMStructure.
+STRUCTURE_TAGS = [
+    "PatientID", "PatientName", "StudyInstanceUID", "StudyDescription",
+    "SeriesInstanceUID", "SeriesDescription", "SOPInstanceUID",
+    "SOPClassUID", "Modality", "FrameOfReferenceUID",
+    "ReferencedFrameOfReferenceUID", "ReferencedFrameOfReferenceSequence",
+    "ReferencedStructureSetSequence", "ReferencedRTPlanSequence"
+]
+
+# Number of files handed to the worker pool at a time
+SCAN_CHUNK_SIZE = 256
+
+
+def get_dicom_structure(path, interrupt_flag, progress_callback,
+                        header_only=True, max_workers=None, use_index=True,
+                        index_db_file='DICOMIndex.db'):
     """
     Searches the given directory and creates a
     Patient>Study>Series>Image structure based on the DICOM files in the
-    directory and subdirectories.
+    directory and subdirectories. Files are read in a worker pool.
 
     :param path: The root directory to search from.
     :param interrupt_flag: A threading.Event() flag to indicate whether
         or not the process has been interrupted.
     :param progress_callback: A function that receives the progress of
         the current search.
+    :param header_only: Only read the tags needed to build the structure
+        from each file, stopping before the pixel data, instead of
+        reading the whole file.
+    :param max_workers: Number of files read at the same time. Defaults
+        to the pool's own default.
+    :param use_index: Reuse the headers stored in the persistent
+        directory index for files that have not changed since they were
+        last scanned, and update the index. Only used when header_only
+        is True.
+    :param index_db_file: File name of the directory index database in
+        the hidden directory.
     :return: Complete DICOMStructure object with associated DICOM files
     """
 
@@ -27,104 +60,238 @@ def get_dicom_structure(path, interrupt_flag, progress_callback):
 
     files_with_no_patient_id = 1
 
+    read_file = read_dicom_header if header_only else read_dicom_file
+
+    index = None
+    indexed_files = {}
+    if header_only and use_index:
+        try:
+            index = DICOMDirectoryIndex(index_db_file)
+            indexed_files = index.get_entries(path)
+        except sqlite3.Error:
+            # Scan without the index if it cannot be used
+            index = None
+    found_files = set()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk in walk_files_in_chunks(path, SCAN_CHUNK_SIZE):
+                if interrupt_flag.is_set():
+                    return
+
+                # Only read files that are not in the index, or have
+                # changed since they were indexed.
+                file_stats = [get_file_stat(file_path)
+                              for file_path in chunk]
+                files_to_read = [
+                    file_path for file_path, file_stat
+                    in zip(chunk, file_stats)
+                    if file_stat is None
+                    or indexed_files.get(file_path, (None, None))[:2]
+                    != file_stat]
+                read_files = dict(zip(
+                    files_to_read,
+                    executor.map(functools.partial(try_read_file, read_file),
+                                 files_to_read)))
+
+                new_entries = []
+                # Files are read in parallel, but added to the structure
+                # in the order they were found.
+                for file_path, file_stat in zip(chunk, file_stats):
+                    if interrupt_flag.is_set():
+                        return
+
+                    # The progress is updated first because the total
+                    # files represent ALL files inside the selected
+                    # directory, not just the DICOM files. Otherwise, most
+                    # files would be skipped and the progress would be
+                    # inaccurate.
+                    files_searched += 1
+                    progress_callback.emit("%s" % files_searched)
+
+                    found_files.add(file_path)
+                    if file_path in read_files:
+                        dicom_file, readable = read_files[file_path]
+                        # Files that could not be opened are left out of
+                        # the index, so that they are read again next time
+                        if file_stat is not None and readable:
+                            new_entries.append(
+                                (file_path, file_stat[0], file_stat[1],
+                                 header_to_json(dicom_file)))
+                    else:
+                        dicom_file = header_from_json(
+                            indexed_files[file_path][2])
+
+                    if dicom_file is None:
+                        continue
+
+                    if 'PatientID' in dicom_file:
+                        patient_id = dicom_file.PatientID
+                    else:
+                        patient_id = "no_id_" + str(files_with_no_patient_id)
+                        files_with_no_patient_id += 1
+
+                    add_to_dicom_structure(dicom_structure, file_path,
+                                           dicom_file, patient_id)
+
+                if index is not None:
+                    index.update_entries(new_entries)
+
+        # Remove files that no longer exist from the index
+        if index is not None:
+            index.remove_entries(set(indexed_files) - found_files)
+    finally:
+        if index is not None:
+            index.close()
+
+    return dicom_structure
+
+
+def walk_files_in_chunks(path, chunk_size):
+    """
+    Walks the given directory and its subdirectories, skipping hidden
+    files and directories.
+    :param path: The root directory to search from.
+    :param chunk_size: Number of file paths in each chunk.
+    :return: Generator of lists of file paths.
+    """
+    chunk = []
     for root, dirs, files in os.walk(path, topdown=True):
         files = [f for f in files if not f[0] == '.']
         dirs[:] = [d for d in dirs if not d[0] == '.']
         for file in files:
-            if file[0] == '.':
-                break
-            if interrupt_flag.is_set():
-                return
-
-            # The progress is updated first because the total files
-            # represent ALL files inside the selected directory, not
-            # just the DICOM files. Otherwise, most files would be
-            # skipped and the progress would be inaccurate.
-            files_searched += 1
-            progress_callback.emit("%s" % files_searched)
-
-            # Fix to program crashing when encountering DICOMDIR files
-            if file == "DICOMDIR":
-                continue
-
-            file_path = root + os.sep + file
-            try:
-                dicom_file = dcmread(file_path)
-            except (InvalidDicomError, FileNotFoundError, PermissionError):
-                pass
+            chunk.append(root + os.sep + file)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def try_read_file(read_file, file_path):
+    """
+    Reads a file, telling files that are not DICOM files apart from files
+    that could not be opened.
+    :param read_file: read_dicom_header or read_dicom_file.
+    :param file_path: Path of the file to read.
+    :return: Tuple (dataset, readable). dataset is the PyDicom dataset, or
+        None if the file is not a DICOM file or could not be opened.
+        readable is False if the file could not be opened.
+    """
+    try:
+        return read_file(file_path), True
+    except OSError:
+        return None, False
+
+
+def read_dicom_header(file_path):
+    """
+    Reads the tags needed to build the DICOMStructure from a file.
+    Raises OSError if the file could not be opened.
+    :param file_path: Path of the file to read.
+    :return: Partial PyDicom dataset, or None if the file is not a DICOM
+        file.
+    """
+    # Fix to program crashing when encountering DICOMDIR files
+    if os.path.basename(file_path) == "DICOMDIR":
+        return None
+
+    try:
+        return dcmread(file_path, stop_before_pixels=True,
+                       specific_tags=STRUCTURE_TAGS)
+    except InvalidDicomError:
+        return None
+
+
+def read_dicom_file(file_path):
+    """
+    Reads a whole file. Raises OSError if the file could not be opened.
+    :param file_path: Path of the file to read.
+    :return: PyDicom dataset, or None if the file is not a DICOM file.
+    """
+    # Fix to program crashing when encountering DICOMDIR files
+    if os.path.basename(file_path) == "DICOMDIR":
+        return None
+
+    try:
+        return dcmread(file_path)
+    except InvalidDicomError:
+        return None
+
+
+def add_to_dicom_structure(dicom_structure, file_path, dicom_file,
+                           patient_id):
+    """
+    Adds a DICOM file to the Patient>Study>Series>Image structure.
+    :param dicom_structure: DICOMStructure object to add the file to.
+    :param file_path: Path of the DICOM file.
+    :param dicom_file: PyDicom dataset of the file.
+    :param patient_id: PatientID of the file.
+    """
+    if "SOPInstanceUID" in dicom_file \
+            and "SOPClassUID" in dicom_file \
+            and "Modality" in dicom_file:
+        new_image = Image(file_path,
+                          dicom_file.SOPInstanceUID,
+                          dicom_file.SOPClassUID,
+                          dicom_file.Modality)
+        if not dicom_structure.has_patient(patient_id):
+            # TODO there is definitely a more efficient way of
+            #  doing this
+            new_series = Series(dicom_file.SeriesInstanceUID)
+            new_series.series_description = dicom_file.get(
+                "SeriesDescription")
+            new_series.add_referenced_objects(dicom_file)
+            new_series.add_image(new_image)
+
+            new_study = Study(dicom_file.StudyInstanceUID)
+            new_study.study_description = dicom_file.get(
+                "StudyDescription")
+            new_study.add_series(new_series)
+
+            new_patient = Patient(patient_id,
+                                  dicom_file.PatientName)
+            new_patient.add_study(new_study)
+
+            dicom_structure.add_patient(new_patient)
+        else:
+            existing_patient = dicom_structure.get_patient(
+                dicom_file.PatientID)
+            if not existing_patient.has_study(
+                    dicom_file.StudyInstanceUID):
+                new_series = Series(dicom_file.SeriesInstanceUID)
+                new_series.series_description = dicom_file.get(
+                    "SeriesDescription")
+                new_series.add_referenced_objects(dicom_file)
+                new_series.add_image(new_image)
+
+                new_study = Study(dicom_file.StudyInstanceUID)
+                new_study.study_description = dicom_file.get(
+                    "StudyDescription")
+                new_study.add_series(new_series)
+
+                existing_patient.add_study(new_study)
             else:
-                if 'PatientID' in dicom_file:
-                    patient_id = dicom_file.PatientID
+                existing_study = existing_patient.get_study(
+                    dicom_file.StudyInstanceUID)
+                if not existing_study.has_series(
+                        dicom_file.SeriesInstanceUID):
+                    new_series = Series(
+                        dicom_file.SeriesInstanceUID)
+                    new_series.series_description = dicom_file.get(
+                        "SeriesDescription")
+                    new_series.add_referenced_objects(dicom_file)
+                    new_series.add_image(new_image)
+
+                    existing_study.add_series(new_series)
                 else:
-                    patient_id = "no_id_" + str(files_with_no_patient_id)
-                    files_with_no_patient_id += 1
-
-                if "SOPInstanceUID" in dicom_file \
-                        and "SOPClassUID" in dicom_file \
-                        and "Modality" in dicom_file:
-                    new_image = Image(file_path,
-                                      dicom_file.SOPInstanceUID,
-                                      dicom_file.SOPClassUID,
-                                      dicom_file.Modality)
-                    if not dicom_structure.has_patient(patient_id):
-                        # TODO there is definitely a more efficient way of
-                        #  doing this
-                        new_series = Series(dicom_file.SeriesInstanceUID)
-                        new_series.series_description = dicom_file.get(
-                            "SeriesDescription")
-                        new_series.add_referenced_objects(dicom_file)
-                        new_series.add_image(new_image)
-
-                        new_study = Study(dicom_file.StudyInstanceUID)
-                        new_study.study_description = dicom_file.get(
-                            "StudyDescription")
-                        new_study.add_series(new_series)
-
-                        new_patient = Patient(patient_id,
-                                              dicom_file.PatientName)
-                        new_patient.add_study(new_study)
-
-                        dicom_structure.add_patient(new_patient)
-                    else:
-                        existing_patient = dicom_structure.get_patient(
-                            dicom_file.PatientID)
-                        if not existing_patient.has_study(
-                                dicom_file.StudyInstanceUID):
-                            new_series = Series(dicom_file.SeriesInstanceUID)
-                            new_series.series_description = dicom_file.get(
-                                "SeriesDescription")
-                            new_series.add_referenced_objects(dicom_file)
-                            new_series.add_image(new_image)
-
-                            new_study = Study(dicom_file.StudyInstanceUID)
-                            new_study.study_description = dicom_file.get(
-                                "StudyDescription")
-                            new_study.add_series(new_series)
-
-                            existing_patient.add_study(new_study)
-                        else:
-                            existing_study = existing_patient.get_study(
-                                dicom_file.StudyInstanceUID)
-                            if not existing_study.has_series(
-                                    dicom_file.SeriesInstanceUID):
-                                new_series = Series(
-                                    dicom_file.SeriesInstanceUID)
-                                new_series.series_description = dicom_file.get(
-                                    "SeriesDescription")
-                                new_series.add_referenced_objects(dicom_file)
-                                new_series.add_image(new_image)
-
-                                existing_study.add_series(new_series)
-                            else:
-                                existing_series = existing_study.get_series(
-                                    dicom_file.SeriesInstanceUID)
-                                if not existing_series.has_image(
-                                        dicom_file.SOPInstanceUID):
-                                    existing_series.series_description = \
-                                        dicom_file.get("SeriesDescription")
-                                    existing_series.add_image(new_image)
-                                    
-    return dicom_structure
+                    existing_series = existing_study.get_series(
+                        dicom_file.SeriesInstanceUID)
+                    if not existing_series.has_image(
+                            dicom_file.SOPInstanceUID):
+                        existing_series.series_description = \
+                            dicom_file.get("SeriesDescription")
+                        existing_series.add_image(new_image)
 
 
 if __name__ == "__main__":
@@ -140,14 +140,22 @@ class DicomTree(object):
         # If current data element is not pixel data element
         elif data_element.name != 'Pixel Data':
             # Key: name, value: value of the element
-            temp_list = []
-            temp_list.append(data_element.value)
-            temp_list.append(repr(data_element.tag))
-            temp_list.append(data_element.VM)
-            temp_list.append(data_element.VR)
-            ordered_dict[data_element.name] = temp_list
+            ordered_dict[data_element.name] = \
+                self.data_element_to_list(data_element)
         return ordered_dict
 
+    @staticmethod
+    def data_element_to_list(data_element):
+        """
+        Convert a data_element that is not a sequence to a list of the
+        columns of its row in the DICOM tree.
+
+        :param data_element: element level variable
+        :return: list of the value, tag, VM and VR of the element
+        """
+        return [data_element.value, repr(data_element.tag),
+                data_element.VM, data_element.VR]
+
     def dataset_to_dict(self, dataset):
         """
         Convert the dataset to an ordered dictionary.
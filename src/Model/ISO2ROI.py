@@ -1,14 +1,35 @@
 from skimage import measure
+import src.constants as constant
 from src.Controller.PathHandler import data_path
 from src.Model import ImageLoading
 from src.Model import ROI
-from src.Model.Isodose import get_dose_grid
+from src.Model.ConnectedComponents import calc_component_contours, \
+    get_min_voxels
+from src.Model.Isodose import dose_grid_to_pixels, get_dose_volume
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
 class ISO2ROI:
     """This class is for converting isodose levels to ROIs."""
 
+    def __init__(self, volumetric=None, min_component_volume=None):
+        """
+        :param volumetric: Whether to segment the dose volume into
+                           connected components in 3D, leaving out
+                           components smaller than min_component_volume,
+                           instead of contouring every slice on its own.
+                           Defaults to constants.VOLUMETRIC_SEGMENTATION.
+        :param min_component_volume: Smallest volume (in cm^3) of a
+                                     component. Defaults to
+                                     constants.MIN_COMPONENT_VOLUME.
+        """
+        if volumetric is None:
+            volumetric = constant.VOLUMETRIC_SEGMENTATION
+        if min_component_volume is None:
+            min_component_volume = constant.MIN_COMPONENT_VOLUME
+        self.volumetric = volumetric
+        self.min_component_volume = min_component_volume
+
     def start_conversion(self, interrupt_flag, progress_callback):
         """
         Goes the the steps of the iso2roi conversion.
@@ -90,29 +111,39 @@ class ISO2ROI:
         if not rt_dose_dose:
             return None
 
+        dose_volume = get_dose_volume(patient_dict_container)
+        dict_uid = patient_dict_container.get("dict_uid")
+
         contours = {}
+        min_voxels = get_min_voxels(self.min_component_volume,
+                                    dose_volume.voxel_volume)
 
         for item in isodose_levels:
+            if isodose_levels[item][0]:
+                dose_level = isodose_levels[item][1] / \
+                             (rt_plan_dose.DoseGridScaling * 100)
+            else:
+                dose_level = isodose_levels[item][1] * \
+                             rt_dose_dose / \
+                             (rt_plan_dose.DoseGridScaling * 10000)
+
+            if self.volumetric:
+                # Calculate boundaries of the connected components of the
+                # isodose level
+                contours[item] = calc_component_contours(
+                    dose_volume.volume[slider_min:slider_max], dose_level,
+                    min_voxels)
+                continue
+
             # Calculate boundaries for each isodose level for each slice
             contours[item] = []
             for slider_id in range(slider_min, slider_max):
                 contours[item].append([])
-                temp_ds = patient_dict_container.dataset[slider_id]
-                z = temp_ds.ImagePositionPatient[2]
-                grid = get_dose_grid(rt_plan_dose, float(z))
-
-                if not (grid == []):
-                    if isodose_levels[item][0]:
-                        dose_level = isodose_levels[item][1] / \
-                                     (rt_plan_dose.DoseGridScaling * 100)
-                        contours[item][slider_id] =\
-                            (measure.find_contours(grid, dose_level))
-                    else:
-                        dose_level = isodose_levels[item][1] * \
-                                     rt_dose_dose / \
-                                     (rt_plan_dose.DoseGridScaling * 10000)
-                        contours[item][slider_id] = \
-                            (measure.find_contours(grid, dose_level))
+                grid = dose_volume.dose_at_slice(dict_uid[slider_id])
+
+                if len(grid):
+                    contours[item][slider_id] = \
+                        measure.find_contours(grid, dose_level)
 
         # Return list of contours for each isodose level for each slice
         return contours
@@ -138,23 +169,15 @@ class ISO2ROI:
                 existing_rois.append(roi.ROIName)
 
         # Loop through each isodose level
+        rois_contours = {}
         for item in contours:
             # Delete ROI if it already exists to recreate it
             if item in existing_rois:
                 dataset_rtss = ROI.delete_roi(dataset_rtss, item)
 
-                # Update patient dict container
-                current_rois = patient_dict_container.get("rois")
-                keys = []
-                for key, value in current_rois.items():
-                    if value["name"] == item:
-                        keys.append(key)
-                for key in keys:
-                    del current_rois[key]
-                patient_dict_container.set("rois", current_rois)
-
             # Calculate isodose ROI for each slice, skip if slice has no
             # contour data
+            rois_contours[item] = []
             for i in range(slider_min, slider_max):
                 if not len(contours[item][i]):
                     continue
@@ -168,36 +191,19 @@ class ISO2ROI:
                 dose_pixluts = patient_dict_container.get("dose_pixluts")
                 dose_pixluts = dose_pixluts[curr_slice_uid]
 
-                # Loop through each contour for each slice.
-                # Convert the pixel points to RCS points, append z value
-                single_array = []
-
-                # Loop through each contour
-                for j in range(len(contours[item][i])):
-                    single_array.append([])
-                    # Loop through every second point in the contour
-                    for point in contours[item][i][j][::2]:
-                        # Transform into dose pixel
-                        dose_pixels = [dose_pixluts[0][int(point[1])],
-                                       dose_pixluts[1][int(point[0])]]
-                        # Transform into RCS pixel
-                        rcs_pixels = ROI.pixel_to_rcs(pixlut,
-                                                      round(dose_pixels[0]),
-                                                      round(dose_pixels[1]))
-                        # Append point coordinates to the single array
-                        single_array[j].append(rcs_pixels[0])
-                        single_array[j].append(rcs_pixels[1])
-                        single_array[j].append(z_coord)
-
-                # Create the ROI(s)
-                for array in single_array:
-                    rtss = ROI.create_roi(dataset_rtss, item,
-                                          [{'coords': array, 'ds': dataset}],
-                                          "DOSE_REGION")
-
-                    # Save the updated rtss
-                    patient_dict_container.set("dataset_rtss", rtss)
-                    patient_dict_container.set("rois",
-                                               ImageLoading.get_roi_info(rtss))
+                # Convert every second point of each contour from the dose
+                # grid to an image pixel, and then to an RCS point
+                for contour in contours[item][i]:
+                    dose_pixels = dose_grid_to_pixels(dose_pixluts,
+                                                      contour[::2])
+                    rois_contours[item].append({
+                        'coords': ROI.pixels_to_rcs(pixlut, dose_pixels,
+                                                    z_coord),
+                        'ds': dataset})
+
+        # Create all ROIs at once, and save the updated rtss
+        rtss = ROI.create_rois(dataset_rtss, rois_contours, "DOSE_REGION")
+        patient_dict_container.set("dataset_rtss", rtss)
+        patient_dict_container.set("rois", ImageLoading.get_roi_info(rtss))
 
         progress_callback.emit(("Writing to RT Structure Set", 85))
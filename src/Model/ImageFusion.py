@@ -1,6 +1,3 @@
-from PySide6 import QtCore, QtGui
-
-import json
 import numpy as np
 import SimpleITK as sitk
 import datetime
@@ -10,14 +7,13 @@ import os
 from copy import deepcopy
 from pydicom.tag import Tag
 
-from src.constants import CT_RESCALE_INTERCEPT
-from src.Controller.PathHandler import data_path
+from src.Model.CalculateImages import FusedPixmaps, FusedVolume
+from src.Model.ImageRegistration import get_registration_settings, \
+    get_transform_cache_key, load_cached_transform, register_images, \
+    resample_moving_image, save_cached_transform
 
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.MovingDictContainer import MovingDictContainer
-from platipy.imaging.registration.linear import linear_registration
-from platipy.imaging.visualisation.utils import generate_comparison_colormix, \
-    return_slice
 
 
 # Utility Functions
@@ -312,16 +308,46 @@ def write_transform_to_dcm(affine_matrix):
     spatial_registration.save_as(filepath)
 
 
-def create_fused_model(old_images, new_image):
+def create_fused_model(old_images, new_image, progress_callback=None,
+                       interrupt_flag=None, progress_range=(0, 100)):
     """
-    Performs the image fusion and stores fusion information.
+    Performs the image fusion and stores fusion information. The transform
+    of a fixed and moving series registered with the same settings before
+    is read from the transform cache instead of being registered again.
     
     Args:
         old_images(sitk): Image set from Primary/Fixed Image
         new_image(sitk): Image set from the Secondary/Moving Image
+        progress_callback: signal that receives the progress of the
+        registration
+        interrupt_flag(threading.Event): tells the function to stop
+        registering
+        progress_range(tuple): progress emitted at the start and at the end
+        of the registration
+    Return:
+        bool: False if the registration was interrupted, True otherwise
     """
     patient_dict_container = PatientDictContainer()
-    fused_image = register_images(old_images, new_image)
+    moving_dict_container = MovingDictContainer()
+    settings = get_registration_settings()
+    cache_key = get_transform_cache_key(
+        patient_dict_container.dataset[0].SeriesInstanceUID,
+        moving_dict_container.dataset[0].SeriesInstanceUID, settings)
+    tfm = load_cached_transform(cache_key)
+
+    if tfm is None:
+        fused_image = register_images(old_images, new_image, settings,
+                                      progress_callback, interrupt_flag,
+                                      progress_range)
+        if fused_image is None:
+            return False
+        save_cached_transform(cache_key, fused_image[1])
+    else:
+        if progress_callback is not None:
+            progress_callback.emit(("Resampling moving image...",
+                                    progress_range[1]))
+        fused_image = (resample_moving_image(old_images, new_image, tfm,
+                                             settings), tfm)
     patient_dict_container.set("fused_images", fused_image)
 
     # Throw Transform Object into function to write dcm file
@@ -329,208 +355,40 @@ def create_fused_model(old_images, new_image):
     # test = check_affine_conversion(fused_image[1], combined_affine)
     affine_matrix = convert_combined_affine_to_matrix(combined_affine)
     write_transform_to_dcm(affine_matrix)
+    return True
 
 
 def get_fused_window(level, window):
     """
-    Apply windowing on the fixed and moving (linear-registered) images.
-    
+    Create the pixmaps of the fixed and moving (linear-registered) images.
+    Both images are windowed once, and the pixmaps of a slice are only
+    rendered when the slice is displayed.
+
     Args:
         level(int): the level (midpoint) of windowing
         window(any): the window (range) of windowing
-    
+
     Return:
-        color_axial (QtGui.QPixmap): pixmap of the registered image from axial 
-        view
-        color_sagittal (QtGui.QPixmap): pixmap of the registered image from 
+        color_axial (FusedPixmaps): pixmaps of the registered image from
+        axial view
+        color_sagittal (FusedPixmaps): pixmaps of the registered image from
         sagittal view
-        color_coronal (QtGui.QPixmap): pixmap of the registered image from 
+        color_coronal (FusedPixmaps): pixmaps of the registered image from
         coronal view
-        tfm (sitk.CompositeTransform): transformation object containing data 
+        tfm (sitk.CompositeTransform): transformation object containing data
         that is a product from linear_registration
     """
-  
     patient_dict_container = PatientDictContainer()
     old_images = patient_dict_container.get("sitk_original")
     fused_image = patient_dict_container.get("fused_images")
     tfm = fused_image[1]
-    array = sitk.GetArrayFromImage(old_images).shape
 
-    axial_slice_count = array[0]
-    coronal_slice_count = array[1]
-    sagittal_slice_count = array[1]
+    fused_volume = FusedVolume(sitk.GetArrayFromImage(old_images),
+                               sitk.GetArrayFromImage(fused_image[0]),
+                               window, level)
 
-    sp_plane, _, sp_slice = old_images.GetSpacing()
-    asp = (1.0 * sp_slice) / sp_plane
-
-    color_axial = {}
-    color_sagittal = {}
-    color_coronal = {}
-
-    windowing = (int(level-CT_RESCALE_INTERCEPT), int(window))
-
-    for i in range(axial_slice_count):
-        color_axial[i] = \
-            get_fused_pixmap(old_images, fused_image[0], asp, i, "axial",
-                             windowing)
-
-    for i in range(sagittal_slice_count):
-        color_sagittal[i] = \
-            get_fused_pixmap(old_images, fused_image[0], asp, i, "sagittal",
-                             windowing)
-
-    for i in range(coronal_slice_count):
-        color_coronal[i] = \
-            get_fused_pixmap(old_images, fused_image[0], asp, i, "coronal",
-                             windowing)
+    color_axial = FusedPixmaps(fused_volume, "axial", window, level)
+    color_sagittal = FusedPixmaps(fused_volume, "sagittal", window, level)
+    color_coronal = FusedPixmaps(fused_volume, "coronal", window, level)
 
     return color_axial, color_sagittal, color_coronal, tfm
-
-
-# Can be expanded to peform all of platipy's registrations
-def register_images(image_1, image_2):
-    """
-    Registers the moving and fixed image.
-    Args:
-        image_1 (Image Matrix)
-        image_2 (Image Matrix)
-    Return:
-        img_ct (Array)
-        tfm (sitk.CompositeTransform)
-    """
-
-    # Check to see if the imageWindowing.csv file exists
-    if os.path.exists(data_path('imageFusion.json')):
-        # If it exists, read data from file into the dictionary
-        with open(data_path("imageFusion.json"),
-                  "r") as file_input:
-            dict_fusion = json.load(file_input)
-
-        img_ct, tfm = linear_registration(
-            image_1,
-            image_2,
-            reg_method=dict_fusion["reg_method"],
-            metric=dict_fusion["metric"],
-            optimiser=dict_fusion["optimiser"],
-            shrink_factors=dict_fusion["shrink_factors"],
-            smooth_sigmas=dict_fusion["smooth_sigmas"],
-            sampling_rate=dict_fusion["sampling_rate"],
-            final_interp=dict_fusion["final_interp"],
-            number_of_iterations=dict_fusion["number_of_iterations"],
-            default_value=dict_fusion["default_value"],
-            verbose=False
-        )
-    else:
-        # If csv does not exist, initialize registration normally
-        img_ct, tfm = linear_registration(
-            image_1,
-            image_2,
-            shrink_factors=[8],
-            smooth_sigmas=[10],
-            reg_method='rigid',
-            verbose=False
-        )
-
-    return img_ct, tfm
-
-
-def get_fused_pixmap(orig_image, fused_image, aspect,
-                     slice_num, view, windowing=(-250, 500)):
-    """
-    Generates a colored pixmap of the array from the inputted view.
-    Args:
-        orig_image(ndarray): N dimension array containing signed int8 values
-        fused_image(ndarray): N dimension array containing signed int8 values
-        aspect(Any): currently not used
-        slice_num(int): slice number of the array
-        view(String): specified flag that can be sagittal, coronal or axial
-    windowing: target level and window of the fused image
-    Returns:
-        pixmap (QtGui.QPixmap): returns the pixmap of co-registered fixed and 
-        moving images.
-    """    
-    # Get dimension /could also input dimensions as parameters
-    image_array = sitk.GetArrayFromImage(orig_image)
-    if view == "sagittal":
-        image_slice = return_slice("x", slice_num)
-
-        pixel_array_color = \
-            np.array(generate_comparison_colormix(
-                [orig_image, fused_image],
-                arr_slice=image_slice, window=windowing))
-
-        # resize dimensions to stop image stretch
-        pixel_array_color = np.resize(pixel_array_color, (512, 345, 3))
-
-        # first adjusts rgb (0,1) scale to greyscale (0,255)
-        # then converts type and formats it to color.
-        qimage2 = \
-            QtGui.QImage(((255 * pixel_array_color).astype(np.uint8)),
-                         image_array.shape[1], image_array.shape[0],
-                         QtGui.QImage.Format_RGB888)
-
-        # Then continues to convert to pixmap just like in onko
-        pixmap = QtGui.QPixmap(qimage2)
-
-        pixmap = pixmap.scaled(512,
-                               512,
-                               QtCore.Qt.IgnoreAspectRatio,
-                               QtCore.Qt.SmoothTransformation)
-    elif view == "coronal":
-        image_slice = return_slice("y", slice_num)
-
-        pixel_array_color = np.array(generate_comparison_colormix(
-            [orig_image, fused_image],
-            arr_slice=image_slice, window=windowing))
-
-        # resize dimensions to stop image stretch
-        pixel_array_color = np.resize(pixel_array_color, (512, 345, 3))
-
-        # first adjusts rgb (0,1) scale to greyscale (0,255)
-        # then converts type and formats it to color.
-        qimage2 = QtGui.QImage(((255 * pixel_array_color).astype(np.uint8)),
-                               image_array.shape[1],
-                               image_array.shape[0],
-                               QtGui.QImage.Format_RGB888)
-
-        # Then continues to convert to pixmap just like in onko
-        pixmap = QtGui.QPixmap(qimage2)
-        pixmap = pixmap.scaled(512,
-                               512,
-                               QtCore.Qt.IgnoreAspectRatio,
-                               QtCore.Qt.SmoothTransformation)
-    else:
-        image_slice = return_slice("z", slice_num)
-
-        pixel_array_color = np.array(generate_comparison_colormix(
-            [orig_image, fused_image],
-            arr_slice=image_slice, window=windowing))
-
-        # first adjusts rgb (0,1) scale to greyscale (0,255)
-        # then converts type and formats it to color.
-        qimage = QtGui.QImage(((255 * pixel_array_color).astype(np.uint8)),
-                              image_array.shape[1],
-                              image_array.shape[1],
-                              QtGui.QImage.Format_RGB888)
-
-        # Then continues to convert to pixmap just like in onko
-        pixmap = QtGui.QPixmap(qimage)
-        pixmap = pixmap.scaled(512,
-                               512,
-                               QtCore.Qt.IgnoreAspectRatio,
-                               QtCore.Qt.SmoothTransformation)
-
-    # Generates an rgb color overlaid image,
-    # convert to contiguous array,
-    # and also flip the array if it is a coronal (y) or sagittal (x)
-    return pixmap
-
-
-def scaled_size(width, height):
-    if width > height:
-        height = 512 / width * height
-        width = 512
-    else:
-        width = 512 / height * width
-        height = 512
-    return width, height
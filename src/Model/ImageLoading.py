@@ -19,14 +19,18 @@ not the case, however this alternative function promotes scalability and
 durability of the process).
 """
 import collections
+import collections.abc
 import math
 import re
-from multiprocessing import Queue, Process
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    as_completed
 
 import numpy as np
 from dicompylercore import dvhcalc
 from pydicom import dcmread
+from pydicom.dataelem import RawDataElement
 from pydicom.errors import InvalidDicomError
+from pydicom.tag import Tag
 
 allowed_classes = {
     # CT Image
@@ -80,7 +84,8 @@ class NotAllowedClassError(Exception):
     pass
 
 
-def get_datasets(filepath_list, file_type=None):
+def get_datasets(filepath_list, file_type=None, progress_callback=None,
+                 max_workers=None, use_processes=False):
     """
     This function generates two dictionaries: the dictionary of PyDicom
     datasets, and the dictionary of filepaths. These two dictionaries
@@ -91,6 +96,14 @@ def get_datasets(filepath_list, file_type=None):
     are filepaths pointing to the location of the .dcm file on the
     user's computer.
     :param filepath_list: List of all files to be searched.
+    :param file_type: Modality of the datasets to keep, or None to keep
+        all datasets.
+    :param progress_callback: A signal that receives the progress of
+        reading the files.
+    :param max_workers: Number of files read at the same time. Defaults
+        to the pool's own default.
+    :param use_processes: Read files in a process pool instead of a
+        thread pool.
     :return: Tuple (read_data_dict, file_names_dict)
     """
     read_data_dict = {}
@@ -98,36 +111,37 @@ def get_datasets(filepath_list, file_type=None):
 
     slice_count = 0
     sr_count = 0
-    for file in natural_sort(filepath_list):
-        try:
-            read_file = dcmread(file)
-        except InvalidDicomError:
-            pass
-        else:
-            if read_file.SOPClassUID in allowed_classes:
-                allowed_class = allowed_classes[read_file.SOPClassUID]
-                if allowed_class["sliceable"]:
-                    slice_name = slice_count
-                    slice_count += 1
-                else:
-                    # Read from Series Description to determine what is
-                    # stored in the SR file.
-                    if allowed_class["name"] == "sr":
-                        if read_file.SeriesDescription == "CLINICAL-DATA":
-                            slice_name = "sr-cd"
-                        elif read_file.SeriesDescription == "PYRADIOMICS":
-                            slice_name = "sr-rad"
-                        else:
-                            slice_name = "sr-other-" + str(sr_count)
-                            sr_count += 1
+    read_files = read_dicom_files(natural_sort(filepath_list),
+                                  progress_callback, max_workers,
+                                  use_processes)
+    for file, read_file in read_files:
+        if read_file is None:
+            continue
+
+        if read_file.SOPClassUID in allowed_classes:
+            allowed_class = allowed_classes[read_file.SOPClassUID]
+            if allowed_class["sliceable"]:
+                slice_name = slice_count
+                slice_count += 1
+            else:
+                # Read from Series Description to determine what is
+                # stored in the SR file.
+                if allowed_class["name"] == "sr":
+                    if read_file.SeriesDescription == "CLINICAL-DATA":
+                        slice_name = "sr-cd"
+                    elif read_file.SeriesDescription == "PYRADIOMICS":
+                        slice_name = "sr-rad"
                     else:
-                        slice_name = allowed_class["name"]
+                        slice_name = "sr-other-" + str(sr_count)
+                        sr_count += 1
+                else:
+                    slice_name = allowed_class["name"]
 
-                if file_type is None or read_file.Modality == file_type:
-                    read_data_dict[slice_name] = read_file
-                    file_names_dict[slice_name] = file
-            else:
-                raise NotAllowedClassError
+            if file_type is None or read_file.Modality == file_type:
+                read_data_dict[slice_name] = read_file
+                file_names_dict[slice_name] = file
+        else:
+            raise NotAllowedClassError
 
     sorted_read_data_dict, sorted_file_names_dict = \
         image_stack_sort(read_data_dict, file_names_dict)
@@ -135,6 +149,58 @@ def get_datasets(filepath_list, file_type=None):
     return sorted_read_data_dict, sorted_file_names_dict
 
 
+def read_dicom_file(file):
+    """
+    Read a single DICOM file.
+    :param file: Path of the file to read.
+    :return: PyDicom dataset, or None if the file is not a DICOM file.
+    """
+    try:
+        return dcmread(file)
+    except InvalidDicomError:
+        return None
+
+
+def read_dicom_files(filepath_list, progress_callback=None, max_workers=None,
+                     use_processes=False, progress_range=(0, 10)):
+    """
+    Read DICOM files in parallel. Reading is dominated by waiting on
+    storage, so by default the files are read in a thread pool. A
+    process pool can be used instead when parsing is the bottleneck.
+    :param filepath_list: List of paths of the files to read.
+    :param progress_callback: A signal that receives the progress of
+        reading the files, emitted after every file.
+    :param max_workers: Number of files read at the same time. Defaults
+        to the pool's own default.
+    :param use_processes: Read files in a process pool instead of a
+        thread pool.
+    :param progress_range: Tuple of the progress percentages emitted
+        before the first and after the last file.
+    :return: List of tuples (filepath, dataset) in the order of
+        filepath_list. The dataset is None for files that are not DICOM
+        files.
+    """
+    executor_class = ProcessPoolExecutor if use_processes \
+        else ThreadPoolExecutor
+    total = len(filepath_list)
+    read_files = [None] * total
+
+    with executor_class(max_workers=max_workers) as executor:
+        futures = {executor.submit(read_dicom_file, file): i
+                   for i, file in enumerate(filepath_list)}
+        for count, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            read_files[index] = (filepath_list[index], future.result())
+            if progress_callback is not None:
+                progress = progress_range[0] + int(
+                    (progress_range[1] - progress_range[0]) * count / total)
+                progress_callback.emit(
+                    ("Reading files ({}/{})...".format(count, total),
+                     progress))
+
+    return read_files
+
+
 def img_stack_displacement(orientation, position):
     """
     Calculate the projection of the image position patient along the
@@ -350,7 +416,7 @@ def calc_dvhs(dataset_rtss, dataset_rtdose, rois, dict_thickness,
     :param dict_thickness: Dictionary where the keys are ROI numbers and
         the values are thicknesses of the ROI.
     :param interrupt_flag: A threading.Event() object that tells the
-        function to stop calculation.
+        function to stop calculation, or None.
     :param dose_limit: Limit of dose for DVH calculation.
     :return: Dictionary of all the DVHs of all the ROIs of the patient.
     """
@@ -365,52 +431,13 @@ def calc_dvhs(dataset_rtss, dataset_rtdose, rois, dict_thickness,
             thickness = dict_thickness[roi]
         dict_dvh[roi] = dvhcalc.get_dvh(dataset_rtss, dataset_rtdose, roi,
                                         dose_limit, thickness=thickness)
-        if interrupt_flag.is_set():  # Stop calculating at the next DVH.
+        # Stop calculating at the next DVH.
+        if interrupt_flag is not None and interrupt_flag.is_set():
             return
 
     return dict_dvh
 
 
-def calc_dvh_worker(rtss, dose, roi, queue, thickness, dose_limit=None):
-    dvh = {}
-    dvh[roi] = \
-        dvhcalc.get_dvh(rtss, dose, roi, dose_limit, thickness=thickness)
-    queue.put(dvh)
-
-
-def multi_calc_dvh(dataset_rtss, dataset_rtdose, rois, dict_thickness,
-                   dose_limit=None):
-    """
-    Multiprocessing variant of calc_dvh for fork-based platforms.
-    """
-    queue = Queue()
-    processes = []
-    dict_dvh = {}
-
-    roi_list = []
-    for key in rois:
-        roi_list.append(key)
-
-    for i in range(len(roi_list)):
-        thickness = None
-        if roi_list[i] in dict_thickness:
-            thickness = dict_thickness[roi_list[i]]
-        p = Process(target=calc_dvh_worker,
-                    args=(dataset_rtss, dataset_rtdose, roi_list[i],
-                          queue, thickness, dose_limit,))
-        processes.append(p)
-        p.start()
-
-    for process in processes:
-        dvh = queue.get()
-        dict_dvh.update(dvh)
-
-    for process in processes:
-        process.join()
-
-    return dict_dvh
-
-
 def converge_to_0_dvh(raw_dvh):
     """
     :param raw_dvh: Dictionary produced by calc_dvhs(..) function.
@@ -450,11 +477,77 @@ def converge_to_0_dvh(raw_dvh):
     return res
 
 
+CONTOUR_DATA_TAG = Tag("ContourData")
+
+
+def get_contour_data(contour):
+    """
+    Decode the ContourData of a contour as a numpy array. If the element
+    has not been converted by pydicom yet, the value is decoded straight
+    from the bytes read from the file and the element is left as it is,
+    which is much faster and smaller than a list of DSfloat.
+    :param contour: Item of a ContourSequence.
+    :return: Flat numpy float array of the x, y and z coordinates of the
+        points of the contour.
+    """
+    if CONTOUR_DATA_TAG not in contour:
+        return np.empty(0)
+    element = contour.get_item(CONTOUR_DATA_TAG)
+    if isinstance(element, RawDataElement):
+        # Values may be padded to an even length with a space or a NUL
+        value = (element.value or b"").rstrip(b"\x00 ")
+        if not value:
+            return np.empty(0)
+        return np.array(value.split(b"\\"), dtype=float)
+    return np.asarray(element.value, dtype=float).ravel()
+
+
+class ROIContours(collections.abc.Mapping):
+    """
+    The contours of an ROI, with the SOPInstanceUIDs of the slices they
+    are on as keys. The contours of a slice are only decoded, as flat
+    numpy arrays of ContourData, the first time the slice is looked up.
+    Slices without contours have an empty list of contours.
+    """
+
+    def __init__(self):
+        self.contour_items = collections.defaultdict(list)
+        self.contours = {}
+
+    def add_contour(self, slice_uid, contour):
+        """
+        :param slice_uid: SOPInstanceUID of the slice of the contour.
+        :param contour: Item of a ContourSequence.
+        """
+        self.contour_items[slice_uid].append(contour)
+        self.contours.pop(slice_uid, None)
+
+    def __getitem__(self, slice_uid):
+        if slice_uid not in self.contour_items:
+            return []
+        if slice_uid not in self.contours:
+            self.contours[slice_uid] = [
+                get_contour_data(contour)
+                for contour in self.contour_items[slice_uid]]
+        return self.contours[slice_uid]
+
+    def __contains__(self, slice_uid):
+        return slice_uid in self.contour_items
+
+    def __iter__(self):
+        return iter(self.contour_items)
+
+    def __len__(self):
+        return len(self.contour_items)
+
+
 def get_raw_contour_data(dataset_rtss):
     """
+    Index the contours of every ROI by the slice they are on. The
+    ContourData is not decoded until the contours of a slice are used.
     :param dataset_rtss: RTSTRUCT DICOM dataset object.
     :return: Tuple (dict_roi, dict_numpoints) raw contour data of the
-        ROIs.
+        ROIs, where the values of dict_roi are ROIContours.
     """
     dict_id = {}
     for i, elem in enumerate(dataset_rtss.StructureSetROISequence):
@@ -467,7 +560,7 @@ def get_raw_contour_data(dataset_rtss):
     for roi in dataset_rtss.ROIContourSequence:
         referenced_roi_number = roi.ReferencedROINumber
         roi_name = dict_id[referenced_roi_number]
-        dict_contour = collections.defaultdict(list)
+        roi_contours = ROIContours()
         roi_points_count = 0
         if 'ContourSequence' in roi:
             for roi_slice in roi.ContourSequence:
@@ -475,19 +568,24 @@ def get_raw_contour_data(dataset_rtss):
                     for contour_img in roi_slice.ContourImageSequence:
                         referenced_sop_instance_uid = \
                             contour_img.ReferencedSOPInstanceUID
-                    contour_geometric_type = roi_slice.ContourGeometricType
                     number_of_contour_points = roi_slice.NumberOfContourPoints
                     roi_points_count += int(number_of_contour_points)
-                    contour_data = roi_slice.ContourData
-                    dict_contour[
-                        referenced_sop_instance_uid].append(contour_data)
-        dict_roi[roi_name] = dict_contour
+                    roi_contours.add_contour(referenced_sop_instance_uid,
+                                             roi_slice)
+        dict_roi[roi_name] = roi_contours
         dict_numpoints[roi_name] = roi_points_count
 
     return dict_roi, dict_numpoints
 
 
 def calculate_matrix(img_ds):
+    """
+    Calculate the pixel lookup tables of an image dataset, i.e. the
+    patient x coordinate of every column and the patient y coordinate of
+    every row of the image.
+    :param img_ds: DICOM(image) dataset
+    :return: Tuple (x, y) of numpy arrays of the lookup tables
+    """
     # Physical distance (in mm) between the center of each image pixel,
     # specified by a numeric pair
     # - adjacent row spacing (delimiter) adjacent column spacing.
@@ -504,34 +602,57 @@ def calculate_matrix(img_ds):
 
     # Equation C.7.6.2.1-1.
     # https://dicom.innolitics.com/ciods/rt-structure-set/roi-contour/30060039/30060040/30060050
-    matrix_m = np.matrix(
+    matrix_m = np.array(
         [[orientation[0] * dist_row, orientation[3] * dist_col, 0,
           position[0]],
          [orientation[1] * dist_row, orientation[4] * dist_col, 0,
           position[1]],
          [orientation[2] * dist_row, orientation[5] * dist_col, 0,
           position[2]],
-         [0, 0, 0, 1]]
+         [0, 0, 0, 1]],
+        dtype=float
     )
-    x = []
-    y = []
-    for i in range(0, img_ds.Columns):
-        i_mat = matrix_m * np.matrix([[i], [0], [0], [1]])
-        x.append(float(i_mat[0]))
 
-    for j in range(0, img_ds.Rows):
-        j_mat = matrix_m * np.matrix([[0], [j], [0], [1]])
-        y.append(float(j_mat[1]))
+    # Evaluate the matrix for the pixels (i, 0) of every column and
+    # (0, j) of every row in one multiplication each.
+    column_pixels = np.zeros((4, img_ds.Columns))
+    column_pixels[0] = np.arange(img_ds.Columns)
+    column_pixels[3] = 1
+    row_pixels = np.zeros((4, img_ds.Rows))
+    row_pixels[1] = np.arange(img_ds.Rows)
+    row_pixels[3] = 1
+
+    x = np.matmul(matrix_m, column_pixels)[0]
+    y = np.matmul(matrix_m, row_pixels)[1]
+
+    return x, y
 
-    return np.array(x), np.array(y)
+
+def get_geometry_key(img_ds):
+    """
+    :param img_ds: DICOM(image) dataset
+    :return: Tuple of the geometry of the image that its pixel lookup
+        tables depend on. Images with the same key have the same
+        lookup tables.
+    """
+    return (tuple(float(value) for value in img_ds.ImageOrientationPatient),
+            tuple(float(value) for value in img_ds.PixelSpacing),
+            float(img_ds.ImagePositionPatient[0]),
+            float(img_ds.ImagePositionPatient[1]),
+            img_ds.Rows, img_ds.Columns)
 
 
 def get_pixluts(read_data_dict):
     """
+    Calculate the pixel lookup tables of every image slice. Slices that
+    share the same geometry (as is the case for almost every slice of a
+    CT series) share the same lookup tables, which are only calculated
+    once.
     :param read_data_dict: Dictionary of all DICOM dataset objects.
     :return: Dictionary of pixluts for the transformation from 3D to 2D.
     """
     dict_pixluts = {}
+    pixluts_by_geometry = {}
     non_img_type = ['rtdose', 'rtplan', 'rtss', 'rtimage']
     for ds in read_data_dict:
         if ds not in non_img_type:
@@ -539,8 +660,12 @@ def get_pixluts(read_data_dict):
                 continue
             else:
                 img_ds = read_data_dict[ds]
-                pixlut = calculate_matrix(img_ds)
-                dict_pixluts[img_ds.SOPInstanceUID] = pixlut
+                geometry_key = get_geometry_key(img_ds)
+                if geometry_key not in pixluts_by_geometry:
+                    pixluts_by_geometry[geometry_key] = \
+                        calculate_matrix(img_ds)
+                dict_pixluts[img_ds.SOPInstanceUID] = \
+                    pixluts_by_geometry[geometry_key]
 
     return dict_pixluts
 
@@ -0,0 +1,337 @@
+""" Multi-resolution linear registration of a moving image onto a fixed one """
+
+import functools
+import hashlib
+import json
+import math
+import operator
+import os
+from pathlib import Path
+
+import SimpleITK as sitk
+
+from src.constants import REGISTRATION_MAX_METRIC_SAMPLES, \
+    REGISTRATION_MIN_LEVEL_SIZE
+from src.Controller.PathHandler import data_path
+from src.Model.Configuration import set_up_hidden_dir
+
+# Settings used for the keys missing from imageFusion.json. A thread count
+# of 0 uses every CPU.
+DEFAULT_REGISTRATION_SETTINGS = {
+    "reg_method": "rigid",
+    "metric": "mean_squares",
+    "optimiser": "gradient_descent",
+    "shrink_factors": [8],
+    "smooth_sigmas": [10],
+    "sampling_rate": 0.25,
+    "sampling_strategy": "random",
+    "final_interp": 2,
+    "number_of_iterations": 50,
+    "default_value": -1000,
+    "number_of_threads": 0,
+}
+
+# Settings which change the registered transform, and so key the transform
+# cache. The other settings only change how the moving image is resampled
+# or how fast the transform is found.
+TRANSFORM_SETTINGS = ("reg_method", "metric", "optimiser", "shrink_factors",
+                      "smooth_sigmas", "sampling_rate", "sampling_strategy",
+                      "number_of_iterations")
+
+TRANSFORMS = {
+    "translation": lambda: sitk.TranslationTransform(3),
+    "rigid": sitk.VersorRigid3DTransform,
+    "similarity": sitk.Similarity3DTransform,
+    "affine": lambda: sitk.AffineTransform(3),
+    "scale": lambda: sitk.ScaleTransform(3),
+    "scaleversor": sitk.ScaleVersor3DTransform,
+    "scaleskewversor": sitk.ScaleSkewVersor3DTransform,
+}
+
+SAMPLING_STRATEGIES = {
+    "none": sitk.ImageRegistrationMethod.NONE,
+    "regular": sitk.ImageRegistrationMethod.REGULAR,
+    "random": sitk.ImageRegistrationMethod.RANDOM,
+}
+
+# Seed of the metric sampling, so that registering the same images gives
+# the same transform
+SAMPLING_SEED = 42
+
+
+def get_registration_settings():
+    """
+    :return: Dictionary of the registration settings in imageFusion.json,
+        with the default settings for the keys it does not have.
+    """
+    settings = dict(DEFAULT_REGISTRATION_SETTINGS)
+    if os.path.exists(data_path("imageFusion.json")):
+        with open(data_path("imageFusion.json"), "r") as file_input:
+            settings.update(json.load(file_input))
+    return settings
+
+
+def get_transform_cache_key(fixed_series_uid, moving_series_uid, settings):
+    """
+    :param fixed_series_uid: SeriesInstanceUID of the fixed image.
+    :param moving_series_uid: SeriesInstanceUID of the moving image.
+    :param settings: Dictionary of registration settings.
+    :return: Hash of the image pair and the settings which change the
+        registered transform.
+    """
+    key = json.dumps({
+        "fixed": str(fixed_series_uid),
+        "moving": str(moving_series_uid),
+        "settings": {name: settings[name] for name in TRANSFORM_SETTINGS},
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_transform_cache_path(key):
+    """
+    :param key: Transform cache key, from get_transform_cache_key().
+    :return: Path of the cached transform in the hidden directory.
+    """
+    set_up_hidden_dir()
+    return Path(os.environ['USER_ONKODICOM_HIDDEN']).joinpath(
+        'transforms', key + '.tfm')
+
+
+def load_cached_transform(key):
+    """
+    :param key: Transform cache key, from get_transform_cache_key().
+    :return: The cached sitk.CompositeTransform, or None if there is no
+        transform cached for the key or it cannot be read.
+    """
+    path = get_transform_cache_path(key)
+    if not path.exists():
+        return None
+    try:
+        return sitk.ReadTransform(str(path)).Downcast()
+    except RuntimeError:
+        return None
+
+
+def save_cached_transform(key, transform):
+    """
+    :param key: Transform cache key, from get_transform_cache_key().
+    :param transform: Registered sitk.CompositeTransform.
+    """
+    path = get_transform_cache_path(key)
+    path.parent.mkdir(exist_ok=True)
+    sitk.WriteTransform(transform, str(path))
+
+
+def get_pyramid_schedule(size, shrink_factors, smooth_sigmas):
+    """
+    Order the levels of the image pyramid from coarse to fine, and limit
+    the shrink factors so that no axis of a level is shrunk below
+    REGISTRATION_MIN_LEVEL_SIZE voxels. Levels which end up with the same
+    shrink factor are only registered once.
+    :param size: Size (in voxels) of the fixed image.
+    :param shrink_factors: Shrink factor of each level.
+    :param smooth_sigmas: Smoothing sigma (in mm) of each level.
+    :return: Tuple of the lists of shrink factors and smoothing sigmas.
+    """
+    if len(shrink_factors) != len(smooth_sigmas):
+        raise ValueError("The number of shrink factors and smoothing sigmas "
+                         "do not match.")
+    max_shrink = max(1, min(size) // REGISTRATION_MIN_LEVEL_SIZE)
+    schedule_shrink_factors = []
+    schedule_smooth_sigmas = []
+    for shrink, sigma in sorted(zip(shrink_factors, smooth_sigmas),
+                                reverse=True):
+        shrink = min(max(1, int(shrink)), max_shrink)
+        if schedule_shrink_factors and schedule_shrink_factors[-1] == shrink:
+            continue
+        schedule_shrink_factors.append(shrink)
+        schedule_smooth_sigmas.append(sigma)
+    return schedule_shrink_factors, schedule_smooth_sigmas
+
+
+def get_sampling_percentages(size, shrink_factors, sampling_rate):
+    """
+    :param size: Size (in voxels) of the fixed image.
+    :param shrink_factors: Shrink factor of each level.
+    :param sampling_rate: Fraction of the voxels sampled by the metric.
+    :return: List of the fraction of voxels sampled on each level, so that
+        no level samples more than REGISTRATION_MAX_METRIC_SAMPLES voxels.
+    """
+    percentages = []
+    for shrink in shrink_factors:
+        voxels = functools.reduce(
+            operator.mul, (math.ceil(length / shrink) for length in size))
+        percentages.append(
+            min(sampling_rate, REGISTRATION_MAX_METRIC_SAMPLES / voxels))
+    return percentages
+
+
+def set_metric(registration, metric):
+    """
+    :param registration: sitk.ImageRegistrationMethod
+    :param metric: One of "correlation", "mean_squares", "mattes_mi" or
+        "joint_hist_mi".
+    """
+    metric = metric.lower()
+    if metric == "correlation":
+        registration.SetMetricAsCorrelation()
+    elif metric == "mean_squares":
+        registration.SetMetricAsMeanSquares()
+    elif metric == "mattes_mi":
+        registration.SetMetricAsMattesMutualInformation()
+    elif metric == "joint_hist_mi":
+        registration.SetMetricAsJointHistogramMutualInformation()
+    else:
+        raise ValueError("Unknown registration metric: %s" % metric)
+
+
+def set_optimiser(registration, optimiser, number_of_iterations):
+    """
+    :param registration: sitk.ImageRegistrationMethod
+    :param optimiser: One of "lbfgsb", "gradient_descent" or
+        "gradient_descent_line_search".
+    :param number_of_iterations: Most iterations on each level.
+    """
+    optimiser = optimiser.lower()
+    if optimiser == "lbfgsb":
+        registration.SetOptimizerAsLBFGSB(
+            gradientConvergenceTolerance=1e-5,
+            numberOfIterations=number_of_iterations,
+            maximumNumberOfCorrections=50,
+            maximumNumberOfFunctionEvaluations=1024,
+            costFunctionConvergenceFactor=1e7)
+    elif optimiser == "gradient_descent_line_search":
+        registration.SetOptimizerAsGradientDescentLineSearch(
+            learningRate=1.0, numberOfIterations=number_of_iterations)
+    elif optimiser == "gradient_descent":
+        registration.SetOptimizerAsGradientDescent(
+            learningRate=1.0, numberOfIterations=number_of_iterations)
+    else:
+        raise ValueError("Unknown registration optimiser: %s" % optimiser)
+
+
+def register_images(fixed_image, moving_image, settings=None,
+                    progress_callback=None, interrupt_flag=None,
+                    progress_range=(0, 100)):
+    """
+    Register the moving image onto the fixed image. The images are first
+    aligned by their centres, then a linear transform is optimised on each
+    level of an image pyramid, from the most shrunk level to the least.
+    :param fixed_image: sitk.Image of the fixed (primary) image.
+    :param moving_image: sitk.Image of the moving (secondary) image.
+    :param settings: Dictionary of registration settings, as returned by
+        get_registration_settings(). Read from imageFusion.json if None.
+    :param progress_callback: A signal that receives the progress of the
+        registration after every iteration.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop registering.
+    :param progress_range: Progress emitted at the start and at the end of
+        the registration.
+    :return: Tuple of the moving image resampled onto the fixed image and
+        the sitk.CompositeTransform from the fixed image to the moving
+        image, or None if the registration was interrupted.
+    """
+    if settings is None:
+        settings = get_registration_settings()
+    number_of_iterations = int(settings["number_of_iterations"])
+    number_of_threads = int(settings["number_of_threads"])
+    reg_method = settings["reg_method"].lower()
+    if reg_method not in TRANSFORMS:
+        raise ValueError("Unknown registration method: %s" % reg_method)
+    sampling_strategy = settings["sampling_strategy"].lower()
+    if sampling_strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(
+            "Unknown metric sampling strategy: %s" % sampling_strategy)
+
+    original_moving_image = moving_image
+    fixed_image = sitk.Cast(fixed_image, sitk.sitkFloat32)
+    moving_image = sitk.Cast(moving_image, sitk.sitkFloat32)
+
+    initial_transform = sitk.CenteredTransformInitializer(
+        fixed_image, moving_image, sitk.Euler3DTransform(), False)
+
+    shrink_factors, smooth_sigmas = get_pyramid_schedule(
+        fixed_image.GetSize(), settings["shrink_factors"],
+        settings["smooth_sigmas"])
+
+    registration = sitk.ImageRegistrationMethod()
+    if number_of_threads > 0:
+        registration.SetNumberOfThreads(number_of_threads)
+    registration.SetShrinkFactorsPerLevel(shrink_factors)
+    registration.SetSmoothingSigmasPerLevel(smooth_sigmas)
+    registration.SmoothingSigmasAreSpecifiedInPhysicalUnitsOn()
+    registration.SetMovingInitialTransform(initial_transform)
+    registration.SetInitialTransform(TRANSFORMS[reg_method]())
+    registration.SetInterpolator(sitk.sitkLinear)
+    set_metric(registration, settings["metric"])
+    registration.SetMetricSamplingStrategy(
+        SAMPLING_STRATEGIES[sampling_strategy])
+    registration.SetMetricSamplingPercentagePerLevel(
+        get_sampling_percentages(fixed_image.GetSize(), shrink_factors,
+                                 settings["sampling_rate"]),
+        SAMPLING_SEED)
+    set_optimiser(registration, settings["optimiser"], number_of_iterations)
+    registration.SetOptimizerScalesFromPhysicalShift()
+
+    def iteration_update():
+        if interrupt_flag is not None and interrupt_flag.is_set():
+            registration.StopRegistration()
+            return
+        if progress_callback is not None:
+            level = registration.GetCurrentLevel()
+            iteration = min(registration.GetOptimizerIteration() + 1,
+                            number_of_iterations)
+            done = (level + iteration / max(number_of_iterations, 1)) \
+                / len(shrink_factors)
+            progress = progress_range[0] \
+                + done * (progress_range[1] - progress_range[0])
+            progress_callback.emit(
+                ("Registering images (level %s of %s)..."
+                 % (level + 1, len(shrink_factors)), int(progress)))
+
+    registration.AddCommand(sitk.sitkIterationEvent, iteration_update)
+
+    if interrupt_flag is not None and interrupt_flag.is_set():
+        return None
+    output_transform = registration.Execute(fixed_image, moving_image)
+    if interrupt_flag is not None and interrupt_flag.is_set():
+        return None
+
+    combined_transform = sitk.CompositeTransform(
+        [initial_transform, output_transform])
+
+    if progress_callback is not None:
+        progress_callback.emit(("Resampling moving image...",
+                                progress_range[1]))
+    registered_image = resample_moving_image(
+        fixed_image, original_moving_image, combined_transform, settings)
+
+    return registered_image, combined_transform
+
+
+def resample_moving_image(fixed_image, moving_image, transform,
+                          settings=None):
+    """
+    :param fixed_image: sitk.Image of the fixed (primary) image.
+    :param moving_image: sitk.Image of the moving (secondary) image.
+    :param transform: sitk.Transform from the fixed image to the moving
+        image.
+    :param settings: Dictionary of registration settings, as returned by
+        get_registration_settings(). Read from imageFusion.json if None.
+    :return: The moving image resampled onto the fixed image, with the
+        pixel type of the moving image.
+    """
+    if settings is None:
+        settings = get_registration_settings()
+    number_of_threads = int(settings["number_of_threads"])
+
+    resampler = sitk.ResampleImageFilter()
+    if number_of_threads > 0:
+        resampler.SetNumberOfThreads(number_of_threads)
+    resampler.SetReferenceImage(fixed_image)
+    resampler.SetTransform(transform)
+    resampler.SetDefaultPixelValue(settings["default_value"])
+    resampler.SetInterpolator(settings["final_interp"])
+    return sitk.Cast(resampler.Execute(sitk.Cast(moving_image,
+                                                 sitk.sitkFloat32)),
+                     moving_image.GetPixelIDValue())
@@ -4,8 +4,7 @@ import pydicom
 
 from src.Model import ImageLoading
 from src.Model.CalculateImages import convert_raw_data, get_pixmaps
-from src.Model.GetPatientInfo import get_basic_info, DicomTree, \
-    dict_instance_uid
+from src.Model.GetPatientInfo import get_basic_info, dict_instance_uid
 from src.Model.Isodose import get_dose_pixluts, calculate_rx_dose_in_cgray
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.ROI import ordered_list_rois
@@ -109,17 +108,14 @@ def create_initial_model():
     # Set RTSS attributes
     patient_dict_container.set("file_rtss", filepaths['rtss'])
     patient_dict_container.set("dataset_rtss", dataset['rtss'])
-    dict_raw_contour_data, dict_numpoints = \
-        ImageLoading.get_raw_contour_data(dataset['rtss'])
-    patient_dict_container.set("raw_contour", dict_raw_contour_data)
-
-    # dict_dicom_tree_rtss will be set in advance if the program
-    # generates a new rtss through the execution of
-    # ROI.create_initial_rtss_from_ct(...)
-    if patient_dict_container.get("dict_dicom_tree_rtss") is None:
-        dicom_tree_rtss = DicomTree(filepaths['rtss'])
-        patient_dict_container.set("dict_dicom_tree_rtss",
-                                   dicom_tree_rtss.dict)
+
+    # raw_contour is set in advance when the RTSS is loaded, so that the
+    # contours are only indexed once
+    if patient_dict_container.get("raw_contour") is None:
+        dict_raw_contour_data, dict_numpoints = \
+            ImageLoading.get_raw_contour_data(dataset['rtss'])
+        patient_dict_container.set("raw_contour", dict_raw_contour_data)
+        patient_dict_container.set("num_points", dict_numpoints)
 
     patient_dict_container.set(
         "list_roi_numbers",
@@ -129,16 +125,15 @@ def create_initial_model():
     patient_dict_container.set("dict_polygons_axial", {})
     patient_dict_container.set("dict_polygons_sagittal", {})
     patient_dict_container.set("dict_polygons_coronal", {})
+    patient_dict_container.set("roi_polygon_cache", {})
 
     # Set RTDOSE attributes
     if patient_dict_container.has_modality("rtdose"):
-        dicom_tree_rtdose = DicomTree(filepaths['rtdose'])
-        patient_dict_container.set("dict_dicom_tree_rtdose",
-                                   dicom_tree_rtdose.dict)
-
         patient_dict_container.set("dose_pixluts", get_dose_pixluts(dataset))
 
         patient_dict_container.set("selected_doses", [])
+        patient_dict_container.set("isodose_cache", {})
+        patient_dict_container.set("dose_volume", None)
 
         # overwritten if RTPLAN is present.
         patient_dict_container.set("rx_dose_in_cgray", 1)
@@ -155,21 +150,6 @@ def create_initial_model():
         rx_dose_in_cgray = calculate_rx_dose_in_cgray(dataset["rtplan"])
         patient_dict_container.set("rx_dose_in_cgray", rx_dose_in_cgray)
 
-        dicom_tree_rtplan = DicomTree(filepaths['rtplan'])
-        patient_dict_container.set("dict_dicom_tree_rtplan",
-                                   dicom_tree_rtplan.dict)
-
-    # Set SR attributes
-    if patient_dict_container.has_modality("sr-cd"):
-        dicom_tree_sr_clinical_data = DicomTree(filepaths['sr-cd'])
-        patient_dict_container.set("dict_dicom_tree_sr_cd",
-                                   dicom_tree_sr_clinical_data.dict)
-
-    if patient_dict_container.has_modality("sr-rad"):
-        dicom_tree_sr_pyrad = DicomTree(filepaths['sr-rad'])
-        patient_dict_container.set("dict_dicom_tree_sr_pyrad",
-                                   dicom_tree_sr_pyrad.dict)
-
 
 def create_initial_model_batch():
     """
@@ -258,12 +238,11 @@ def create_initial_model_batch():
     if patient_dict_container.has_modality("rtss"):
         patient_dict_container.set("file_rtss", filepaths['rtss'])
         patient_dict_container.set("dataset_rtss", dataset['rtss'])
-        dict_raw_contour_data, dict_numpoints = \
-            ImageLoading.get_raw_contour_data(dataset['rtss'])
-        patient_dict_container.set("raw_contour", dict_raw_contour_data)
-        dicom_tree_rtss = DicomTree(filepaths['rtss'])
-        patient_dict_container.set("dict_dicom_tree_rtss",
-                                   dicom_tree_rtss.dict)
+        if patient_dict_container.get("raw_contour") is None:
+            dict_raw_contour_data, dict_numpoints = \
+                ImageLoading.get_raw_contour_data(dataset['rtss'])
+            patient_dict_container.set("raw_contour", dict_raw_contour_data)
+            patient_dict_container.set("num_points", dict_numpoints)
 
         patient_dict_container.set(
             "list_roi_numbers",
@@ -273,16 +252,15 @@ def create_initial_model_batch():
         patient_dict_container.set("dict_polygons_axial", {})
         patient_dict_container.set("dict_polygons_sagittal", {})
         patient_dict_container.set("dict_polygons_coronal", {})
+        patient_dict_container.set("roi_polygon_cache", {})
 
     # Set RTDOSE attributes
     if patient_dict_container.has_modality("rtdose"):
-        dicom_tree_rtdose = DicomTree(filepaths['rtdose'])
-        patient_dict_container.set("dict_dicom_tree_rtdose",
-                                   dicom_tree_rtdose.dict)
-
         patient_dict_container.set("dose_pixluts", get_dose_pixluts(dataset))
 
         patient_dict_container.set("selected_doses", [])
+        patient_dict_container.set("isodose_cache", {})
+        patient_dict_container.set("dose_volume", None)
 
         # overwritten if RTPLAN is present.
         patient_dict_container.set("rx_dose_in_cgray", 1)
@@ -298,7 +276,3 @@ def create_initial_model_batch():
         # encoded and have a value
         rx_dose_in_cgray = calculate_rx_dose_in_cgray(dataset["rtplan"])
         patient_dict_container.set("rx_dose_in_cgray", rx_dose_in_cgray)
-
-        dicom_tree_rtplan = DicomTree(filepaths['rtplan'])
-        patient_dict_container.set("dict_dicom_tree_rtplan",
-                                   dicom_tree_rtplan.dict)
@@ -1,8 +1,15 @@
 """ Contains functions required for isodose display """
 
 import numpy as np
+from PySide6 import QtCore, QtGui
+from skimage import measure
 
-from src.Model.ROI import calculate_matrix
+from src.Model.ConnectedComponents import get_voxel_volume
+from src.Model.ImageLoading import calculate_matrix, get_geometry_key
+
+# Distance (in mm) within which an image slice uses a dose plane without
+# interpolating between dose planes
+DOSE_PLANE_THRESHOLD = 0.5
 
 
 def get_dose_pixels(pixlut, doselut, img_ds):
@@ -45,7 +52,7 @@ def get_dose_pixluts(dict_ds):
     """
 
     dict_dose_pixluts = {}
-    dict_dose_pixluts = {}
+    dose_pixluts_by_geometry = {}
     non_img_type = ['rtdose', 'rtplan', 'rtss', 'rtimage']
     dose_data = calculate_matrix(dict_ds['rtdose'])
     for ds in dict_ds:
@@ -54,9 +61,16 @@ def get_dose_pixluts(dict_ds):
                 continue
             else:
                 img_ds = dict_ds[ds]
-                pixlut = calculate_matrix(img_ds)
-                dose_pixlut = get_dose_pixels(pixlut, dose_data, img_ds)
-                dict_dose_pixluts[img_ds.SOPInstanceUID] = dose_pixlut
+                # Slices with the same geometry and patient position
+                # share the same dose pixluts
+                geometry_key = (get_geometry_key(img_ds),
+                                img_ds.PatientPosition)
+                if geometry_key not in dose_pixluts_by_geometry:
+                    pixlut = calculate_matrix(img_ds)
+                    dose_pixluts_by_geometry[geometry_key] = \
+                        get_dose_pixels(pixlut, dose_data, img_ds)
+                dict_dose_pixluts[img_ds.SOPInstanceUID] = \
+                    dose_pixluts_by_geometry[geometry_key]
 
     return dict_dose_pixluts
 
@@ -104,6 +118,347 @@ def get_dose_grid(rtd, z=0):
         return np.array([])
 
 
+class DoseVolume:
+    """
+    The dose grid of an RTDOSE dataset resampled once onto the positions of
+    all image slices, so that the dose plane of a slice is a lookup instead
+    of an interpolation between dose planes.
+    """
+
+    def __init__(self, dataset_rtdose, slices):
+        """
+        :param dataset_rtdose: Data from RTDose file.
+        :param slices: List of tuples (slice UID, position of the slice in
+            mm), in the order of the image slices.
+        """
+        pixel_array = dataset_rtdose.pixel_array
+        if pixel_array.ndim == 2:
+            pixel_array = pixel_array[np.newaxis]
+        self.dose_grid_scaling = float(dataset_rtdose.DoseGridScaling)
+        self.slice_index = {uid: index
+                            for index, (uid, z) in enumerate(slices)}
+
+        offsets = dataset_rtdose.get('GridFrameOffsetVector', [0])
+        planes = rtdose_plane_positions(dataset_rtdose, offsets)
+        positions = np.array([float(z) for uid, z in slices])
+        # Volume (in cm^3) of a voxel of the resampled volume
+        self.voxel_volume = get_voxel_volume(dataset_rtdose.PixelSpacing,
+                                             positions)
+        order = np.argsort(planes)
+        planes = planes[order]
+
+        # Index of the closest dose plane above each slice, and the
+        # fractional distance of the slice from the dose plane below it
+        upper = np.clip(np.searchsorted(planes, positions), 1,
+                        max(len(planes) - 1, 1))
+        lower = upper - 1
+        if len(planes) > 1:
+            fraction = (positions - planes[lower]) \
+                / (planes[upper] - planes[lower])
+        else:
+            upper = lower = np.zeros(len(positions), dtype=int)
+            fraction = np.zeros(len(positions))
+        nearest = np.where(fraction < 0.5, lower, upper)
+        on_plane = np.fabs(planes[nearest] - positions) \
+            < DOSE_PLANE_THRESHOLD
+        fraction = np.where(on_plane, (nearest == upper).astype(float),
+                            fraction)
+        in_grid = on_plane | ((positions >= planes[0])
+                              & (positions <= planes[-1]))
+        fraction = fraction[:, np.newaxis, np.newaxis]
+
+        # Slices outside the dose grid receive no dose
+        self.volume = np.zeros((len(positions),) + pixel_array.shape[1:],
+                               dtype=np.float32)
+        self.volume[in_grid] = \
+            ((1.0 - fraction) * pixel_array[order[lower]]
+             + fraction * pixel_array[order[upper]])[in_grid]
+        self.in_grid = in_grid
+
+    def dose_at_slice(self, slice_uid):
+        """
+        :param slice_uid: SOPInstanceUID of the image slice.
+        :return: 2D numpy array of the dose (in the units of the dose grid)
+            at the slice, or an empty array if the slice is outside the
+            dose grid.
+        """
+        index = self.slice_index[slice_uid]
+        if not self.in_grid[index]:
+            return np.array([])
+        return self.volume[index]
+
+    def dose_at_image_slice(self, slice_uid, dose_pixluts, rows, columns):
+        """
+        Resample the dose at a slice onto the image pixel grid, taking the
+        dose of the closest dose voxel of every image pixel.
+        :param slice_uid: SOPInstanceUID of the image slice.
+        :param dose_pixluts: Dose pixluts of the slice.
+        :param rows: Number of rows of the image.
+        :param columns: Number of columns of the image.
+        :return: 2D numpy array of shape (rows, columns) of the dose (in
+            the units of the dose grid), zero outside the dose grid.
+        """
+        dose_rows = get_dose_indices(dose_pixluts[1], rows)
+        dose_columns = get_dose_indices(dose_pixluts[0], columns)
+        dose = np.zeros((rows, columns), dtype=np.float32)
+        if not self.in_grid[self.slice_index[slice_uid]]:
+            return dose
+        inside = np.ix_(dose_rows >= 0, dose_columns >= 0)
+        dose[inside] = self.volume[self.slice_index[slice_uid]][
+            np.ix_(dose_rows[dose_rows >= 0],
+                   dose_columns[dose_columns >= 0])]
+        return dose
+
+
+def rtdose_plane_positions(dataset_rtdose, offsets):
+    """
+    :param dataset_rtdose: Data from RTDose file.
+    :param offsets: GridFrameOffsetVector of the dose grid.
+    :return: Numpy array of the positions (in mm) of the dose planes.
+    """
+    return dataset_rtdose.ImageOrientationPatient[0] \
+        * np.array(offsets, dtype=float) \
+        + float(dataset_rtdose.ImagePositionPatient[2])
+
+
+def get_dose_indices(dose_pixlut_axis, length):
+    """
+    Find the closest dose voxel of every image pixel along an axis.
+    :param dose_pixlut_axis: Image pixel positions of the dose voxels along
+        the axis.
+    :param length: Number of image pixels along the axis.
+    :return: Numpy array of the dose voxel index of every image pixel, -1
+        for image pixels outside the dose grid.
+    """
+    dose_pixlut_axis = np.asarray(dose_pixlut_axis, dtype=float)
+    if len(dose_pixlut_axis) < 2:
+        return np.full(length, -1)
+    step = dose_pixlut_axis[1] - dose_pixlut_axis[0]
+    indices = np.rint((np.arange(length) - dose_pixlut_axis[0]) / step)
+    indices[(indices < 0) | (indices >= len(dose_pixlut_axis))] = -1
+    return indices.astype(int)
+
+
+def get_dose_volume(patient_dict_container):
+    """
+    Get the dose volume of the patient, resampling the dose grid onto the
+    image slices the first time it is needed.
+    :param patient_dict_container: PatientDictContainer of the patient.
+    :return: DoseVolume object.
+    """
+    dose_volume = patient_dict_container.get("dose_volume")
+    if dose_volume is None:
+        dict_uid = patient_dict_container.get("dict_uid")
+        slices = [(dict_uid[i],
+                   patient_dict_container.dataset[i].ImagePositionPatient[2])
+                  for i in range(len(dict_uid))]
+        dose_volume = DoseVolume(patient_dict_container.dataset['rtdose'],
+                                 slices)
+        patient_dict_container.set("dose_volume", dose_volume)
+    return dose_volume
+
+
+def get_dose_level(selected_dose, rx_dose_in_cgray, dose_grid_scaling):
+    """
+    :param selected_dose: Percentage of the prescription dose.
+    :param rx_dose_in_cgray: Prescription dose in cGy.
+    :param dose_grid_scaling: DoseGridScaling of the RTDose file.
+    :return: The isodose level in the units of the dose grid.
+    """
+    return selected_dose * rx_dose_in_cgray / (dose_grid_scaling * 10000)
+
+
+def calc_dose_polygons(dose_pixluts, contours):
+    """
+    Calculate a list of polygons to display for a given isodose.
+    :param dose_pixluts: Lookup table (LUT) to get the image pixel values.
+    :param contours: List of (N, 2) numpy arrays of (row, column) points of
+        the dose grid which trace the outline of the isodose.
+    :return: List of polygons of type QPolygonF.
+    """
+    list_polygons = []
+    for contour in contours:
+        # Slicing controls how many points considered for visualization
+        # Essentially affects sharpness of edges, fewer points equals
+        # "smoother" edges
+        pixels = dose_grid_to_pixels(dose_pixluts, contour[::2]).astype(int)
+        list_polygons.append(QtGui.QPolygonF(
+            [QtCore.QPointF(x, y) for x, y in pixels.tolist()]))
+    return list_polygons
+
+
+def dose_grid_to_pixels(dose_pixluts, points):
+    """
+    Convert points of the dose grid to image pixels.
+    :param dose_pixluts: Dose pixluts of the slice.
+    :param points: (N, 2) numpy array of (row, column) points of the dose
+        grid, which are truncated to dose grid voxels.
+    :return: (N, 2) numpy array of (x, y) image pixel points.
+    """
+    points = np.asarray(points).reshape(-1, 2).astype(int)
+    return np.column_stack((np.asarray(dose_pixluts[0])[points[:, 1]],
+                            np.asarray(dose_pixluts[1])[points[:, 0]]))
+
+
+def calc_slice_isodoses(grid, dose_pixluts, levels):
+    """
+    Calculate the isodose polygons of a single slice.
+    :param grid: 2D dose grid of the slice, as returned by
+        DoseVolume.dose_at_slice.
+    :param dose_pixluts: Dose pixluts of the slice.
+    :param levels: Dictionary where the keys are selected doses and the
+        values are the isodose levels in the units of the dose grid.
+    :return: Dictionary where the keys are selected doses and the values
+        are lists of QPolygonF.
+    """
+    if grid is None or len(grid) == 0:
+        return {selected_dose: [] for selected_dose in levels}
+    return {selected_dose: calc_dose_polygons(
+                dose_pixluts, measure.find_contours(grid, level))
+            for selected_dose, level in levels.items()}
+
+
+def get_isodose_polygons(isodose_cache, slice_uid, dose_volume,
+                         dose_pixluts, selected_doses, rx_dose_in_cgray):
+    """
+    Get the isodose polygons of a slice from the isodose cache, calculating
+    only the levels which are not cached yet.
+    :param isodose_cache: Dictionary of isodose polygons. Axial polygons
+        are keyed by tuples (slice UID, selected dose, prescription dose in
+        cGy).
+    :param slice_uid: SOPInstanceUID of the slice.
+    :param dose_volume: DoseVolume of the patient.
+    :param dose_pixluts: Dose pixluts of the slice.
+    :param selected_doses: List of selected percentages of the prescription
+        dose.
+    :param rx_dose_in_cgray: Prescription dose in cGy.
+    :return: Dictionary where the keys are selected doses and the values
+        are lists of QPolygonF.
+    """
+    levels = {selected_dose: get_dose_level(selected_dose, rx_dose_in_cgray,
+                                            dose_volume.dose_grid_scaling)
+              for selected_dose in selected_doses
+              if (slice_uid, selected_dose, rx_dose_in_cgray)
+              not in isodose_cache}
+    if levels:
+        grid = dose_volume.dose_at_slice(slice_uid)
+        slice_isodoses = calc_slice_isodoses(grid, dose_pixluts, levels)
+        for selected_dose, polygons in slice_isodoses.items():
+            isodose_cache[(slice_uid, selected_dose, rx_dose_in_cgray)] = \
+                polygons
+    return {selected_dose:
+            isodose_cache[(slice_uid, selected_dose, rx_dose_in_cgray)]
+            for selected_dose in selected_doses}
+
+
+def calc_isodose_cache(isodose_cache, dose_volume, dict_dose_pixluts,
+                       selected_doses, rx_dose_in_cgray,
+                       interrupt_flag=None):
+    """
+    Calculate the isodose polygons of the selected doses of all slices into
+    the isodose cache, so that displaying a slice is only a lookup. Levels
+    which are already cached are skipped.
+    :param isodose_cache: Dictionary of isodose polygons, where the keys are
+        tuples (slice UID, selected dose, prescription dose in cGy).
+    :param dose_volume: DoseVolume of the patient.
+    :param dict_dose_pixluts: Dictionary of dose pixluts, with the slice UIDs
+        as keys.
+    :param selected_doses: List of selected percentages of the prescription
+        dose.
+    :param rx_dose_in_cgray: Prescription dose in cGy.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop calculation, or None.
+    :return: The isodose cache.
+    """
+    selected_doses = list(selected_doses)
+    for slice_uid in dose_volume.slice_index:
+        if interrupt_flag is not None and interrupt_flag.is_set():
+            break
+        get_isodose_polygons(isodose_cache, slice_uid, dose_volume,
+                             dict_dose_pixluts[slice_uid], selected_doses,
+                             rx_dose_in_cgray)
+    return isodose_cache
+
+
+def calc_reslice_isodoses(dose_volume, view, index, dose_pixluts, levels,
+                          pixmap_aspect=1):
+    """
+    Calculate the isodose polygons of a coronal or sagittal slice from the
+    dose volume. The dose plane is taken from the dose voxels closest to
+    the image row (coronal) or column (sagittal), and the contours are
+    mapped onto the image pixels in the same way as ROI contours.
+    :param dose_volume: DoseVolume of the patient.
+    :param view: "coronal" or "sagittal".
+    :param index: Image row (coronal) or column (sagittal) of the slice.
+    :param dose_pixluts: Dose pixluts of the image slices.
+    :param levels: Dictionary where the keys are selected doses and the
+        values are the isodose levels in the units of the dose grid.
+    :param pixmap_aspect: Scaling ratio of the slice positions.
+    :return: Dictionary where the keys are selected doses and the values
+        are lists of QPolygonF.
+    """
+    if view == "coronal":
+        # The dose rows are the cut axis, the dose columns the image x axis
+        cut_lut, in_plane_lut, axis = dose_pixluts[1], dose_pixluts[0], 1
+    else:
+        cut_lut, in_plane_lut, axis = dose_pixluts[0], dose_pixluts[1], 2
+    dose_index = get_dose_indices(cut_lut, index + 1)[index]
+    if dose_index < 0:
+        return {selected_dose: [] for selected_dose in levels}
+    grid = np.take(dose_volume.volume, dose_index, axis=axis)
+    in_plane_lut = np.asarray(in_plane_lut, dtype=float)
+    step = in_plane_lut[1] - in_plane_lut[0] if len(in_plane_lut) > 1 else 1
+
+    slice_isodoses = {}
+    for selected_dose, level in levels.items():
+        polygons = []
+        for contour in measure.find_contours(grid, level):
+            # Contour points are (slice, dose voxel) pairs
+            x = in_plane_lut[0] + contour[:, 1] * step
+            y = contour[:, 0] * pixmap_aspect
+            polygons.append(QtGui.QPolygonF(
+                [QtCore.QPointF(px, py)
+                 for px, py in zip(x.tolist(), y.tolist())]))
+        slice_isodoses[selected_dose] = polygons
+    return slice_isodoses
+
+
+def get_reslice_isodose_polygons(isodose_cache, view, index, dose_volume,
+                                 dose_pixluts, selected_doses,
+                                 rx_dose_in_cgray, pixmap_aspect=1):
+    """
+    Get the isodose polygons of a coronal or sagittal slice from the
+    isodose cache, calculating only the levels which are not cached yet.
+    :param isodose_cache: Dictionary of isodose polygons. Coronal and
+        sagittal polygons are keyed by tuples (view, index, selected dose,
+        prescription dose in cGy).
+    :param view: "coronal" or "sagittal".
+    :param index: Image row (coronal) or column (sagittal) of the slice.
+    :param dose_volume: DoseVolume of the patient.
+    :param dose_pixluts: Dose pixluts of the image slices.
+    :param selected_doses: List of selected percentages of the prescription
+        dose.
+    :param rx_dose_in_cgray: Prescription dose in cGy.
+    :param pixmap_aspect: Scaling ratio of the slice positions.
+    :return: Dictionary where the keys are selected doses and the values
+        are lists of QPolygonF.
+    """
+    levels = {selected_dose: get_dose_level(selected_dose, rx_dose_in_cgray,
+                                            dose_volume.dose_grid_scaling)
+              for selected_dose in selected_doses
+              if (view, index, selected_dose, rx_dose_in_cgray)
+              not in isodose_cache}
+    if levels:
+        slice_isodoses = calc_reslice_isodoses(
+            dose_volume, view, index, dose_pixluts, levels, pixmap_aspect)
+        for selected_dose, polygons in slice_isodoses.items():
+            isodose_cache[(view, index, selected_dose, rx_dose_in_cgray)] = \
+                polygons
+    return {selected_dose:
+            isodose_cache[(view, index, selected_dose, rx_dose_in_cgray)]
+            for selected_dose in selected_doses}
+
+
 def calculate_rx_dose_in_cgray(rtplan):
     GRAY_TO_CGRAY_SCALE_FACTOR = 100
 
@@ -5,8 +5,7 @@ import pydicom
 from src.constants import CT_RESCALE_INTERCEPT
 
 from src.Model.CalculateImages import convert_raw_data, get_pixmaps
-from src.Model.GetPatientInfo import get_basic_info, DicomTree, \
-    dict_instance_uid
+from src.Model.GetPatientInfo import get_basic_info, dict_instance_uid
 from src.Model.Isodose import get_dose_pixluts, calculate_rx_dose_in_cgray
 
 from src.Model.PatientDictContainer import PatientDictContainer
@@ -117,9 +116,6 @@ def create_moving_model():
         moving_dict_container.set("file_rtss", filepaths['rtss'])
         moving_dict_container.set("dataset_rtss", dataset['rtss'])
 
-        dicom_tree_rtss = DicomTree(filepaths['rtss'])
-        moving_dict_container.set("dict_dicom_tree_rtss", dicom_tree_rtss.dict)
-
         moving_dict_container.set("list_roi_numbers", ordered_list_rois(
             moving_dict_container.get("rois")))
         moving_dict_container.set("selected_rois", [])
@@ -128,10 +124,6 @@ def create_moving_model():
 
     # Set RTDOSE attributes
     if moving_dict_container.has_modality("rtdose"):
-        dicom_tree_rtdose = DicomTree(filepaths['rtdose'])
-        moving_dict_container.set(
-            "dict_dicom_tree_rtdose", dicom_tree_rtdose.dict)
-
         moving_dict_container.set("dose_pixluts", get_dose_pixluts(dataset))
 
         moving_dict_container.set("selected_doses", [])
@@ -143,12 +135,9 @@ def create_moving_model():
         rx_dose_in_cgray = calculate_rx_dose_in_cgray(dataset["rtplan"])
         moving_dict_container.set("rx_dose_in_cgray", rx_dose_in_cgray)
 
-        dicom_tree_rtplan = DicomTree(filepaths['rtplan'])
-        moving_dict_container.set("dict_dicom_tree_rtplan",
-                                  dicom_tree_rtplan.dict)
-
 
-def read_images_for_fusion(level=0, window=0):
+def read_images_for_fusion(level=0, window=0, progress_callback=None,
+                           interrupt_flag=None, progress_range=(0, 100)):
     """
     Performs initial image fusion, this is by converting the old and
     new images for transformations into SITK object. Images are co-registered 
@@ -159,6 +148,14 @@ def read_images_for_fusion(level=0, window=0):
         level(int): midpoint of window
         window(Any): range of values, should at least contain low bound and 
         high bound
+        progress_callback: signal that receives the progress of the
+        registration
+        interrupt_flag(threading.Event): tells the function to stop
+        registering
+        progress_range(tuple): progress emitted at the start and at the end
+        of the registration
+    Return:
+        bool: False if the registration was interrupted, True otherwise
     """
     patient_dict_container = PatientDictContainer()
     moving_dict_container = MovingDictContainer()
@@ -190,7 +187,9 @@ def read_images_for_fusion(level=0, window=0):
     new_image = sitk.ReadImage(new_fusion_list)
     moving_dict_container.set("sitk_moving", new_image)
 
-    create_fused_model(orig_image, new_image)
+    if not create_fused_model(orig_image, new_image, progress_callback,
+                              interrupt_flag, progress_range):
+        return False
     color_axial, color_sagittal, color_coronal, tfm = \
         get_fused_window(level, window)
 
@@ -198,3 +197,4 @@ def read_images_for_fusion(level=0, window=0):
     patient_dict_container.set("color_sagittal", color_sagittal)
     patient_dict_container.set("color_coronal", color_coronal)
     moving_dict_container.set("tfm", tfm)
+    return True
@@ -0,0 +1,374 @@
+""" Calculates DVHs of all ROIs of an RTSS from rasterised ROI masks """
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from dicompylercore.dvh import DVH
+
+import src.constants as constant
+from src.Model.ImageLoading import get_contour_data
+
+# Orientations of the image planes of head first patients
+HEAD_FIRST_ORIENTATIONS = ([1, 0, 0, 0, 1, 0], [-1, 0, 0, 0, -1, 0],
+                           [0, -1, 0, 1, 0, 0], [0, 1, 0, -1, 0, 0])
+
+# Distance (in mm) within which a structure plane uses a dose plane without
+# interpolating between dose planes
+DOSE_PLANE_THRESHOLD = 0.5
+
+
+class DoseGrid:
+    """
+    The dose grid of an RTDOSE dataset. Dose planes interpolated at the
+    position of a structure plane are cached, so that ROIs which share a
+    plane share the interpolation.
+    """
+
+    def __init__(self, dataset_rtdose):
+        """
+        :param dataset_rtdose: RTDOSE DICOM dataset object.
+        """
+        self.pixel_array = dataset_rtdose.pixel_array
+        if self.pixel_array.ndim == 2:
+            self.pixel_array = self.pixel_array[np.newaxis]
+        self.scaling = float(dataset_rtdose.DoseGridScaling) * 100
+
+        orientation = [float(value) for value in
+                       dataset_rtdose.ImageOrientationPatient]
+        position = [float(value) for value in
+                    dataset_rtdose.ImagePositionPatient]
+        dist_row, dist_col = [float(value) for value in
+                              dataset_rtdose.PixelSpacing]
+        self.position = np.array(position[0:2])
+        # Patient x, y of a step of one column and of one row
+        self.matrix = np.array([[orientation[0] * dist_col,
+                                 orientation[3] * dist_row],
+                                [orientation[1] * dist_col,
+                                 orientation[4] * dist_row]])
+        self.voxel_area = dist_row * dist_col
+        self.shape = self.pixel_array.shape[1:]
+
+        head_first = any(np.allclose(orientation, head_first_orientation)
+                         for head_first_orientation
+                         in HEAD_FIRST_ORIENTATIONS)
+        z_sign = 1 if head_first else -1
+        offsets = dataset_rtdose.get('GridFrameOffsetVector', [0])
+        self.planes = z_sign * np.array(offsets, dtype=float) + position[2]
+
+        # The maximum dose (in cGy) of the grid
+        self.max_dose = \
+            int(float(self.pixel_array.max()) * self.scaling) + 1
+        self.dose_planes = {}
+
+    def get_dose_plane(self, z):
+        """
+        Get the dose (in cGy) at a structure plane, interpolating
+        linearly between the two closest dose planes if the structure
+        plane does not lie on a dose plane.
+        :param z: Position of the structure plane in mm.
+        :return: 2D numpy array of the dose, or None if the structure plane
+            is outside the dose grid.
+        """
+        if z not in self.dose_planes:
+            distances = np.fabs(self.planes - z)
+            nearest = int(np.argmin(distances))
+            if distances[nearest] < DOSE_PLANE_THRESHOLD:
+                dose_plane = self.pixel_array[nearest]
+            elif z < self.planes.min() or z > self.planes.max():
+                dose_plane = None
+            else:
+                distances[nearest] = distances.max()
+                second_nearest = int(np.argmin(distances))
+                fraction = (z - self.planes[second_nearest]) \
+                    / (self.planes[nearest] - self.planes[second_nearest])
+                dose_plane = fraction * self.pixel_array[nearest] \
+                    + (1.0 - fraction) * self.pixel_array[second_nearest]
+            if dose_plane is not None:
+                dose_plane = dose_plane * self.scaling
+            self.dose_planes[z] = dose_plane
+        return self.dose_planes[z]
+
+    def get_plane_mask(self, contours):
+        """
+        Rasterise the contours of a structure plane onto the dose grid.
+        Contours inside other contours are holes, as for dicompyler.
+        :param contours: List of (N, 3) numpy arrays of contour points.
+        :return: 2D boolean numpy array of the dose grid voxels whose
+            centres lie inside the structure.
+        """
+        inverse = np.linalg.inv(self.matrix)
+        # Contour points in (column, row) voxel coordinates
+        polygons = [(contour[:, 0:2] - self.position) @ inverse.T
+                    for contour in contours]
+        return fill_polygons(self.shape, polygons)
+
+
+def fill_polygons(shape, polygons):
+    """
+    Rasterise polygons with the even-odd rule, i.e. a voxel is inside if a
+    ray from its centre crosses the edges of the polygons an odd number of
+    times. All crossings of all polygons are found at once, and each row
+    is filled with a cumulative sum of the crossings.
+    :param shape: Tuple (rows, columns) of the mask.
+    :param polygons: List of (N, 2) numpy arrays of (column, row) points.
+    :return: 2D boolean numpy array, True for voxels inside the polygons.
+    """
+    rows, columns = shape
+    crossings = np.zeros((rows, columns + 1), dtype=np.int32)
+    for polygon in polygons:
+        if len(polygon) < 3:
+            continue
+        start = polygon
+        end = np.roll(polygon, -1, axis=0)
+        # Each edge crosses the voxel centre rows in [y_min, y_max)
+        first_row = np.ceil(np.minimum(start[:, 1], end[:, 1]))
+        last_row = np.ceil(np.maximum(start[:, 1], end[:, 1]))
+        first_row = np.clip(first_row, 0, rows).astype(np.int64)
+        last_row = np.clip(last_row, 0, rows).astype(np.int64)
+        row_counts = last_row - first_row
+        if row_counts.sum() == 0:
+            continue
+        edges = np.repeat(np.arange(len(polygon)), row_counts)
+        edge_rows = np.arange(row_counts.sum()) \
+            - np.repeat(np.cumsum(row_counts) - row_counts, row_counts) \
+            + first_row[edges]
+        x_start, y_start = start[edges, 0], start[edges, 1]
+        x_end, y_end = end[edges, 0], end[edges, 1]
+        x = x_start + (edge_rows - y_start) * (x_end - x_start) \
+            / (y_end - y_start)
+        # Every voxel centre to the right of a crossing is toggled
+        first_column = np.clip(np.floor(x) + 1, 0, columns).astype(np.int64)
+        np.add.at(crossings, (edge_rows, first_column), 1)
+    return (np.cumsum(crossings, axis=1)[:, :columns] % 2).astype(bool)
+
+
+def get_roi_planes(dataset_rtss):
+    """
+    Get the contours of every ROI, grouped by structure plane.
+    :param dataset_rtss: RTSTRUCT DICOM dataset object.
+    :return: Dictionary where the keys are ROI numbers and the values are
+        dictionaries of lists of (N, 3) numpy arrays of contour points,
+        with the plane position (in mm) as keys.
+    """
+    roi_planes = {}
+    for roi_contour in dataset_rtss.ROIContourSequence:
+        planes = {}
+        for contour in roi_contour.get('ContourSequence', []):
+            points = get_contour_data(contour).reshape(-1, 3)
+            if len(points) == 0:
+                continue
+            z = round(float(points[0][2]), 2)
+            planes.setdefault(z, []).append(points)
+        roi_planes[roi_contour.ReferencedROINumber] = planes
+    return roi_planes
+
+
+def get_plane_thickness(planes):
+    """
+    :param planes: Dictionary of the contours of an ROI, with the plane
+        position as keys.
+    :return: The smallest distance between two planes of the ROI, or 0 if
+        the ROI has only one plane.
+    """
+    positions = np.sort(np.array(list(planes.keys()), dtype=float))
+    if len(positions) < 2:
+        return 0
+    return float(np.diff(positions).min())
+
+
+def calc_dvhs(dataset_rtss, dataset_rtdose, rois, dict_thickness,
+              interrupt_flag=None, dose_limit=None):
+    """
+    Calculate the DVHs of all ROIs. Every ROI is rasterised onto the dose
+    grid, the interpolated dose planes are shared between ROIs, and the
+    histograms of all ROIs are counted in one pass. The DVHs are the same
+    as those of dicompylercore.dvhcalc.get_dvh(..).
+    :param dataset_rtss: RTSTRUCT DICOM dataset object.
+    :param dataset_rtdose: RTDOSE DICOM dataset object.
+    :param rois: Dictionary of ROI information.
+    :param dict_thickness: Dictionary where the keys are ROI numbers and
+        the values are thicknesses of the ROI.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop calculation, or None.
+    :param dose_limit: Limit of dose (in cGy) for DVH calculation.
+    :return: Dictionary of all the DVHs of all the ROIs of the patient, or
+        None if the calculation was interrupted.
+    """
+    return calc_roi_dvhs(DoseGrid(dataset_rtdose),
+                         get_roi_planes(dataset_rtss), rois, dict_thickness,
+                         interrupt_flag, dose_limit)
+
+
+def calc_roi_dvhs(dose_grid, roi_planes, rois, dict_thickness,
+                  interrupt_flag=None, dose_limit=None):
+    """
+    Calculate the DVHs of ROIs from an already parsed dose grid and RTSS.
+    :param dose_grid: DoseGrid of the RTDOSE dataset.
+    :param roi_planes: Contours of every ROI, from get_roi_planes(..).
+    :param rois: Dictionary of ROI information.
+    :param dict_thickness: Dictionary where the keys are ROI numbers and
+        the values are thicknesses of the ROI.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop calculation, or None.
+    :param dose_limit: Limit of dose (in cGy) for DVH calculation.
+    :return: Dictionary of the DVHs of the ROIs, or None if the
+        calculation was interrupted.
+    """
+    max_dose = dose_grid.max_dose
+    if isinstance(dose_limit, int) and dose_limit < max_dose:
+        max_dose = dose_limit
+
+    roi_list = list(rois)
+    roi_bins = []
+    roi_volumes = np.zeros(len(roi_list))
+    for index, roi in enumerate(roi_list):
+        planes = roi_planes.get(roi, {})
+        thickness = dict_thickness.get(roi) or get_plane_thickness(planes)
+        voxel_volume = dose_grid.voxel_area * thickness
+        voxel_count = 0
+        for z, contours in planes.items():
+            mask = dose_grid.get_plane_mask(contours)
+            dose_plane = dose_grid.get_dose_plane(z)
+            in_dose_grid = dose_plane is not None
+            if not in_dose_grid:
+                # Still count the voxels of the plane towards the volume,
+                # using the first dose plane, as dicompyler does
+                dose_plane = dose_grid.get_dose_plane(dose_grid.planes[0])
+            dose = dose_plane[mask]
+            dose = dose[(dose >= 0) & (dose <= max_dose)]
+            voxel_count += dose.size
+            if in_dose_grid:
+                # Doses equal to the maximum dose belong to the last bin
+                bins = np.minimum(dose.astype(np.int64), max_dose - 1)
+                roi_bins.append(bins + index * max_dose)
+        # Volume units are given in cm^3
+        roi_volumes[index] = voxel_count * voxel_volume / 1000
+
+        if interrupt_flag is not None and interrupt_flag.is_set():
+            return None
+
+    histograms = np.bincount(
+        np.concatenate(roi_bins) if roi_bins else np.array([], dtype=int),
+        minlength=len(roi_list) * max_dose).reshape(len(roi_list), max_dose)
+
+    dict_dvh = {}
+    for index, roi in enumerate(roi_list):
+        dict_dvh[roi] = histogram_to_dvh(histograms[index],
+                                         roi_volumes[index],
+                                         rois[roi]['name'])
+    return dict_dvh
+
+
+# Dose grid and ROI contours of the DVH worker process, set once per
+# worker by init_dvh_worker(..) rather than sent along with every chunk.
+_dvh_worker_state = {}
+
+
+def init_dvh_worker(dataset_rtss, dataset_rtdose):
+    """
+    Initializer of the DVH worker processes.
+    :param dataset_rtss: RTSTRUCT DICOM dataset object.
+    :param dataset_rtdose: RTDOSE DICOM dataset object.
+    """
+    _dvh_worker_state['dose_grid'] = DoseGrid(dataset_rtdose)
+    _dvh_worker_state['roi_planes'] = get_roi_planes(dataset_rtss)
+
+
+def calc_dvhs_worker(rois, dict_thickness, dose_limit=None):
+    """
+    Calculate the DVHs of a chunk of ROIs in a DVH worker process.
+    :param rois: Dictionary of the information of the ROIs in the chunk.
+    :param dict_thickness: Dictionary of ROI thicknesses.
+    :param dose_limit: Limit of dose (in cGy) for DVH calculation.
+    :return: Dictionary of the DVHs of the ROIs in the chunk.
+    """
+    return calc_roi_dvhs(_dvh_worker_state['dose_grid'],
+                         _dvh_worker_state['roi_planes'], rois,
+                         dict_thickness, dose_limit=dose_limit)
+
+
+def multi_calc_dvhs(dataset_rtss, dataset_rtdose, rois, dict_thickness,
+                    interrupt_flag=None, dose_limit=None, max_workers=None,
+                    chunk_size=None):
+    """
+    Multiprocessing variant of calc_dvhs. The ROIs are split into chunks
+    and calculated by a bounded pool of worker processes, each of which
+    parses the RTSTRUCT and RTDOSE datasets once when it starts. Works on
+    both fork-based and spawn-based platforms.
+    :param dataset_rtss: RTSTRUCT DICOM dataset object.
+    :param dataset_rtdose: RTDOSE DICOM dataset object.
+    :param rois: Dictionary of ROI information.
+    :param dict_thickness: Dictionary where the keys are ROI numbers and
+        the values are thicknesses of the ROI.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop calculation, or None.
+    :param dose_limit: Limit of dose (in cGy) for DVH calculation.
+    :param max_workers: Maximum number of worker processes. Defaults to
+        constants.DVH_MAX_WORKERS, or the number of CPUs if that is None.
+    :param chunk_size: Number of ROIs given to a worker at a time.
+        Defaults to a size that gives each worker about four chunks.
+    :return: Dictionary of all the DVHs of all the ROIs of the patient, or
+        None if the calculation was interrupted.
+    """
+    roi_list = list(rois)
+    if max_workers is None:
+        max_workers = constant.DVH_MAX_WORKERS or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(roi_list)))
+
+    # Starting worker processes is not worth it for a single worker.
+    if max_workers == 1:
+        return calc_dvhs(dataset_rtss, dataset_rtdose, rois, dict_thickness,
+                         interrupt_flag, dose_limit)
+
+    if chunk_size is None:
+        chunk_size = math.ceil(len(roi_list) / (max_workers * 4))
+    chunk_size = max(chunk_size, 1)
+    chunks = [{roi: rois[roi] for roi in roi_list[i:i + chunk_size]}
+              for i in range(0, len(roi_list), chunk_size)]
+
+    dict_dvh = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers,
+                                   initializer=init_dvh_worker,
+                                   initargs=(dataset_rtss, dataset_rtdose))
+    futures = [executor.submit(calc_dvhs_worker, chunk, dict_thickness,
+                               dose_limit)
+               for chunk in chunks]
+    try:
+        pending = set(futures)
+        while pending:
+            # Wake up regularly to check whether to stop calculating.
+            done, pending = wait(pending, timeout=0.5,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                dict_dvh.update(future.result())
+            if interrupt_flag is not None and interrupt_flag.is_set():
+                return None
+    finally:
+        # Drop the chunks that have not started yet rather than letting
+        # the workers finish them.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    # Keep the order of the ROIs, as calc_dvhs does
+    return {roi: dict_dvh[roi] for roi in roi_list}
+
+
+def histogram_to_dvh(histogram, volume, name):
+    """
+    :param histogram: Numpy array of the number of voxels of an ROI in
+        each 1 cGy dose bin.
+    :param volume: Volume of the ROI in cm^3.
+    :param name: Name of the ROI.
+    :return: Cumulative DVH of the ROI.
+    """
+    if histogram.max() > 0:
+        histogram = np.trim_zeros(histogram * volume / histogram.sum(),
+                                  trim='b')
+        bins = np.arange(0, histogram.size + 1) / 100
+    else:
+        histogram = np.array([0])
+        bins = np.arange(0, 2)
+    return DVH(counts=histogram, bins=bins, dvh_type='differential',
+               dose_units='Gy', name=name).cumulative
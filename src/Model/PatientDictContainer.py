@@ -11,6 +11,7 @@ Keyword arguments for DICOM-RT:
     raw_contour
     num_points
     pixluts
+    pixel_values (3D array of the image slices, shared by the slice datasets)
 """
 from src.Model.Singleton import Singleton
 
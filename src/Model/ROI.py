@@ -4,6 +4,7 @@ import random
 import logging
 from copy import deepcopy
 from pathlib import Path
+import cv2
 import pydicom
 from alphashape import alphashape
 from pydicom.uid import generate_uid
@@ -15,6 +16,7 @@ from scipy.spatial.qhull import QhullError
 from shapely.geometry import Polygon, MultiPolygon, GeometryCollection
 from shapely.validation import make_valid
 
+from src.Model.ImageLoading import calculate_matrix
 from src.Model.MovingDictContainer import MovingDictContainer
 from src.View.util.PatientDictContainerHelper import get_dict_slice_to_uid
 from src.constants import DEFAULT_WINDOW_SIZE
@@ -100,15 +102,6 @@ def add_to_roi(rtss, roi_name, roi_coordinates, data_set):
         :return: rtss, with added ROI
     """
 
-    # Creating a new ROIContourSequence, ContourSequence,
-    # ContourImageSequence
-    contour_sequence = Sequence([Dataset()])
-    contour_image_sequence = Sequence([Dataset()])
-
-    number_of_contour_points = len(roi_coordinates) / 3
-    referenced_sop_class_uid = data_set.SOPClassUID
-    referenced_sop_instance_uid = data_set.SOPInstanceUID
-
     existing_roi_number = None
     for item in rtss["StructureSetROISequence"]:
         if item.ROIName == roi_name:
@@ -124,37 +117,46 @@ def add_to_roi(rtss, roi_name, roi_coordinates, data_set):
     new_contour_number = len(
         rtss.ROIContourSequence[position].ContourSequence) + 1
 
-    # ROI Sequence
-    for contour in contour_sequence:
-        # if data_set.get("ReferencedImageSequence"):
-        contour.add_new(Tag("ContourImageSequence"),
-                        "SQ", contour_image_sequence)
-
-        # Contour Sequence
-        for contour_image in contour_image_sequence:
-            # CT Image Storage
-            contour_image.add_new(Tag("ReferencedSOPClassUID"), "UI",
-                                  referenced_sop_class_uid)
-            contour_image.add_new(Tag("ReferencedSOPInstanceUID"), "UI",
-                                  referenced_sop_instance_uid)
-
-        contour.add_new(Tag("ContourNumber"), "IS", new_contour_number)
-        if not _is_closed_contour(roi_coordinates):
-            contour.add_new(Tag("ContourGeometricType"), "CS", "OPEN_PLANAR")
-            contour.add_new(Tag("NumberOfContourPoints"), "IS",
-                            number_of_contour_points)
-            contour.add_new(Tag("ContourData"), "DS", roi_coordinates)
-        else:
-            contour.add_new(Tag("ContourGeometricType"), "CS", "CLOSED_PLANAR")
-            contour.add_new(Tag("NumberOfContourPoints"), "IS",
-                            number_of_contour_points - 1)
-            contour.add_new(Tag("ContourData"), "DS", roi_coordinates[0:-3])
-
-    rtss.ROIContourSequence[position].ContourSequence.extend(contour_sequence)
+    rtss.ROIContourSequence[position].ContourSequence.append(
+        create_contour(roi_coordinates, data_set, new_contour_number))
 
     return rtss
 
 
+def create_contour(roi_coordinates, data_set, contour_number):
+    """
+    Create the contour dataset of a ContourSequence
+    :param roi_coordinates: Coordinates of pixels for new contour
+    :param data_set: Data Set of selected DICOM image file
+    :param contour_number: ContourNumber of the new contour
+    :return: contour dataset
+    """
+    number_of_contour_points = len(roi_coordinates) / 3
+
+    contour_image = Dataset()
+    # CT Image Storage
+    contour_image.add_new(Tag("ReferencedSOPClassUID"), "UI",
+                          data_set.SOPClassUID)
+    contour_image.add_new(Tag("ReferencedSOPInstanceUID"), "UI",
+                          data_set.SOPInstanceUID)
+
+    contour = Dataset()
+    contour.add_new(Tag("ContourImageSequence"), "SQ",
+                    Sequence([contour_image]))
+    contour.add_new(Tag("ContourNumber"), "IS", contour_number)
+    if not _is_closed_contour(roi_coordinates):
+        contour.add_new(Tag("ContourGeometricType"), "CS", "OPEN_PLANAR")
+        contour.add_new(Tag("NumberOfContourPoints"), "IS",
+                        number_of_contour_points)
+        contour.add_new(Tag("ContourData"), "DS", roi_coordinates)
+    else:
+        contour.add_new(Tag("ContourGeometricType"), "CS", "CLOSED_PLANAR")
+        contour.add_new(Tag("NumberOfContourPoints"), "IS",
+                        number_of_contour_points - 1)
+        contour.add_new(Tag("ContourData"), "DS", roi_coordinates[0:-3])
+    return contour
+
+
 def create_roi(rtss, roi_name, roi_list,
                rt_roi_interpreted_type="ORGAN", rtss_owner="PATIENT"):
     """
@@ -194,6 +196,51 @@ def create_roi(rtss, roi_name, roi_list,
     return rtss
 
 
+def create_rois(rtss, rois_contours, rt_roi_interpreted_type="ORGAN"):
+    """
+    Add the contours of many ROIs to rtss in one pass. The ROI numbers and
+    ROI contours of rtss are indexed once, so that the cost of adding a
+    contour does not grow with the size of rtss. Contours of ROIs which
+    are already in rtss are added to those ROIs.
+    :param rtss: dataset of RTSS
+    :param rois_contours: dictionary where the keys are ROI names and the
+        values are lists of contours to be added to the ROI. Each contour
+        is a dictionary of the coordinates ('coords') of the points of the
+        contour and the data set ('ds') of its DICOM image file.
+    :param rt_roi_interpreted_type: the interpreted type of the new ROIs
+    :return: rtss, with added ROIs
+    """
+    roi_numbers = {}
+    for item in rtss["StructureSetROISequence"]:
+        roi_numbers[item.ROIName] = item.ROINumber
+    roi_contours = {}
+    for roi_contour in rtss.ROIContourSequence:
+        roi_contours[roi_contour.ReferencedROINumber] = roi_contour
+
+    for roi_name, roi_list in rois_contours.items():
+        if not roi_list:
+            continue
+        if roi_name not in roi_numbers:
+            rtss = add_new_roi(rtss, roi_name, roi_list[0]['coords'],
+                               roi_list[0]['ds'], rt_roi_interpreted_type)
+            roi_number = rtss.StructureSetROISequence[-1].ROINumber
+            roi_numbers[roi_name] = roi_number
+            roi_contours[roi_number] = rtss.ROIContourSequence[-1]
+            roi_list = roi_list[1:]
+
+        roi_contour = roi_contours[roi_numbers[roi_name]]
+        if "ContourSequence" not in roi_contour:
+            roi_contour.ContourSequence = Sequence()
+        contour_sequence = roi_contour.ContourSequence
+        first_contour_number = len(contour_sequence) + 1
+        contour_sequence.extend([
+            create_contour(roi_info['coords'], roi_info['ds'],
+                           first_contour_number + index)
+            for index, roi_info in enumerate(roi_list)])
+
+    return rtss
+
+
 def add_new_roi(rtss, roi_name, roi_coordinates, data_set,
                 rt_roi_interpreted_type):
     """
@@ -368,88 +415,25 @@ def get_raw_contour_data(rtss):
     return dict_roi, dict_num_points
 
 
-def calculate_matrix(img_ds):
-    """
-    Calculate the transformation matrix of a DICOM(image) dataset.
-    :param img_ds: DICOM(image) dataset
-    :return: pair of numpy arrays that represents the transformation
-        matrix
-    """
-    # Physical distance (in mm) between the center of each image pixel,
-    # specified by a numeric pair
-    # - adjacent row spacing (delimiter) adjacent column spacing.
-    dist_row = img_ds.PixelSpacing[0]
-    dist_col = img_ds.PixelSpacing[1]
-    # The direction cosines of the first row and the first column with
-    # respect to the patient.
-    # 6 values inside: [Xx, Xy, Xz, Yx, Yy, Yz]
-    orientation = img_ds.ImageOrientationPatient
-    # The x, y, and z coordinates of the upper left hand corner
-    # (center of the first voxel transmitted) of the image, in mm.
-    # 3 values: [Sx, Sy, Sz]
-    position = img_ds.ImagePositionPatient
-
-    # Equation C.7.6.2.1-1.
-    # https://dicom.innolitics.com/ciods/rt-structure-set/roi-contour/30060039/30060040/30060050
-    matrix_m = np.ndarray(
-        shape=(4, 4),
-        buffer=np.array(
-            [
-                [orientation[0] * dist_row, orientation[3] * dist_col, 0,
-                 position[0]],
-                [orientation[1] * dist_row, orientation[4] * dist_col, 0,
-                 position[1]],
-                [orientation[2] * dist_row, orientation[5] * dist_col, 0,
-                 position[2]],
-                [0, 0, 0, 1],
-            ],
-            dtype=float,
-        ),
-    )
-
-    x = []
-    y = []
-    for i in range(0, img_ds.Columns):
-        i_mat = np.matmul(
-            matrix_m,
-            np.ndarray(
-                shape=(4, 1),
-                buffer=np.array([[i], [0], [0], [1]], dtype=float)
-            ),
-        )
-        x.append(float(i_mat[0]))
-
-    for j in range(0, img_ds.Rows):
-        j_mat = np.matmul(
-            matrix_m,
-            np.ndarray(
-                shape=(4, 1),
-                buffer=np.array([[0], [j], [0], [1]], dtype=float)
-            ),
-        )
-        y.append(float(j_mat[1]))
-
-    return np.array(x), np.array(y)
-
-
-def get_pixluts(dict_ds):
-    """
-    Calculate transformation matrices for all the slices.
-    :param dict_ds: a dictionary of all the datasets
-    :return: a dictionary of transformation matrices
-    """
-    dict_pixluts = {}
-    non_img_type = ["rtdose", "rtplan", "rtss"]
-    for ds in dict_ds:
-        if ds not in non_img_type:
-            if isinstance(ds, str) and ds[0:3] == 'sr-':
-                continue
-            else:
-                img_ds = dict_ds[ds]
-                pixlut = calculate_matrix(img_ds)
-                dict_pixluts[img_ds.SOPInstanceUID] = pixlut
-
-    return dict_pixluts
+def first_index_above(pixlut_axis, values, inclusive=False):
+    """
+    Find, for every value, the index of the first entry of a pixel lookup
+    table that is greater than (or, if inclusive, greater than or equal
+    to) the value. Values with no such entry map to 0, as do all values
+    if the lookup table is decreasing, the same as np.argmax/np.argmin of
+    the comparison would.
+    :param pixlut_axis: Lookup table of one axis of a slice.
+    :param values: Numpy array of coordinates along that axis.
+    :param inclusive: Whether an entry equal to the value counts.
+    :return: Numpy array of indices.
+    """
+    pixlut_axis = np.asarray(pixlut_axis)
+    if len(pixlut_axis) == 0 or pixlut_axis[-1] < pixlut_axis[0]:
+        return np.zeros(len(values), dtype=int)
+    side = 'left' if inclusive else 'right'
+    indices = np.searchsorted(pixlut_axis, values, side=side)
+    indices[indices == len(pixlut_axis)] = 0
+    return indices
 
 
 def calculate_pixels(pixlut, contour, prone=False, feetfirst=False):
@@ -461,33 +445,13 @@ def calculate_pixels(pixlut, contour, prone=False, feetfirst=False):
     :param feetfirst: label of feetfirst or head first
     :return: contour pixels
     """
-    pixels = []
-
-    np_x = np.array(pixlut[0])
-    np_y = np.array(pixlut[1])
-    if not feetfirst and not prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmax(np_x > con_x)
-            y = np.argmax(np_y > con_y)
-            pixels.append([x, y])
-    if feetfirst and not prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmin(np_x < con_x)
-            y = np.argmax(np_y > con_y)
-            pixels.append([x, y])
-    if prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmin(np_x < con_x)
-            y = np.argmin(np_y < con_y)
-            pixels.append([x, y])
-
-    return pixels
+    points = np.asarray(contour, dtype=float).reshape(-1, 3)
+    # Head first supine contours take the first pixel past the point,
+    # feet first or prone contours take the first pixel at or past it.
+    x = first_index_above(pixlut[0], points[:, 0],
+                          inclusive=feetfirst or prone)
+    y = first_index_above(pixlut[1], points[:, 1], inclusive=prone)
+    return np.column_stack((x, y)).tolist()
 
 
 def calculate_pixels_sagittal(pixlut, contour, prone=False, feetfirst=False):
@@ -498,35 +462,32 @@ def calculate_pixels_sagittal(pixlut, contour, prone=False, feetfirst=False):
     :param prone: label of prone
     :param feetfirst: label of feetfirst or head first
     :return: contour pixels
-    Parameters
-    ----------
-    contour : object
     """
-    pixels = []
-    np_x = np.array(pixlut[0])
-    np_y = np.array(pixlut[1])
-    if not feetfirst and not prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmax(np_x > con_x)
-            y = np.argmax(np_y > con_y)
-            pixels.append([x, y])
-    if feetfirst and not prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmin(np_x < con_x)
-            y = np.argmax(np_y > con_y)
-            pixels.append([x, y])
-    if prone:
-        for i in range(0, len(contour), 3):
-            con_x = contour[i]
-            con_y = contour[i + 1]
-            x = np.argmin(np_x < con_x)
-            y = np.argmin(np_y < con_y)
-            pixels.append([x, y])
-    return pixels
+    return calculate_pixels(pixlut, contour, prone, feetfirst)
+
+
+def calculate_pixels_of_contours(pixlut, contours, prone=False,
+                                 feetfirst=False):
+    """
+    Calculate (Convert) the points of all contours of a slice at once.
+    :param pixlut: transformation matrix of the slice
+    :param contours: list of raw contour data (3D)
+    :param prone: label of prone
+    :param feetfirst: label of feetfirst or head first
+    :return: list of contour pixels, one per contour
+    """
+    if not contours:
+        return []
+    lengths = [len(contour) // 3 for contour in contours]
+    pixels = calculate_pixels(pixlut, np.concatenate(
+        [np.asarray(contour, dtype=float) for contour in contours]),
+        prone, feetfirst)
+    contours_pixels = []
+    start = 0
+    for length in lengths:
+        contours_pixels.append(pixels[start:start + length])
+        start += length
+    return contours_pixels
 
 
 def convert_hull_list_to_contours_data(rois_to_save, patient_dict_container):
@@ -565,14 +526,10 @@ def convert_hull_to_single_array_of_rcs(patient_dict_container, pixel_hull,
     :param slider_id: UID of image slice
     :return: list of contour data
     """
-    hull = convert_hull_to_rcs(patient_dict_container, pixel_hull, slider_id)
-
-    # Convert the polygon's pixel points to RCS locations.
-    single_array = []
-    for sublist in hull:
-        for item in sublist:
-            single_array.append(item)
-    return single_array
+    dataset = patient_dict_container.dataset[slider_id]
+    pixlut = patient_dict_container.get("pixluts")[
+        dataset.SOPInstanceUID]
+    return pixels_to_rcs(pixlut, pixel_hull, round(dataset.SliceLocation))
 
 
 def convert_hull_to_rcs(patient_dict_container, hull_pts, slider_id):
@@ -589,22 +546,10 @@ def convert_hull_to_rcs(patient_dict_container, hull_pts, slider_id):
     coordinates ordered to form a polygon
 
     """
-    dataset = patient_dict_container.dataset[slider_id]
-    pixlut = patient_dict_container.get("pixluts")[
-        dataset.SOPInstanceUID]
-    z_coord = dataset.SliceLocation
-    points = []
-
-    # Convert the pixels to an RCS location and move them to a list of
-    # points.
-    for i, item in enumerate(hull_pts):
-        points.append(pixel_to_rcs(pixlut, round(item[0]), round(item[1])))
-
-    contour_data = []
-    for p in points:
-        coords = (p[0], p[1], round(z_coord))
-        contour_data.append(coords)
-    return contour_data
+    single_array = convert_hull_to_single_array_of_rcs(
+        patient_dict_container, hull_pts, slider_id)
+    return [tuple(single_array[i:i + 3])
+            for i in range(0, len(single_array), 3)]
 
 
 def pixel_to_rcs(pixlut, x, y):
@@ -627,6 +572,26 @@ def pixel_to_rcs(pixlut, x, y):
     return x_on_pixlut, y_on_pixlut
 
 
+def pixels_to_rcs(pixlut, points, z_coord):
+    """
+    Convert all the pixel points of a contour to RCS points in one
+    operation, as pixel_to_rcs(..) does for a single point.
+    :param pixlut: Transformation matrix
+    :param points: (N, 2) array of (x, y) pixel points, which are rounded
+        to the nearest pixel
+    :param z_coord: z coordinate of the image slice
+    :return: ContourData of the contour, i.e. a flat list of the x, y and
+        z coordinates of every point.
+    """
+    points = np.rint(np.asarray(points, dtype=float).reshape(-1, 2))
+    points = points.astype(int)
+    contour_data = np.empty((len(points), 3))
+    contour_data[:, 0] = np.asarray(pixlut[0])[points[:, 0] - 1]
+    contour_data[:, 1] = np.asarray(pixlut[1])[points[:, 1] - 1]
+    contour_data[:, 2] = z_coord
+    return contour_data.ravel().tolist()
+
+
 def get_contour_pixel(
         dict_raw_contour_data,
         roi_selected,
@@ -653,12 +618,8 @@ def get_contour_pixel(
         # slice
         dict_pixels_of_roi = collections.defaultdict(list)
         raw_contours = dict_raw_contour_data[roi]
-        number_of_contours = len(raw_contours[curr_slice])
-        for i in range(number_of_contours):
-            contour_pixels = calculate_pixels(
-                pixlut, raw_contours[curr_slice][i], prone, feetfirst
-            )
-            dict_pixels_of_roi[curr_slice].append(contour_pixels)
+        dict_pixels_of_roi[curr_slice].extend(calculate_pixels_of_contours(
+            pixlut, raw_contours[curr_slice], prone, feetfirst))
         dict_pixels[roi] = dict_pixels_of_roi
 
     return dict_pixels
@@ -679,11 +640,9 @@ def get_roi_contour_pixel(dict_raw_contour_data, roi_list, dict_pixluts):
         raw_contour = dict_raw_contour_data[roi]
         for roi_slice in raw_contour:
             pixlut = dict_pixluts[roi_slice]
-            number_of_contours = len(raw_contour[roi_slice])
-            for i in range(number_of_contours):
-                contour_pixels = calculate_pixels(pixlut,
-                                                  raw_contour[roi_slice][i])
-                dict_pixels_of_roi[roi_slice].append(contour_pixels)
+            dict_pixels_of_roi[roi_slice].extend(
+                calculate_pixels_of_contours(pixlut,
+                                             raw_contour[roi_slice]))
         dict_pixels[roi] = dict_pixels_of_roi
     return dict_pixels
 
@@ -691,7 +650,9 @@ def get_roi_contour_pixel(dict_raw_contour_data, roi_list, dict_pixluts):
 def transform_rois_contours(axial_rois_contours):
     """
        Transform the axial ROI contours into coronal and sagittal
-       contours
+       contours. The axial contours of each ROI are rasterised into a
+       mask volume, and the outlines of the ROI in every coronal and
+       sagittal plane are traced on the mask.
        :param axial_rois_contours: the dictionary of axial ROI contours
        :return: Tuple of coronal and sagittal ROI contours
     """
@@ -701,50 +662,78 @@ def transform_rois_contours(axial_rois_contours):
     for name in axial_rois_contours.keys():
         coronal_rois_contours[name] = {}
         sagittal_rois_contours[name] = {}
-        for slice_id in slice_ids:
-            contours = axial_rois_contours[name][slice_id]
-            for contour in contours:
-                for i in range(len(contour)):
-                    if contour[i][1] in coronal_rois_contours[name]:
-                        coronal_rois_contours[name][contour[i][1]][0] \
-                            .append([contour[i][0], slice_ids[slice_id]])
-                    else:
-                        coronal_rois_contours[name][contour[i][1]] = [[]]
-                        coronal_rois_contours[name][contour[i][1]][0] \
-                            .append([contour[i][0], slice_ids[slice_id]])
-
-                    if contour[i][0] in sagittal_rois_contours[name]:
-                        sagittal_rois_contours[name][contour[i][0]][0] \
-                            .append([contour[i][1], slice_ids[slice_id]])
-                    else:
-                        sagittal_rois_contours[name][contour[i][0]] = [[]]
-                        sagittal_rois_contours[name][contour[i][0]][0] \
-                            .append([contour[i][1], slice_ids[slice_id]])
-
-    coronal_rois_contours = convert_coordinates_map_to_polygon_of_rois(
-        coronal_rois_contours)
-    sagittal_rois_contours = convert_coordinates_map_to_polygon_of_rois(
-        sagittal_rois_contours)
+        rasterised = rasterise_roi_contours(axial_rois_contours[name],
+                                            slice_ids)
+        if rasterised is None:
+            continue
+        mask, (slice_offset, row_offset, column_offset) = rasterised
+
+        for row in np.flatnonzero(mask.any(axis=(0, 2))):
+            coronal_rois_contours[name][int(row) + row_offset] = \
+                mask_to_polygons(mask[:, row, :], column_offset,
+                                 slice_offset)
+        for column in np.flatnonzero(mask.any(axis=(0, 1))):
+            sagittal_rois_contours[name][int(column) + column_offset] = \
+                mask_to_polygons(mask[:, :, column], row_offset,
+                                 slice_offset)
+
     return coronal_rois_contours, sagittal_rois_contours
 
 
-def convert_coordinates_map_to_polygon_of_rois(contours_map):
+def rasterise_roi_contours(roi_contours, slice_ids):
     """
-
-    this function converts a map (dictionary) of ROI contours into polygon for
-    better ROI display
-
-    :param contours_map: a map(dictionary) of ROI contours.
-
+    Rasterise the axial contours of an ROI into a mask volume that covers
+    the bounding box of the ROI.
+    :param roi_contours: dictionary of the contour pixels of the ROI,
+        with slice UIDs as keys
+    :param slice_ids: dictionary of slice indices with slice UIDs as keys
+    :return: Tuple (mask, offset), where mask is a uint8 array indexed
+        by (slice, row, column) and offset is the (slice, row, column)
+        index of the first voxel of the mask, or None if the ROI has no
+        contours.
     """
-    polygon_dict = {}
-    for name, contours_dict in contours_map.items():
-        polygon_dict[name] = {}
-        for slice_id, contour_array in contours_dict.items():
-            roi_array = contour_array[0]
-            hull_list = calculate_concave_hull_of_points(roi_array, alpha=0)
-            polygon_dict[name][slice_id] = hull_list
-    return polygon_dict
+    slice_contours = []
+    for slice_uid, contours in roi_contours.items():
+        if slice_uid not in slice_ids:
+            continue
+        for contour in contours:
+            if len(contour):
+                slice_contours.append(
+                    (slice_ids[slice_uid], np.asarray(contour, dtype=int)))
+    if not slice_contours:
+        return None
+
+    points = np.concatenate([contour for _, contour in slice_contours])
+    slice_indices = [slice_index for slice_index, _ in slice_contours]
+    offset = (min(slice_indices), int(points[:, 1].min()),
+              int(points[:, 0].min()))
+    shape = (max(slice_indices) - offset[0] + 1,
+             int(points[:, 1].max()) - offset[1] + 1,
+             int(points[:, 0].max()) - offset[2] + 1)
+
+    mask = np.zeros(shape, dtype=np.uint8)
+    for slice_index, contour in slice_contours:
+        points = (contour - (offset[2], offset[1])).astype(np.int32)
+        cv2.fillPoly(mask[slice_index - offset[0]], [points], 1)
+    return mask, offset
+
+
+def mask_to_polygons(plane, x_offset, y_offset):
+    """
+    Trace the outlines of a 2D mask.
+    :param plane: 2D uint8 array indexed by (y, x)
+    :param x_offset: x coordinate of the first column of the plane
+    :param y_offset: y coordinate of the first row of the plane
+    :return: List of lists of [x, y] points ordered to form polygon(s).
+    """
+    contours = cv2.findContours(
+        np.ascontiguousarray(plane), cv2.RETR_EXTERNAL,
+        cv2.CHAIN_APPROX_SIMPLE)[-2]
+    polygon_list = []
+    for contour in contours:
+        points = contour.reshape(-1, 2) + (x_offset, y_offset)
+        polygon_list.append(points.tolist())
+    return polygon_list
 
 
 def calculate_concave_hull_of_points(pixel_coords, alpha=0.2):
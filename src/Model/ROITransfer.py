@@ -1,17 +1,33 @@
-import SimpleITK as sitk
-from pathlib import Path
+import logging
 
-import pydicom
 import numpy as np
 import SimpleITK as sitk
 
-from loguru import logger
-from platipy.dicom.io.rtstruct_to_nifti import fix_missing_data
+from skimage import measure
 from skimage.draw import polygon
 
+from src.Model.ImageLoading import get_contour_data
 from src.View.util.ProgressWindowHelper import check_interrupt_flag
 
 
+def physical_points_to_index(image, points):
+    """
+    Convert physical points to the indices of the voxels of an image they
+    are in, for all points in one operation, as
+    image.TransformPhysicalPointToIndex(..) does for a single point.
+    :param image: sitk.Image the points are on
+    :param points: (N, 3) numpy array of (x, y, z) physical points
+    :return: (N, 3) int numpy array of (x, y, z) voxel indices
+    """
+    direction = np.array(image.GetDirection()).reshape(3, 3)
+    physical_to_index = np.linalg.inv(
+        direction * np.array(image.GetSpacing()))
+    continuous_index = \
+        (points - np.array(image.GetOrigin())) @ physical_to_index.T
+    # Halves are rounded up, as ITK does
+    return np.floor(continuous_index + 0.5).astype(int)
+
+
 def transform_point_set_from_dicom_struct(dicom_image, dicom_struct,
                                           struct_name_sequence,
                                           spacing_override=None,
@@ -19,7 +35,10 @@ def transform_point_set_from_dicom_struct(dicom_image, dicom_struct,
     """Converts a set of points from a DICOM RTSTRUCT into a mask array.
     This function is modified from the function
     platipy.dicom.io.transform_point_set_from_dicom_struct to align with
-    the specific usage of OnkoDICOM.
+    the specific usage of OnkoDICOM. All structures are filled into one
+    label image, where each structure is one bit of the label of a voxel
+    (see get_roi_mask()). Contours which are not on one axial slice of the
+    image are skipped.
 
     Args:
         dicom_image (sitk.Image): The reference image
@@ -28,7 +47,8 @@ def transform_point_set_from_dicom_struct(dicom_image, dicom_struct,
         spacing_override (list): The spacing to override. Defaults to None
         interrupt_flag: interrupt flag to stop the process
     Returns:
-        tuple: Returns a list of masks and a list of structure names
+        tuple: Returns the label image (None if no structure has contours)
+        and a list of structure names, in the order of their bits
 
     """
     if spacing_override:
@@ -51,88 +71,126 @@ def transform_point_set_from_dicom_struct(dicom_image, dicom_struct,
     roi_indexes = {}
     for index, roi_name in enumerate(all_name_sequence):
         if roi_name in struct_name_sequence:
+            if len(struct_point_sequence[index].get("ContourSequence",
+                                                    [])) == 0:
+                logging.debug(
+                    "No contours found for structure %s, skipping.",
+                    roi_name)
+                continue
             roi_indexes[roi_name] = index
 
-    struct_list = []
-    final_struct_name_sequence = []
-
-    for struct_name in roi_indexes.keys():
-        if interrupt_flag is not None and \
-                not check_interrupt_flag(interrupt_flag):
-            return [], []
-
-        struct_index = roi_indexes[struct_name]
-        image_blank = np.zeros(dicom_image.GetSize()[::-1], dtype=np.uint8)
-        logger.debug(
-            "Converting structure {0} with name: {1}".format(struct_index,
-                                                             struct_name))
+    final_struct_name_sequence = list(roi_indexes)
+    if not final_struct_name_sequence:
+        return None, []
 
-        if not hasattr(struct_point_sequence[struct_index], "ContourSequence"):
-            logger.debug(
-                "No contour sequence found for this structure, skipping.")
-            continue
+    size = dicom_image.GetSize()
+    labels = np.zeros(size[::-1] + ((len(roi_indexes) + 7) // 8,),
+                      dtype=np.uint8)
+    slice_arr = np.zeros(size[1::-1], dtype=bool)
 
-        if len(struct_point_sequence[struct_index].ContourSequence) == 0:
-            logger.debug(
-                "Contour sequence empty for this structure, skipping.")
-            continue
-
-        if len(struct_point_sequence[struct_index].ContourSequence) == 0:
-            logger.debug(
-                "Contour sequence empty for this structure, skipping.")
-            continue
-
-        for sl in range(
-                len(struct_point_sequence[struct_index].ContourSequence)):
+    for roi_index, (struct_name, struct_index) in \
+            enumerate(roi_indexes.items()):
+        logging.debug("Converting structure %d with name: %s",
+                      struct_index, struct_name)
 
+        for contour in struct_point_sequence[struct_index].ContourSequence:
             if interrupt_flag is not None and \
                     not check_interrupt_flag(interrupt_flag):
-                return [], []
-
-            contour_data = fix_missing_data(
-                struct_point_sequence[struct_index].ContourSequence[
-                    sl].ContourData
-            )
-
-            struct_slice_contour_data = np.array(contour_data, dtype=np.double)
-            vertex_arr_physical = struct_slice_contour_data.reshape(
-                struct_slice_contour_data.shape[0] // 3, 3
-            )
+                return None, []
+
+            try:
+                contour_data = get_contour_data(contour)
+            except ValueError:
+                contour_data = np.empty(0)
+            if len(contour_data) == 0 or len(contour_data) % 3:
+                logging.warning(
+                    "Invalid contour data in structure %s, skipping "
+                    "contour.", struct_name)
+                continue
 
-            point_arr = np.array(
-                [dicom_image.TransformPhysicalPointToIndex(i) for i in
-                 vertex_arr_physical]
-            ).T
+            point_arr = physical_points_to_index(
+                dicom_image, contour_data.reshape(-1, 3)).T
 
             [x_vertex_arr_image, y_vertex_arr_image] = point_arr[[0, 1]]
             z_index = point_arr[2][0]
             if np.any(point_arr[2] != z_index):
-                logger.debug(
-                    "Error: axial slice index varies in contour. Quitting now.")
-                logger.debug("Structure:   {0}".format(struct_name))
-                logger.debug("Slice index: {0}".format(z_index))
-                quit()
-
-            if z_index >= dicom_image.GetSize()[2]:
-                logger.debug(
-                    "Warning: Slice index greater than image size. Skipping "
-                    "slice.")
-                logger.debug("Structure:   {0}".format(struct_name))
-                logger.debug("Slice index: {0}".format(z_index))
+                logging.warning(
+                    "Axial slice index varies in contour of structure %s, "
+                    "skipping contour.", struct_name)
                 continue
 
-            slice_arr = np.zeros(image_blank.shape[-2:], dtype=np.uint8)
+            if not 0 <= z_index < size[2]:
+                logging.warning(
+                    "Slice index %d of structure %s is outside the image, "
+                    "skipping contour.", z_index, struct_name)
+                continue
 
             filled_indices_x, filled_indices_y = polygon(
                 x_vertex_arr_image, y_vertex_arr_image, shape=slice_arr.shape
             )
-            slice_arr[filled_indices_y, filled_indices_x] = 1
+            slice_arr[:] = False
+            slice_arr[filled_indices_y, filled_indices_x] = True
+            set_roi_mask(labels[z_index], roi_index, slice_arr)
+
+    roi_labels = sitk.GetImageFromArray(labels, isVector=True)
+    roi_labels.CopyInformation(dicom_image)
+    return roi_labels, final_struct_name_sequence
+
+
+def set_roi_mask(labels, roi_index, mask):
+    """
+    Add a mask to the voxels of an ROI in its bit of the labels.
+    :param labels: uint8 numpy array of ROI labels, with the components
+        of the labels of each voxel on the last axis, where ROI i is bit
+        (7 - i % 8) of component i // 8
+    :param roi_index: index of the ROI in the labels
+    :param mask: boolean numpy array of the voxels to add to the ROI
+    """
+    labels[..., roi_index // 8] |= \
+        mask.astype(np.uint8) << (7 - roi_index % 8)
 
-            image_blank[z_index] += slice_arr
 
-        struct_image = sitk.GetImageFromArray(1 * (image_blank > 0))
-        struct_image.CopyInformation(dicom_image)
-        struct_list.append(sitk.Cast(struct_image, sitk.sitkUInt8))
-        final_struct_name_sequence.append(struct_name)
+def resample_roi_labels(roi_labels, transform, reference_image):
+    """
+    Resample the labels of all ROIs onto a reference image in one pass.
+    :param roi_labels: sitk.Image of ROI labels, from
+        transform_point_set_from_dicom_struct()
+    :param transform: sitk.Transform from the reference image to the ROI
+        labels
+    :param reference_image: sitk.Image the labels are resampled onto
+    :return: (slices, rows, columns, components) uint8 numpy array of the
+        resampled labels
+    """
+    resampled = sitk.Resample(roi_labels, reference_image, transform,
+                              sitk.sitkNearestNeighbor, 0)
+    labels = sitk.GetArrayFromImage(resampled)
+    return labels.reshape(labels.shape[:3] + (-1,))
 
-    return struct_list, final_struct_name_sequence
+
+def get_roi_mask(labels, roi_index):
+    """
+    :param labels: numpy array of ROI labels, from resample_roi_labels()
+    :param roi_index: index of the ROI in the labels
+    :return: boolean numpy array (slices, rows, columns) of the ROI
+    """
+    return (labels[..., roi_index // 8] & (0x80 >> roi_index % 8)) > 0
+
+
+def calc_mask_contours(mask):
+    """
+    Contour every slice of a mask with marching squares.
+    :param mask: boolean numpy array (slices, rows, columns)
+    :return: dictionary of the slice indices of the slices with voxels in
+        the mask, and their lists of contours, where a contour is an (N, 2)
+        numpy array of (row, column) points within the slice.
+    """
+    slice_contours = {}
+    upper = np.array(mask.shape[1:]) - 1
+    for slice_index in np.flatnonzero(mask.any(axis=(1, 2))):
+        # Pad the slice so that contours touching its edges are closed,
+        # and keep their points on the slice
+        plane = np.pad(mask[slice_index].astype(np.uint8), 1)
+        slice_contours[slice_index] = [
+            np.clip(contour - 1, 0, upper)
+            for contour in measure.find_contours(plane, 0.5)]
+    return slice_contours
@@ -1,72 +1,144 @@
 import os
+
+import numpy as np
 import pandas as pd
-import platform
+import SimpleITK as sitk
 from radiomics import featureextractor
 
+from src.Model import ImageLoading
+from src.Model.CalculateImages import get_rescale
+from src.Model.NativeDVH import fill_polygons
+
 
-def convert_to_nrrd(path, nrrd_output_path):
+def get_image_slices(datasets):
     """
-    Convert dicom files to nrrd.
-    :param path: Path to patient directory (str)
-    :param nrrd_file_path: Path to nrrd folder (str)
+    :param datasets: Dictionary of the datasets of a patient, as in
+        PatientDictContainer.dataset, where image slices have int keys.
+    :return: List of the image slices, in slice order.
     """
-    path = '"' + path + '"'
-    nrrd_file_path = '"' + nrrd_output_path + '"'
-
-    # Command to convert dicom files to nrrd
-    # Writes the result from the processing into a temporary file
-    # rather than the terminal
-    cmd_for_nrrd = 'plastimatch convert --input ' + path + \
-                   ' --output-img ' + nrrd_file_path + ' 1>' + path + '/NUL'
+    return [datasets[key] for key in sorted(
+        key for key in datasets if isinstance(key, int))]
 
-    # Command to delete the temporary file generated before
-    cmd_del_nul = 'rm ' + path[:-1] + '/NUL' + '"'
 
-    os.system(cmd_for_nrrd)
-
-    if os.path.exists(path[1:-1] + '/NUL'):
-        if platform.system() != "Windows":
-            os.system(cmd_del_nul)
-        else:
-            cmd_del_nul = 'del ' + path[:-1] + '/NUL' + '"'
-            os.system(cmd_del_nul)
+def set_image_geometry(image, image_slices):
+    """
+    Set the origin, spacing and direction of an image to those of the
+    volume of the image slices.
+    :param image: SimpleITK image of (slices, rows, columns) voxels.
+    :param image_slices: List of image slices, in slice order.
+    """
+    first_slice = image_slices[0]
+    orientation = np.array(first_slice.ImageOrientationPatient, dtype=float)
+    origin = np.array(first_slice.ImagePositionPatient, dtype=float)
+    if len(image_slices) > 1:
+        offset = np.array(image_slices[-1].ImagePositionPatient,
+                          dtype=float) - origin
+        slice_spacing = np.linalg.norm(offset) / (len(image_slices) - 1)
+        slice_direction = offset / np.linalg.norm(offset)
+    else:
+        slice_spacing = float(first_slice.get('SliceThickness') or 1)
+        slice_direction = np.cross(orientation[:3], orientation[3:])
+    image.SetOrigin(origin.tolist())
+    image.SetSpacing((float(first_slice.PixelSpacing[1]),
+                      float(first_slice.PixelSpacing[0]), slice_spacing))
+    image.SetDirection(np.column_stack(
+        (orientation[:3], orientation[3:], slice_direction)).ravel().tolist())
+
+
+def get_rescaled_pixels(image_slice, scaled=False, is_ct=False):
+    """
+    Get the pixel values of an image slice in the units of the rescaled
+    pixel values (e.g. HU).
+    :param image_slice: Image slice dataset.
+    :param scaled: True if the pixel array of the slice has already been
+        rescaled by convert_raw_data(), which adds the rounded intercept
+        of get_rescale(), and the CT shift for CT images.
+    :param is_ct: True if the pixel array was rescaled as a CT image.
+    :return: numpy array of the rescaled pixel values.
+    """
+    intercept = float(image_slice.get('RescaleIntercept', 0))
+    if scaled:
+        # The slope is already applied, replace the intercept that was
+        # added with the exact one
+        _, scaled_intercept = get_rescale(image_slice, is_ct)
+        return image_slice.pixel_array - scaled_intercept + intercept
+    return image_slice.pixel_array \
+        * float(image_slice.get('RescaleSlope', 1)) + intercept
 
 
-def convert_rois_to_nrrd(path, rtss_path, mask_folder_path):
+def create_image(image_slices, scaled=False, is_ct=False):
     """
-    Generate an nrrd file for each region of interest using Plastimatch.
-    :param path:                Path to patient directory (str)
-    :param rtss_path:           Path to RT-Struct file (str)
-    :param mask_folder_path:    Folder to which the segmentation masks
-                                will be saved(str)
+    Create the image volume of the image slices, in the units of the
+    rescaled pixel values (e.g. HU).
+    :param image_slices: List of image slices, in slice order.
+    :param scaled: True if the pixel arrays of the slices have already
+        been rescaled by convert_raw_data(), as in the loaded
+        PatientDictContainer.
+    :param is_ct: True if the pixel arrays were rescaled as CT images.
+    :return: SimpleITK image.
     """
-    path = '"' + path + '"'
-    mask_folder_path = '"' + mask_folder_path + '"'
-    rtss_path = '"' + rtss_path + '"'
-    # Command for generating an nrrd file for each region of interest
-    cmd_for_segmask = 'plastimatch convert --input ' + rtss_path + \
-        ' --output-prefix ' + mask_folder_path + \
-        ' --prefix-format nrrd --referenced-ct ' + path + ' 1>' + \
-        path + '/NUL'
-    cmd_del_nul = 'rm ' + path[:-1] + '/NUL' + '"'
-    os.system(cmd_for_segmask)
-
-    if os.path.exists(path[1:-1] + '/NUL'):
-        if platform.system() != "Windows":
-            os.system(cmd_del_nul)
-        else:
-            cmd_del_nul = 'del ' + path[:-1] + '/NUL' + '"'
-            os.system(cmd_del_nul)
+    volume = np.stack([
+        get_rescaled_pixels(image_slice, scaled, is_ct)
+        for image_slice in image_slices]).astype(np.float32)
+    image = sitk.GetImageFromArray(volume)
+    set_image_geometry(image, image_slices)
+    return image
 
 
-def get_radiomics_df(path, patient_hash, nrrd_file_path, mask_folder_path):
+def create_roi_masks(image, image_slices, dataset_rtss, interrupt_flag=None):
+    """
+    Rasterise the contours of every ROI onto the image volume. The
+    contours of a slice are filled with the even-odd rule, so that a
+    contour inside another one is a hole.
+    :param image: SimpleITK image of the image slices.
+    :param image_slices: List of image slices, in slice order.
+    :param dataset_rtss: RTSTRUCT DICOM dataset object.
+    :param interrupt_flag: A threading.Event() object that tells the
+        function to stop.
+    :return: Dictionary of SimpleITK masks, with the value 1 inside the
+        ROI, with the names of the ROIs as keys. ROIs which do not cover
+        any voxel are left out. Empty if interrupted.
+    """
+    dict_roi, _ = ImageLoading.get_raw_contour_data(dataset_rtss)
+    slice_ids = {image_slice.SOPInstanceUID: slice_id
+                 for slice_id, image_slice in enumerate(image_slices)}
+    # Transformation of patient coordinates to continuous voxel indices
+    origin = np.array(image.GetOrigin())
+    index_to_patient = np.array(image.GetDirection()).reshape(3, 3) \
+        * np.array(image.GetSpacing())
+    patient_to_index = np.linalg.inv(index_to_patient)
+    shape = image.GetSize()[::-1]
+
+    roi_masks = {}
+    for roi_name, roi_contours in dict_roi.items():
+        if interrupt_flag is not None and interrupt_flag.is_set():
+            return {}
+        mask = np.zeros(shape, dtype=np.uint8)
+        for slice_uid in roi_contours:
+            if slice_uid not in slice_ids:
+                continue
+            polygons = [
+                ((contour.reshape(-1, 3) - origin) @ patient_to_index.T)[:, :2]
+                for contour in roi_contours[slice_uid]]
+            mask[slice_ids[slice_uid]] = fill_polygons(shape[1:], polygons)
+        if mask.any():
+            roi_mask = sitk.GetImageFromArray(mask)
+            roi_mask.CopyInformation(image)
+            roi_masks[roi_name] = roi_mask
+    return roi_masks
+
+
+def get_radiomics_df(path, patient_hash, image, roi_masks, callback=None):
     """
     Run pyradiomics and return pandas dataframe with all the computed data.
     :param path: Path to patient directory (str).
     :param patient_hash: Patient hash ID generated from their
                          identifiers.
-    :param nrrd_file_path: Path to folder with converted nrrd file.
-    :param mask_folder_path: Path to ROI nrrd files.
+    :param image: SimpleITK image of the patient.
+    :param roi_masks: Dictionary of SimpleITK masks of the ROIs, with the
+        names of the ROIs as keys.
+    :param callback: Function called with the name of each ROI before its
+        features are calculated.
     :return: Pandas dataframe.
     """
 
@@ -80,20 +152,18 @@ def get_radiomics_df(path, patient_hash, nrrd_file_path, mask_folder_path):
     feature_vector = ''
 
     # If RTSS selected has no ROIS
-    if not os.listdir(mask_folder_path):
+    if not roi_masks:
         return None
 
-    for file in os.listdir(mask_folder_path):
+    for roi_name, roi_mask in roi_masks.items():
+        if callback is not None:
+            callback(roi_name)
         # Contains features for current ROI
         roi_features = []
         roi_features.append(patient_hash)
         roi_features.append(path)
-        # Full path of ROI nrrd file
-        mask_name = mask_folder_path + '/' + file
-        # Name of ROI
-        image_id = file.split('.')[0]
-        feature_vector = extractor.execute(nrrd_file_path, mask_name)
-        roi_features.append(image_id)
+        feature_vector = extractor.execute(image, roi_mask)
+        roi_features.append(roi_name)
 
         # Add first order features to list
         for feature_name in feature_vector.keys():
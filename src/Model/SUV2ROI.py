@@ -1,7 +1,14 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
 import numpy
 from skimage import measure
+import src.constants as constant
 from src.Model import ImageLoading
 from src.Model import ROI
+from src.Model.ConnectedComponents import calc_component_contours, \
+    get_min_voxels, get_voxel_volume
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.View.InputDialogs import PatientWeightDialog
 
@@ -10,11 +17,27 @@ class SUV2ROI:
     """
     This class is for converting SUV levels to ROIs.
     """
-    def __init__(self):
+    def __init__(self, volumetric=None, min_component_volume=None):
+        """
+        :param volumetric: Whether to segment the SUV volume into
+                           connected components in 3D, leaving out
+                           components smaller than min_component_volume,
+                           instead of contouring every slice on its own.
+                           Defaults to constants.VOLUMETRIC_SEGMENTATION.
+        :param min_component_volume: Smallest volume (in cm^3) of a
+                                     component. Defaults to
+                                     constants.MIN_COMPONENT_VOLUME.
+        """
         self.patient_weight = None
         self.weight_over_dose = None
         self.suv2roi_status = False
         self.failure_reason = None
+        if volumetric is None:
+            volumetric = constant.VOLUMETRIC_SEGMENTATION
+        if min_component_volume is None:
+            min_component_volume = constant.MIN_COMPONENT_VOLUME
+        self.volumetric = volumetric
+        self.min_component_volume = min_component_volume
 
     def start_conversion(self, interrupt_flag, progress_callback):
         """
@@ -36,7 +59,8 @@ class SUV2ROI:
 
         # Calculate contours
         progress_callback.emit(("Calculating Boundaries", 40))
-        contour_data = self.calculate_contours()
+        contour_data = self.calculate_contours(
+            interrupt_flag=interrupt_flag)
 
         # Stop loading
         if interrupt_flag.is_set():
@@ -107,42 +131,53 @@ class SUV2ROI:
         """
         self.patient_weight = weight_in_grams
 
-    def pet2suv(self, dataset):
+    def check_pet_dataset(self, dataset):
         """
-        Converts DICOM PET pixel array values to SUV values. Currently
-        only handles PET datasets in Bq/mL that are attenuation and
-        decay corrected.
+        Checks that the pixel values of a DICOM PET dataset can be
+        converted to SUV values. Currently only PET datasets in Bq/mL
+        that are attenuation and decay corrected can be converted.
         :param dataset: the DICOM PET dataset.
-        :return: DICOM PET pixel data in SUV.
+        :return: True if the dataset can be converted, False otherwise.
         """
         # Return if units are not Bq/mL
         if not dataset.Units == "BQML":
             self.failure_reason = "UNIT"
-            return None
+            return False
 
         # Return if CorrectedImage does not contain DECY, and
         # decay correction is not START
         if (["DECY"] not in dataset.CorrectedImage) and \
                 (dataset.DecayCorrection != "START"):
             self.failure_reason = "DECY"
-            return None
+            return False
 
         # Return if patient weight not set
         if self.patient_weight is None:
             self.failure_reason = "WEIGHT"
-            return None
-
-        # Get radiopharmaceutical information
-        radiopharmaceutical_info = \
-            dataset.RadiopharmaceuticalInformationSequence[0]
+            return False
 
         # Calculate patient weight divided by total dose once
         if self.weight_over_dose is None:
+            radiopharmaceutical_info = \
+                dataset.RadiopharmaceuticalInformationSequence[0]
             radionuclide_total_dose = \
                 radiopharmaceutical_info['RadionuclideTotalDose'].value
             self.weight_over_dose = \
                 self.patient_weight / radionuclide_total_dose
 
+        return True
+
+    def pet2suv(self, dataset):
+        """
+        Converts DICOM PET pixel array values to SUV values. Currently
+        only handles PET datasets in Bq/mL that are attenuation and
+        decay corrected.
+        :param dataset: the DICOM PET dataset.
+        :return: DICOM PET pixel data in SUV.
+        """
+        if not self.check_pet_dataset(dataset):
+            return None
+
         # Get rescale slope and intercept
         rescale_slope = dataset.RescaleSlope
         rescale_intercept = dataset.RescaleIntercept
@@ -157,52 +192,125 @@ class SUV2ROI:
         # Return SUV data
         return suv
 
-    def calculate_contours(self):
+    def pet2suv_volume(self, datasets):
         """
-        Calculate SUV boundaries for each slice from an SUV value of 1
-        all the way to the maximum SUV value in that slice.
+        Converts the pixel values of all DICOM PET datasets to SUV values
+        at once.
+        :param datasets: list of DICOM PET datasets, in slice order.
+        :return: 3D float32 numpy array (slices, rows, columns) of SUV
+                 values, or None if a dataset cannot be converted.
+        """
+        for dataset in datasets:
+            if not self.check_pet_dataset(dataset):
+                return None
+
+        rescale_slopes = numpy.array(
+            [float(dataset.RescaleSlope) for dataset in datasets],
+            dtype=numpy.float32)
+        rescale_intercepts = numpy.array(
+            [float(dataset.RescaleIntercept) for dataset in datasets],
+            dtype=numpy.float32)
+        suv = numpy.stack(
+            [dataset.pixel_array for dataset in datasets]).astype(
+            numpy.float32)
+        suv *= rescale_slopes[:, numpy.newaxis, numpy.newaxis]
+        suv += rescale_intercepts[:, numpy.newaxis, numpy.newaxis]
+        suv *= numpy.float32(self.weight_over_dose)
+        return suv
+
+    def calculate_contours(self, suv_levels=None, interrupt_flag=None,
+                           max_workers=None):
+        """
+        Calculate SUV boundaries for each slice for every SUV level below
+        the maximum SUV value in that slice. The SUV values of all slices
+        are calculated once, and the slices are contoured by a bounded
+        pool of worker processes.
+        :param suv_levels: list of SUV levels to contour. Defaults to
+                           every whole SUV value from 1 up to the
+                           maximum SUV value of the PET image.
+        :param interrupt_flag: A threading.Event() object that tells the
+                               function to stop calculation, or None.
+        :param max_workers: Maximum number of worker processes. Defaults
+                            to constants.SUV2ROI_MAX_WORKERS, or the
+                            number of CPUs if that is None.
         :return: Dictionary where key is SUV ROI name and value is
                  a list containing tuples of slice id and lists of
-                 contours.
+                 contours, or None if the contours could not be
+                 calculated or the calculation was interrupted.
         """
-        # Create dictionary to store contour data
-        contour_data = {}
-
         # Initialise variables needed for function
         patient_dict_container = PatientDictContainer()
         slider_min = 0
         slider_max = len(patient_dict_container.get("pixmaps_axial"))
 
-        # Loop through each PET image in the dataset
-        for slider_id in range(slider_min, slider_max):
-            # Get SUV data from PET file
-            temp_ds = patient_dict_container.dataset[slider_id]
-            suv_data = self.pet2suv(temp_ds)
+        # Get SUV data from the PET files
+        datasets = [patient_dict_container.dataset[slider_id]
+                    for slider_id in range(slider_min, slider_max)]
+        suv_volume = self.pet2suv_volume(datasets)
 
-            # Return None if PET 2 SUV failed
-            if suv_data is None:
-                return None
-
-            # Set current and max SUV for the current slice
-            current_suv = 1
-            max_suv = numpy.amax(suv_data)
+        # Return None if PET 2 SUV failed
+        if suv_volume is None:
+            return None
 
-            # Continue calculating SUV contours for the slice until the
-            # max SUV has been reached.
-            while current_suv < max_suv:
-                # Find the contours for the SUV (i)
-                contours = measure.find_contours(suv_data, current_suv)
+        if suv_levels is None:
+            suv_levels = range(1, int(numpy.ceil(suv_volume.max())))
+        suv_levels = sorted(suv_levels)
+
+        if self.volumetric:
+            voxel_volume = get_voxel_volume(
+                datasets[0].PixelSpacing,
+                [dataset.ImagePositionPatient[2] for dataset in datasets])
+            return self.calculate_component_contours(
+                suv_volume, suv_levels,
+                get_min_voxels(self.min_component_volume, voxel_volume),
+                interrupt_flag)
+
+        slice_contours = calc_suv_contours(suv_volume, suv_levels,
+                                           interrupt_flag, max_workers)
+        if slice_contours is None:
+            return None
 
-                # Get the SUV name
-                name = "SUV-" + str(current_suv)
-                if name not in contour_data:
-                    contour_data[name] = []
-                contour_data[name].append((slider_id, contours))
-                current_suv += 1
+        # Create dictionary to store contour data
+        contour_data = {}
+        for suv_level in suv_levels:
+            name = "SUV-" + str(suv_level)
+            contour_data[name] = [
+                (slider_id, slice_contours[slider_id][suv_level])
+                for slider_id in range(len(slice_contours))
+                if suv_level in slice_contours[slider_id]]
+            if not contour_data[name]:
+                del contour_data[name]
 
         # Return contour data
         return contour_data
 
+    def calculate_component_contours(self, suv_volume, suv_levels,
+                                     min_voxels, interrupt_flag=None):
+        """
+        Calculate SUV boundaries of the connected components of the SUV
+        volume at each SUV level, leaving out small components.
+        :param suv_volume: 3D numpy array (slices, rows, columns) of SUV
+                           values.
+        :param suv_levels: sorted list of SUV levels.
+        :param min_voxels: smallest number of voxels of a component.
+        :param interrupt_flag: A threading.Event() object that tells the
+                               function to stop calculation, or None.
+        :return: Dictionary where key is SUV ROI name and value is
+                 a list containing tuples of slice id and lists of
+                 contours, or None if the calculation was interrupted.
+        """
+        contour_data = {}
+        for suv_level in suv_levels:
+            if interrupt_flag is not None and interrupt_flag.is_set():
+                return None
+            slice_contours = calc_component_contours(suv_volume, suv_level,
+                                                     min_voxels)
+            slice_contours = [(slider_id, contours) for slider_id, contours
+                              in enumerate(slice_contours) if contours]
+            if slice_contours:
+                contour_data["SUV-" + str(suv_level)] = slice_contours
+        return contour_data
+
     def generate_ROI(self, contours, progress_callback):
         """
         Generates new ROIs based on contour data.
@@ -225,23 +333,15 @@ class SUV2ROI:
         item_count = len(contours)
         current_progress = 60
         progress_increment = round((95 - 60)/item_count)
+        rois_contours = {}
         for item in contours:
             # Delete ROI if it already exists to recreate it
             if item in existing_rois:
                 dataset_rtss = ROI.delete_roi(dataset_rtss, item)
 
-                # Update patient dict container
-                current_rois = patient_dict_container.get("rois")
-                keys = []
-                for key, value in current_rois.items():
-                    if value["name"] == item:
-                        keys.append(key)
-                for key in keys:
-                    del current_rois[key]
-                patient_dict_container.set("rois", current_rois)
-
             progress_callback.emit(("Generating ROIs", current_progress))
             current_progress += progress_increment
+            rois_contours[item] = []
 
             # Loop through each slice
             for i in range(len(contours[item])):
@@ -251,30 +351,100 @@ class SUV2ROI:
                 pixlut = pixlut[dataset.SOPInstanceUID]
                 z_coord = dataset.SliceLocation
 
-                # List storing lists that contain all points for a
-                # contour.
-                single_array = []
-
-                # Loop through each contour
-                for j in range(len(contours[item][i][1])):
-                    single_array.append([])
-                    # Loop through every point in the contour
-                    for point in contours[item][i][1][j]:
-                        # Convert pixel coordinates to RCS points
-                        rcs_pixels = ROI.pixel_to_rcs(pixlut, round(point[1]),
-                                                      round(point[0]))
-                        # Append RCS points to the single array
-                        single_array[j].append(rcs_pixels[0])
-                        single_array[j].append(rcs_pixels[1])
-                        single_array[j].append(z_coord)
-
-                # Create the ROI(s)
-                for array in single_array:
-                    rtss = ROI.create_roi(dataset_rtss, item,
-                                          [{'coords': array, 'ds': dataset}],
-                                          "")
-
-                    # Save the updated rtss
-                    patient_dict_container.set("dataset_rtss", rtss)
-                    patient_dict_container.set("rois",
-                                               ImageLoading.get_roi_info(rtss))
+                # Convert the pixel points of each contour to RCS points
+                for contour in contours[item][i][1]:
+                    rois_contours[item].append({
+                        'coords': ROI.pixels_to_rcs(pixlut, contour[:, ::-1],
+                                                    z_coord),
+                        'ds': dataset})
+
+        # Create all ROIs at once, and save the updated rtss
+        rtss = ROI.create_rois(dataset_rtss, rois_contours, "")
+        patient_dict_container.set("dataset_rtss", rtss)
+        patient_dict_container.set("rois", ImageLoading.get_roi_info(rtss))
+
+
+def calc_slice_suv_contours(suv_chunk, suv_levels):
+    """
+    Contour slices of SUV values at every SUV level below the maximum SUV
+    value of the slice.
+    :param suv_chunk: 3D numpy array of the SUV values of the slices.
+    :param suv_levels: sorted list of SUV levels.
+    :return: List of dictionaries, one per slice, where the keys are SUV
+             levels and the values are lists of contours.
+    """
+    slice_contours = []
+    for suv_data in suv_chunk:
+        max_suv = suv_data.max()
+        slice_contours.append(
+            {suv_level: measure.find_contours(suv_data, suv_level)
+             for suv_level in suv_levels if suv_level < max_suv})
+    return slice_contours
+
+
+def calc_suv_contours(suv_volume, suv_levels, interrupt_flag=None,
+                      max_workers=None, chunk_size=None):
+    """
+    Contour every slice of an SUV volume at all SUV levels. The slices
+    are split into chunks and contoured by a bounded pool of worker
+    processes.
+    :param suv_volume: 3D numpy array (slices, rows, columns) of SUV
+                       values.
+    :param suv_levels: sorted list of SUV levels.
+    :param interrupt_flag: A threading.Event() object that tells the
+                           function to stop calculation, or None.
+    :param max_workers: Maximum number of worker processes. Defaults to
+                        constants.SUV2ROI_MAX_WORKERS, or the number of
+                        CPUs if that is None.
+    :param chunk_size: Number of slices given to a worker at a time.
+                       Defaults to a size that gives each worker about
+                       four chunks.
+    :return: List of dictionaries, one per slice, where the keys are SUV
+             levels and the values are lists of contours, or None if the
+             calculation was interrupted.
+    """
+    slice_count = len(suv_volume)
+    if max_workers is None:
+        max_workers = constant.SUV2ROI_MAX_WORKERS or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, slice_count))
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(slice_count / (max_workers * 4)))
+    starts = range(0, slice_count, chunk_size)
+
+    # Starting worker processes is not worth it for a single worker.
+    if max_workers == 1:
+        slice_contours = []
+        for start in starts:
+            if interrupt_flag is not None and interrupt_flag.is_set():
+                return None
+            slice_contours += calc_slice_suv_contours(
+                suv_volume[start:start + chunk_size], suv_levels)
+        return slice_contours
+
+    chunk_contours = {}
+    futures = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        for start in starts:
+            futures[executor.submit(calc_slice_suv_contours,
+                                    suv_volume[start:start + chunk_size],
+                                    suv_levels)] = start
+        pending = set(futures)
+        while pending:
+            # Wake up regularly to check whether to stop calculating.
+            done, pending = wait(pending, timeout=0.5,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_contours[futures[future]] = future.result()
+            if interrupt_flag is not None and interrupt_flag.is_set():
+                return None
+    finally:
+        # Cancel the chunks which have not started, e.g. when interrupted
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    slice_contours = []
+    for start in starts:
+        slice_contours += chunk_contours[start]
+    return slice_contours
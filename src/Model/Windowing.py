@@ -1,8 +1,5 @@
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.PTCTDictContainer import PTCTDictContainer
-from src.Model.MovingDictContainer import MovingDictContainer
-from src.Model.CalculateImages import get_pixmaps
-from src.Model.ImageFusion import get_fused_window
 
 
 def windowing_model(text, init):
@@ -12,7 +9,6 @@ def windowing_model(text, init):
     :param init: list of bool to determine which views are chosen
     """
     patient_dict_container = PatientDictContainer()
-    moving_dict_container = MovingDictContainer()
     pt_ct_dict_container = PTCTDictContainer()
 
     # Get the values for window and level from the dict
@@ -22,53 +18,34 @@ def windowing_model(text, init):
     window = windowing_limits[0]
     level = windowing_limits[1]
 
-    # Update the dictionary of pixmaps with the update window and
-    # level values
+    # Update the pixmaps with the update window and level values. The
+    # pixmaps are rendered lazily, so only the window and level need to be
+    # changed and slices are rendered again when they are next displayed.
     if init[0]:
-        pixel_values = patient_dict_container.get("pixel_values")
-        pixmap_aspect = patient_dict_container.get("pixmap_aspect")
-        pixmaps_axial, pixmaps_coronal, pixmaps_sagittal = \
-            get_pixmaps(pixel_values, window, level, pixmap_aspect)
-
-        patient_dict_container.set("pixmaps_axial", pixmaps_axial)
-        patient_dict_container.set("pixmaps_coronal", pixmaps_coronal)
-        patient_dict_container.set("pixmaps_sagittal", pixmaps_sagittal)
+        for view in ["axial", "coronal", "sagittal"]:
+            patient_dict_container.get("pixmaps_" + view).set_window(
+                window, level)
         patient_dict_container.set("window", window)
         patient_dict_container.set("level", level)
 
     # Update CT
     if init[2]:
-        ct_pixel_values = pt_ct_dict_container.get("ct_pixel_values")
-        ct_pixmap_aspect = pt_ct_dict_container.get("ct_pixmap_aspect")
-        ct_pixmaps_axial, ct_pixmaps_coronal, ct_pixmaps_sagittal = \
-            get_pixmaps(ct_pixel_values, window, level, ct_pixmap_aspect,
-                        fusion=True)
-
-        pt_ct_dict_container.set("ct_pixmaps_axial", ct_pixmaps_axial)
-        pt_ct_dict_container.set("ct_pixmaps_coronal", ct_pixmaps_coronal)
-        pt_ct_dict_container.set("ct_pixmaps_sagittal", ct_pixmaps_sagittal)
+        for view in ["axial", "coronal", "sagittal"]:
+            pt_ct_dict_container.get("ct_pixmaps_" + view).set_window(
+                window, level)
         pt_ct_dict_container.set("ct_window", window)
         pt_ct_dict_container.set("ct_level", level)
 
     # Update PT
     if init[1]:
-        pt_pixel_values = pt_ct_dict_container.get("pt_pixel_values")
-        pt_pixmap_aspect = pt_ct_dict_container.get("pt_pixmap_aspect")
-        pt_pixmaps_axial, pt_pixmaps_coronal, pt_pixmaps_sagittal = \
-            get_pixmaps(pt_pixel_values, window, level, pt_pixmap_aspect,
-                        fusion=True, color="Heat")
-
-        pt_ct_dict_container.set("pt_pixmaps_axial", pt_pixmaps_axial)
-        pt_ct_dict_container.set("pt_pixmaps_coronal", pt_pixmaps_coronal)
-        pt_ct_dict_container.set("pt_pixmaps_sagittal", pt_pixmaps_sagittal)
+        for view in ["axial", "coronal", "sagittal"]:
+            pt_ct_dict_container.get("pt_pixmaps_" + view).set_window(
+                window, level)
         pt_ct_dict_container.set("pt_window", window)
         pt_ct_dict_container.set("pt_level", level)
 
     # Update Fusion
     if init[3]:
-        fusion_axial, fusion_coronal, fusion_sagittal, tfm = \
-            get_fused_window(level, window)
-        patient_dict_container.set("color_axial", fusion_axial)
-        patient_dict_container.set("color_coronal", fusion_coronal)
-        patient_dict_container.set("color_sagittal", fusion_sagittal)
-        moving_dict_container.set("tfm", tfm)
+        for view in ["axial", "coronal", "sagittal"]:
+            patient_dict_container.get("color_" + view).set_window(
+                window, level)
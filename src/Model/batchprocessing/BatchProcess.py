@@ -1,10 +1,7 @@
 import os
 from pathlib import Path
-from pydicom import dcmread
-from pydicom.errors import InvalidDicomError
 from src.Model import ImageLoading
 from src.Model import ROI
-from src.Model.GetPatientInfo import DicomTree
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
@@ -47,12 +44,15 @@ class BatchProcess:
         pass
 
     @classmethod
-    def load_images(cls, patient_files, required_classes):
+    def load_images(cls, patient_files, required_classes,
+                    progress_callback=None):
         """
         Loads required datasets for the selected patient.
         :param patient_files: dictionary of classes and patient files.
         :param required_classes: list of classes required for the
                                  selected/current process.
+        :param progress_callback: A signal that receives the progress of
+                                  reading the files.
         :return: True if all required datasets found, false otherwise.
         """
         files = []
@@ -88,7 +88,8 @@ class BatchProcess:
             # Convert paths to a common file system representation
             for i, file in enumerate(files):
                 files[i] = Path(file).as_posix()
-            read_data_dict, file_names_dict = cls.get_datasets(files)
+            read_data_dict, file_names_dict = \
+                cls.get_datasets(files, progress_callback)
             path = os.path.dirname(
                 os.path.commonprefix(list(file_names_dict.values())))
         # Otherwise raise an exception (OnkoDICOM does not support the
@@ -105,7 +106,7 @@ class BatchProcess:
         # If an RT Struct is included, set relevant values in the
         # PatientDictContainer
         if 'rtss' in file_names_dict:
-            dataset_rtss = dcmread(file_names_dict['rtss'])
+            dataset_rtss = read_data_dict['rtss']
             rois = ImageLoading.get_roi_info(dataset_rtss)
             dict_raw_contour_data, dict_numpoints = \
                 ImageLoading.get_raw_contour_data(dataset_rtss)
@@ -120,10 +121,13 @@ class BatchProcess:
         return True
 
     @classmethod
-    def get_datasets(cls, file_path_list):
+    def get_datasets(cls, file_path_list, progress_callback=None):
         """
-        Gets datasets in the passed-in file path.
+        Gets datasets in the passed-in file path. The files are read in
+        parallel.
         :param file_path_list: list of file paths to load datasets from.
+        :param progress_callback: A signal that receives the progress of
+                                  reading the files.
         """
         read_data_dict = {}
         file_names_dict = {}
@@ -136,12 +140,13 @@ class BatchProcess:
         nac_count = 0
 
         slice_count = 0
-        # For each file in the file path list
-        for file in ImageLoading.natural_sort(file_path_list):
-            # Try to open it
-            try:
-                read_file = dcmread(file)
-            except InvalidDicomError:
+        # Read every file in the file path list, skipping files that are
+        # not DICOM files
+        read_files = ImageLoading.read_dicom_files(
+            ImageLoading.natural_sort(file_path_list), progress_callback,
+            progress_range=(20, 30))
+        for file, read_file in read_files:
+            if read_file is None:
                 continue
 
             # Update relevant data
@@ -277,10 +282,6 @@ class BatchProcess:
         patient_dict_container.set("file_rtss", filepaths['rtss'])
         patient_dict_container.set("dataset_rtss", dataset['rtss'])
 
-        dicom_tree_rtss = DicomTree(filepaths['rtss'])
-        patient_dict_container.set("dict_dicom_tree_rtss",
-                                   dicom_tree_rtss.dict)
-
         dict_pixluts = ImageLoading.get_pixluts(
             patient_dict_container.dataset)
         patient_dict_container.set("pixluts", dict_pixluts)
@@ -53,12 +53,14 @@ class BatchProcessCSV2ClinicalDataSR(BatchProcess):
 
         # Only need one of either ct or pet (and rtdose)
         self.ready = False
-        ready = self.load_images(patient_files, self.required_classes)
+        ready = self.load_images(patient_files, self.required_classes,
+                                 progress_callback)
         if ready:
             self.ready = True
         else:
             self.ready = \
-                self.load_images(patient_files, self.required_classes_2)
+                self.load_images(patient_files, self.required_classes_2,
+                                 progress_callback)
         self.input_path = input_path
 
     def start(self):
@@ -38,7 +38,8 @@ class BatchProcessClinicalDataSR2CSV(BatchProcess):
         # Set class variables
         self.patient_dict_container = PatientDictContainer()
         self.required_classes = ['sr']
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
         self.output_path = output_path
 
     def start(self):
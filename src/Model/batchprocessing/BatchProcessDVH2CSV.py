@@ -1,6 +1,6 @@
 import os
 from src.Model import CalculateDVHs
-from src.Model import ImageLoading
+from src.Model import ImageLoading, NativeDVH
 from src.Model.batchprocessing.BatchProcess import BatchProcess
 from src.Model.PatientDictContainer import PatientDictContainer
 import pandas as pd
@@ -44,7 +44,8 @@ class BatchProcessDVH2CSV(BatchProcess):
         # Set class variables
         self.patient_dict_container = PatientDictContainer()
         self.required_classes = ('rtss', 'rtdose')
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
         self.output_path = output_path
         self.filename = "DVHs_.csv"
 
@@ -95,9 +96,9 @@ class BatchProcessDVH2CSV(BatchProcess):
                 dict_thickness = \
                     ImageLoading.get_thickness_dict(dataset_rtss,
                                                     read_data_dict)
-                raw_dvh = ImageLoading.calc_dvhs(dataset_rtss, dataset_rtdose,
-                                                 rois, dict_thickness,
-                                                 self.interrupt_flag)
+                raw_dvh = NativeDVH.calc_dvhs(dataset_rtss, dataset_rtdose,
+                                              rois, dict_thickness,
+                                              self.interrupt_flag)
             except TypeError:
                 self.summary = "DVH_TYPE_ERROR"
                 return False
@@ -52,7 +52,8 @@ class BatchProcessISO2ROI(BatchProcess):
         # Set class variables
         self.patient_dict_container = PatientDictContainer()
         self.required_classes = ('ct', 'rtdose', 'rtplan')
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
 
     def start(self):
         """
@@ -14,6 +14,16 @@ class BatchProcessPyRad2CSV(BatchProcess):
     """
     # Allowed classes for PyRadCSV
     allowed_classes = {
+        # CT Image
+        "1.2.840.10008.5.1.4.1.1.2": {
+            "name": "ct",
+            "sliceable": True
+        },
+        # MR Image
+        "1.2.840.10008.5.1.4.1.1.4": {
+            "name": "mr",
+            "sliceable": True
+        },
         # RT Structure Set
         "1.2.840.10008.5.1.4.1.1.481.3": {
             "name": "rtss",
@@ -45,7 +55,8 @@ class BatchProcessPyRad2CSV(BatchProcess):
         # Set class variables
         self.patient_dict_container = PatientDictContainer()
         self.required_classes = 'rtss'.split()
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
         self.output_path = output_path
         self.filename = "Pyradiomics_.csv"
 
@@ -63,30 +74,27 @@ class BatchProcessPyRad2CSV(BatchProcess):
             self.summary = "SKIP"
             return False
 
-        rtss_path = self.patient_dict_container.filepaths.get('rtss')
-        patient_id = self.patient_dict_container.dataset.get('rtss').PatientID
+        dataset = self.patient_dict_container.dataset
+        image_slices = Radiomics.get_image_slices(dataset)
+        if 'rtss' not in dataset or not image_slices:
+            self.summary = "SKIP"
+            return False
+
+        patient_id = dataset['rtss'].PatientID
         patient_id = Radiomics.clean_patient_id(patient_id)
         patient_path = self.patient_dict_container.path
-        file_name = Radiomics.clean_patient_id(patient_id) + '.nrrd'
-        patient_nrrd_folder_path = patient_path + '/nrrd/'
-        patient_nrrd_file_path = patient_nrrd_folder_path + file_name
 
         output_csv_path = self.output_path.joinpath('CSV')
 
-        # If folder does not exist
-        if not os.path.exists(patient_nrrd_folder_path):
-            # Create folder
-            os.makedirs(patient_nrrd_folder_path)
-
         # If folder does not exist
         if not os.path.exists(output_csv_path):
             # Create folder
             os.makedirs(output_csv_path)
 
-        self.progress_callback.emit(("Converting dicom to nrrd..", 25))
+        self.progress_callback.emit(("Creating image volume..", 25))
 
-        # Convert dicom files to nrrd for pyradiomics processing
-        Radiomics.convert_to_nrrd(patient_path, patient_nrrd_file_path)
+        # Create the image volume for pyradiomics processing
+        image = Radiomics.create_image(image_slices)
 
         # Stop loading
         if self.interrupt_flag.is_set():
@@ -94,16 +102,11 @@ class BatchProcessPyRad2CSV(BatchProcess):
             self.summary = "INTERRUPT"
             return False
 
-        # Location of folder where converted masks saved
-        mask_folder_path = patient_nrrd_folder_path + 'structures'
-        if not os.path.exists(mask_folder_path):
-            os.makedirs(mask_folder_path)
-
-        self.progress_callback.emit(("Converting ROIs to nrrd..", 45))
+        self.progress_callback.emit(("Creating ROI masks..", 45))
 
-        # Convert ROIs to nrrd
-        Radiomics.convert_rois_to_nrrd(
-            patient_path, rtss_path, mask_folder_path)
+        # Rasterise the ROIs onto the image volume
+        roi_masks = Radiomics.create_roi_masks(
+            image, image_slices, dataset['rtss'], self.interrupt_flag)
 
         # Stop loading
         if self.interrupt_flag.is_set():
@@ -115,7 +118,7 @@ class BatchProcessPyRad2CSV(BatchProcess):
 
         # Run pyradiomics, convert to dataframe
         radiomics_df = Radiomics.get_radiomics_df(
-            patient_path, patient_id, patient_nrrd_file_path, mask_folder_path)
+            patient_path, patient_id, image, roi_masks)
 
         # Stop loading
         if self.interrupt_flag.is_set():
@@ -38,7 +38,8 @@ class BatchProcessROIName2FMAID(BatchProcess):
         self.required_classes = ['rtss']
         self.organ_names = []
         self.fma_ids = {}
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
         self.patient_dict_container = PatientDictContainer()
 
     def start(self):
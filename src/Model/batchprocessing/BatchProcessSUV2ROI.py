@@ -25,7 +25,7 @@ class BatchProcessSUV2ROI(BatchProcess):
     }
 
     def __init__(self, progress_callback, interrupt_flag, patient_files,
-                 patient_weight):
+                 patient_weight, suv_levels=None):
         """
         Class initialiser function.
         :param progress_callback: A signal that receives the current
@@ -34,6 +34,8 @@ class BatchProcessSUV2ROI(BatchProcess):
                                function to stop loading.
         :param patient_files: List of patient files.
         :param patient_weight: Weight of the patient in grams.
+        :param suv_levels: List of SUV levels to generate ROIs for.
+                           Defaults to every whole SUV level.
         """
         # Call the parent class
         super(BatchProcessSUV2ROI, self).__init__(progress_callback,
@@ -43,8 +45,10 @@ class BatchProcessSUV2ROI(BatchProcess):
         # Set class variables
         self.patient_dict_container = PatientDictContainer()
         self.required_classes = ['pet']
-        self.ready = self.load_images(patient_files, self.required_classes)
+        self.ready = self.load_images(patient_files, self.required_classes,
+                                      progress_callback)
         self.patient_weight = patient_weight
+        self.suv_levels = suv_levels
 
     def start(self):
         """
@@ -99,17 +103,18 @@ class BatchProcessSUV2ROI(BatchProcess):
 
         # Calculate boundaries
         self.progress_callback.emit(("Calculating Boundaries", 60))
-        contour_data = suv2roi.calculate_contours()
-
-        if not contour_data:
-            self.summary = "SUV_" + suv2roi.failure_reason
-            return False
+        contour_data = suv2roi.calculate_contours(
+            suv_levels=self.suv_levels, interrupt_flag=self.interrupt_flag)
 
         # Stop loading
         if self.interrupt_flag.is_set():
             self.summary = "INTERRUPT"
             return False
 
+        if not contour_data:
+            self.summary = "SUV_" + suv2roi.failure_reason
+            return False
+
         # Generate ROIs
         self.progress_callback.emit(("Generating ROIs...", 80))
         suv2roi.generate_ROI(contour_data, self.progress_callback)
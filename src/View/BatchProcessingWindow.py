@@ -295,6 +295,12 @@ class UIBatchProcessingWindow(object):
             self.show_invalid_weight_dialog()
             return
 
+        # Return if an SUV2ROI level is invalid. Alert user.
+        suv2roi_levels = self.suv2roi_tab.get_suv_levels()
+        if suv2roi_levels is None:
+            self.show_invalid_suv_level_dialog()
+            return
+
         # Get the selected processes
         for i in range(self.tab_widget.count()):
             if self.tab_widget.isChecked(i):
@@ -318,6 +324,7 @@ class UIBatchProcessingWindow(object):
         self.batch_processing_controller.set_file_paths(file_directories)
         self.batch_processing_controller.set_processes(selected_processes)
         self.batch_processing_controller.set_suv2roi_weights(suv2roi_weights)
+        self.batch_processing_controller.set_suv2roi_levels(suv2roi_levels)
 
         # Set batch ROI name cleaning options if selected
         if 'roinamecleaning' in selected_processes:
@@ -362,6 +369,23 @@ class UIBatchProcessingWindow(object):
         # Enable processing
         self.batch_processing_controller.start_processing()
 
+    def show_invalid_suv_level_dialog(self):
+        """
+        Shows a dialog informing the user that an entered SUV level in the
+        SUV2ROI tab is invalid (either not positive or not a number).
+        """
+        button_reply = \
+            QtWidgets.QMessageBox(QtWidgets.QMessageBox.Icon.Warning,
+                                  "Invalid SUV Level",
+                                  "Please enter valid SUV levels, separated "
+                                  "by commas.",
+                                  QtWidgets.QMessageBox.StandardButton.Ok,
+                                  self)
+        button_reply.button(
+            QtWidgets.QMessageBox.StandardButton.Ok).setStyleSheet(
+            self.stylesheet)
+        button_reply.exec_()
+
     def show_invalid_weight_dialog(self):
         """
         Shows a dialog informing the user that an entered weight in the
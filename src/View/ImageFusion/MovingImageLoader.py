@@ -1,15 +1,15 @@
 import os
-import platform
 from pathlib import Path
 
 from PySide6 import QtCore
 from pydicom import dcmread
 
-from src.Model import ImageLoading
+from src.Model import ImageLoading, NativeDVH
 from src.Model.MovingDictContainer import MovingDictContainer
-from src.Model.MovingModel import create_moving_model
+from src.Model.MovingModel import create_moving_model, \
+    read_images_for_fusion
+from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.ROI import create_initial_rtss_from_ct
-from src.Model.GetPatientInfo import DicomTree
 
 from src.View.ImageLoader import ImageLoader
 
@@ -69,7 +69,7 @@ class MovingImageLoader(ImageLoader):
                 pass
 
         if 'rtss' in file_names_dict:
-            dataset_rtss = dcmread(file_names_dict['rtss'])
+            dataset_rtss = read_data_dict['rtss']
 
             progress_callback.emit(("Getting ROI info...", 10))
             rois = ImageLoading.get_roi_info(dataset_rtss)
@@ -106,26 +106,10 @@ class MovingImageLoader(ImageLoader):
             if 'rtdose' in file_names_dict and self.calc_dvh:
                 dataset_rtdose = dcmread(file_names_dict['rtdose'])
 
-                # Spawn-based platforms (i.e Windows and MacOS) have a large
-                # overhead when creating a new process, which ends up making
-                # multiprocessing on these platforms more expensive than linear
-                # calculation. As such, multiprocessing is only available on
-                # Linux until a better solution is found.
-                fork_safe_platforms = ['Linux']
-                if platform.system() in fork_safe_platforms:
-                    progress_callback.emit(("Calculating DVHs...", 60))
-                    raw_dvh = ImageLoading.multi_calc_dvh(dataset_rtss,
-                                                          dataset_rtdose,
-                                                          rois,
-                                                          dict_thickness)
-                else:
-                    progress_callback.emit(
-                        ("Calculating DVHs... (This may take a while)", 60))
-                    raw_dvh = ImageLoading.calc_dvhs(dataset_rtss,
-                                                     dataset_rtdose,
-                                                     rois,
-                                                     dict_thickness,
-                                                     interrupt_flag)
+                progress_callback.emit(("Calculating DVHs...", 60))
+                raw_dvh = NativeDVH.multi_calc_dvhs(
+                    dataset_rtss, dataset_rtdose, rois, dict_thickness,
+                    interrupt_flag=interrupt_flag)
 
                 if interrupt_flag.is_set():  # Stop loading.
                     print("stopped")
@@ -152,6 +136,18 @@ class MovingImageLoader(ImageLoader):
             progress_callback.emit(("Stopping", 85))
             return False
 
+        # Register the images on this thread, so that the registration
+        # reports its progress and can be stopped. The fused images use the
+        # current window and level of the patient.
+        patient_dict_container = PatientDictContainer()
+        if not read_images_for_fusion(patient_dict_container.get("level"),
+                                      patient_dict_container.get("window"),
+                                      progress_callback=progress_callback,
+                                      interrupt_flag=interrupt_flag,
+                                      progress_range=(85, 100)):
+            progress_callback.emit(("Stopping", 85))
+            return False
+
         return True
 
     def load_temp_rtss(self, path, progress_callback, interrupt_flag):
@@ -192,6 +188,4 @@ class MovingImageLoader(ImageLoader):
         # Set some moving dict container attributes
         moving_dict_container.set("file_rtss", rtss_path)
         moving_dict_container.set("dataset_rtss", rtss)
-        ordered_dict = DicomTree(None).dataset_to_dict(rtss)
-        moving_dict_container.set("dict_dicom_tree_rtss", ordered_dict)
         moving_dict_container.set("selected_rois", [])
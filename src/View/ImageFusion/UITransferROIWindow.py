@@ -1,19 +1,17 @@
 import platform
 import traceback
 
-import SimpleITK as sitk
-import numpy as np
 from PySide6 import QtCore, QtGui
 from PySide6.QtGui import Qt, QIcon, QPixmap
 from PySide6.QtWidgets import QGridLayout, QWidget, QLabel, QPushButton, \
     QCheckBox, QHBoxLayout, QListWidget, QListWidgetItem, QMessageBox
-from platipy.imaging.registration.utils import apply_linear_transform
 
 from src.Controller.PathHandler import resource_path
 from src.Model import ROI
 from src.Model.MovingDictContainer import MovingDictContainer
 from src.Model.PatientDictContainer import PatientDictContainer
-from src.Model.ROITransfer import transform_point_set_from_dicom_struct
+from src.Model.ROITransfer import calc_mask_contours, get_roi_mask, \
+    resample_roi_labels, transform_point_set_from_dicom_struct
 from src.View.ProgressWindow import ProgressWindow
 from src.View.util.PatientDictContainerHelper import get_dict_slice_to_uid, \
     read_dicom_image_to_sitk
@@ -495,7 +493,7 @@ class UITransferROIWindow:
                 spacing_override=None,
                 interrupt_flag=interrupt_flag)
         else:
-            rois_images_moving = ([], [])
+            rois_images_moving = (None, [])
 
         if not check_interrupt_flag(interrupt_flag):
             return False
@@ -578,79 +576,81 @@ class UITransferROIWindow:
                       original_roi_list, patient_dict_container):
         """
         Converting (transferring) ROIs from one image set to another and save
-        the transferred rois to rtss.
+        the transferred rois to rtss. The label image of the ROIs is
+        resampled onto the reference image in one pass.
         :param transfer_dict: dictionary of rois to be transfer.
         key is original roi names, value is the name after transferred.
-        :param original_roi_list: tuple of sitk rois from the base image.
+        :param original_roi_list: tuple of the sitk label image of the rois
+        from the base image and the names of the rois in it.
         :param tfm: the tfm that contains information for transferring rois
         :param reference_image: the reference (base) image
         :param patient_dict_container: container of the transfer image set.
 
         """
-        for roi_name, new_roi_name in transfer_dict.items():
-            for index, name in enumerate(original_roi_list[1]):
-                if name == roi_name:
-                    sitk_image = original_roi_list[0][index]
-                    new_contour = apply_linear_transform(
-                        input_image=sitk_image, transform=tfm,
-                        reference_image=reference_image, is_structure=True)
-                    contour = sitk.GetArrayViewFromImage(new_contour)
-                    contours = np.transpose(contour.nonzero())
-                    self.save_roi_to_patient_dict_container(
-                        contours,
-                        new_roi_name,
-                        patient_dict_container)
-
-    def save_roi_to_patient_dict_container(self, contours, roi_name,
-                                           patient_dict_container):
-        """
-        Save the transferred ROI to the corresponding rtss.
-
-        :param contours: np array of coordinates of the ROI to be saved.
-        :param roi_name: name of the ROI to be saved
+        roi_labels, roi_names = original_roi_list
+        if not any(name in transfer_dict for name in roi_names):
+            return
+        labels = resample_roi_labels(roi_labels, tfm, reference_image)
+
+        rois_contours = {}
+        for roi_index, roi_name in enumerate(roi_names):
+            if roi_name not in transfer_dict:
+                continue
+            slice_contours = calc_mask_contours(
+                get_roi_mask(labels, roi_index))
+            rois_contours[transfer_dict[roi_name]] = \
+                self.convert_slice_contours_to_rcs(slice_contours,
+                                                   patient_dict_container)
+        self.save_rois_to_patient_dict_container(rois_contours,
+                                                 patient_dict_container)
+
+    def convert_slice_contours_to_rcs(self, slice_contours,
+                                      patient_dict_container):
+        """
+        Convert the contours of the slices of a transferred ROI to contour
+        data.
+        :param slice_contours: dictionary of the contours of each slice of
+        the resampled ROI, from calc_mask_contours().
+        :param patient_dict_container: container of the transfer image set.
+        :return: list of contours, each a dictionary of the contour data
+        ('coords') and the dataset ('ds') of its slice.
+        """
+        total_slices = len(get_dict_slice_to_uid(patient_dict_container))
+        pixluts = patient_dict_container.get("pixluts")
+        roi_list = []
+        for slice_index, contours in slice_contours.items():
+            # Slice z of the resampled ROI is dataset (total_slices - z)
+            # of the image set
+            slice_id = (total_slices - slice_index) % total_slices
+            dataset = patient_dict_container.dataset[slice_id]
+            pixlut = pixluts[dataset.SOPInstanceUID]
+            for contour in contours:
+                # Contour points are (row, column) pixels, pixlut indices
+                # start at 1
+                roi_list.append({
+                    'ds': dataset,
+                    'coords': ROI.pixels_to_rcs(
+                        pixlut, contour[:, ::-1] + 1,
+                        round(dataset.SliceLocation))
+                })
+        return roi_list
+
+    def save_rois_to_patient_dict_container(self, rois_contours,
+                                            patient_dict_container):
+        """
+        Save the transferred ROIs to the corresponding rtss.
+
+        :param rois_contours: dictionary of the names of the ROIs to be
+        saved and their lists of contours.
         :param patient_dict_container: container of the transfer image set.
 
         """
-        pixels_coords_dict = {}
-        slice_ids_dict = get_dict_slice_to_uid(patient_dict_container)
-        total_slices = len(slice_ids_dict)
-        for contour in contours:
-            curr_slice_id = total_slices - contour[0]
-            if curr_slice_id >= total_slices:
-                curr_slice_id = 0
-            if curr_slice_id not in pixels_coords_dict:
-                pixels_coords_dict[curr_slice_id] = [
-                    tuple([contour[2], contour[1]])]
-            else:
-                pixels_coords_dict[curr_slice_id].append(
-                    tuple([contour[2], contour[1]]))
-
-        rois_to_save = {}
-        for key in pixels_coords_dict.keys():
-            coords = pixels_coords_dict[key]
-            polygon_list = ROI.calculate_concave_hull_of_points(coords)
-            if len(polygon_list) > 0:
-                rois_to_save[key] = {
-                    'ds': patient_dict_container.dataset[key],
-                    'coords': polygon_list
-                }
-        roi_list = ROI.convert_hull_list_to_contours_data(
-            rois_to_save, patient_dict_container)
-
-        if len(roi_list) > 0:
-            print("Saving ", roi_name)
-            if isinstance(patient_dict_container, MovingDictContainer):
-                new_rtss = ROI.create_roi(
-                    patient_dict_container.get("dataset_rtss"),
-                    roi_name, roi_list, rtss_owner="MOVING")
-                self.moving_dict_container.set("dataset_rtss", new_rtss)
-                self.moving_dict_container.set("rtss_modified", True)
-            else:
-                new_rtss = ROI.create_roi(
-                    patient_dict_container.get("dataset_rtss"),
-                    roi_name, roi_list)
-                self.patient_dict_container.set("dataset_rtss", new_rtss)
-                self.patient_dict_container.set("rtss_modified", True)
+        if not any(rois_contours.values()):
+            return
+        new_rtss = ROI.create_rois(
+            patient_dict_container.get("dataset_rtss"), rois_contours)
+        patient_dict_container.set("dataset_rtss", new_rtss)
+        patient_dict_container.set("rtss_modified", True)
 
     def closeWindow(self):
         """
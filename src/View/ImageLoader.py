@@ -1,15 +1,13 @@
 import os
-import platform
 from pathlib import Path
 
 from PySide6 import QtCore
 from pydicom import dcmread
 
-from src.Model import ImageLoading
+from src.Model import ImageLoading, NativeDVH
 from src.Model.CalculateDVHs import dvh2rtdose, rtdose2dvh
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.ROI import create_initial_rtss_from_ct
-from src.Model.GetPatientInfo import DicomTree
 
 
 class ImageLoader(QtCore.QObject):
@@ -43,7 +41,7 @@ class ImageLoader(QtCore.QObject):
             # Gets the common root folder.
             path = os.path.dirname(os.path.commonprefix(self.selected_files))
             read_data_dict, file_names_dict = ImageLoading.get_datasets(
-                self.selected_files)
+                self.selected_files, progress_callback=progress_callback)
         except ImageLoading.NotAllowedClassError:
             raise ImageLoading.NotAllowedClassError
 
@@ -71,7 +69,7 @@ class ImageLoader(QtCore.QObject):
             return False
 
         if 'rtss' in file_names_dict:
-            dataset_rtss = dcmread(file_names_dict['rtss'])
+            dataset_rtss = read_data_dict['rtss']
 
             progress_callback.emit(("Getting ROI info...", 10))
             rois = ImageLoading.get_roi_info(dataset_rtss)
@@ -124,28 +122,13 @@ class ImageLoader(QtCore.QObject):
                 if self.calc_dvh:
                     dataset_rtdose = dcmread(file_names_dict['rtdose'])
 
-                    # Spawn-based platforms (i.e Windows and MacOS) have
-                    # a large overhead when creating a new process, which
-                    # ends up making multiprocessing on these platforms more
-                    # expensive than linear calculation. As such,
-                    # multiprocessing is only available on Linux until a better
-                    # solution is found.
-                    fork_safe_platforms = ['Linux']
-                    if platform.system() in fork_safe_platforms:
-                        progress_callback.emit(("Calculating DVHs...", 60))
-                        raw_dvh = \
-                            ImageLoading.multi_calc_dvh(dataset_rtss,
-                                                        dataset_rtdose, rois,
-                                                        dict_thickness)
-                    else:
-                        progress_callback.emit(
-                            ("Calculating DVHs... (This may take a while)",
-                             60))
-                        raw_dvh = \
-                            ImageLoading.calc_dvhs(dataset_rtss,
-                                                   dataset_rtdose, rois,
-                                                   dict_thickness,
-                                                   interrupt_flag)
+                    progress_callback.emit(("Calculating DVHs...", 60))
+                    raw_dvh = \
+                        NativeDVH.multi_calc_dvhs(dataset_rtss,
+                                                  dataset_rtdose, rois,
+                                                  dict_thickness,
+                                                  interrupt_flag=
+                                                  interrupt_flag)
 
                     if interrupt_flag.is_set():  # Stop loading.
                         return False
@@ -208,8 +191,6 @@ class ImageLoader(QtCore.QObject):
         # Set some patient dict container attributes
         patient_dict_container.set("file_rtss", rtss_path)
         patient_dict_container.set("dataset_rtss", rtss)
-        ordered_dict = DicomTree(None).dataset_to_dict(rtss)
-        patient_dict_container.set("dict_dicom_tree_rtss", ordered_dict)
         patient_dict_container.set("selected_rois", [])
 
     def update_calc_dvh(self, advice):
@@ -5,14 +5,12 @@
 
 import csv
 import os
-import shutil
 
 import pandas as pd
 from pathlib import Path
 from PySide6 import QtCore
-from pydicom import dcmread
 from radiomics import featureextractor
-from src.Model import DICOMStructuredReport
+from src.Model import DICOMStructuredReport, Radiomics
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
@@ -34,51 +32,36 @@ class PyradiExtended(QtCore.QThread):
         # Set progress bar percentage to 0
         # Set ROI name to empty string as ROI not being processed
         self.my_callback(0, '')
-        # Read one ct file, done to later obtain patient hash
-        ct_file = dcmread(self.filepaths[0], force=True)
-        # Read RT-Struct file
-        rtss_path = self.filepaths['rtss']
+        # Get one ct file, done to later obtain patient hash
+        patient_dict_container = PatientDictContainer()
+        ct_file = patient_dict_container.dataset[0]
 
         if self.target_path == '':
             patient_hash = os.path.basename(ct_file.PatientID)
-            # Name of nrrd file
-            nrrd_file_name = patient_hash + '.nrrd'
-            # Location of folder where nrrd file saved
-            nrrd_folder_path = self.path + '/nrrd/'
             # Location of folder where pyradiomics output saved
             csv_path = self.path + '/CSV/'
         else:
             patient_hash = os.path.basename(self.target_path)
-            # Name of nrrd file
-            nrrd_file_name = patient_hash + '.nrrd'
-            # Location of folder where nrrd file saved
-            nrrd_folder_path = self.target_path + '/nrrd/'
             # Location of folder where pyradiomics output saved
             csv_path = self.target_path + '/CSV/'
 
-        # Complete path of converted file
-        nrrd_file_path = nrrd_folder_path + nrrd_file_name
-
-        # If folder does not exist
-        if not os.path.exists(nrrd_folder_path):
-            # Create folder
-            os.makedirs(nrrd_folder_path)
-
-        self.convert_to_nrrd(self.path, nrrd_file_path, self.my_callback)
-
-        # Location of folder where converted masks saved
-        mask_folder_path = nrrd_folder_path + 'structures'
-        self.convert_rois_to_nrrd(self.path, rtss_path, mask_folder_path,
-                                  self.my_callback)
+        # Create the image volume and ROI masks from the loaded datasets
+        image_slices = Radiomics.get_image_slices(
+            patient_dict_container.dataset)
+        # The pixel arrays of the loaded slices have been rescaled
+        image = Radiomics.create_image(
+            image_slices, patient_dict_container.has_attribute("scaled"),
+            ct_file.Modality == "CT")
+        # Set completed percentage to 25% and blank for ROI name
+        self.my_callback(25, '')
 
-        # Something went wrong, in this case PyRadiomics will also log an error
-        if nrrd_file_path is None or nrrd_folder_path is None:
-            print('Error getting testcase!')
-            exit()
+        roi_masks = Radiomics.create_roi_masks(
+            image, image_slices, patient_dict_container.get("dataset_rtss"))
+        # Set progress bar percentage to 50%
+        self.my_callback(50, '')
 
         radiomics_df = self.get_radiomics_df(
-            self.path, patient_hash, nrrd_file_path, mask_folder_path,
-            self.my_callback)
+            self.path, patient_hash, image, roi_masks, self.my_callback)
 
         self.convert_df_to_csv(radiomics_df, patient_hash,
                                csv_path, self.my_callback)
@@ -86,8 +69,7 @@ class PyradiExtended(QtCore.QThread):
         # Export radiomics to SR
         self.export_to_sr(csv_path, patient_hash)
 
-        # Delete CSV file and NRRD folder
-        shutil.rmtree(nrrd_folder_path)
+        # Delete CSV file
         os.remove(csv_path + 'Pyradiomics_' + patient_hash + '.csv')
 
     def my_callback(self, percent, roi_name):
@@ -100,62 +82,17 @@ class PyradiExtended(QtCore.QThread):
         """
         self.copied_percent_signal.emit(percent, roi_name)
 
-    def convert_to_nrrd(self, path, nrrd_file_path, callback):
-        """
-        Convert dicom files to nrrd using Plastimatch.
-
-        :param path:            Path to patient directory (str)
-        :param nrrd_file_path:  Path to nrrd folder (str)
-        :param callback:        Function to update progress bar
-        """
-        path = '"' + path + '"'
-        nrrd_file_path = '"' + nrrd_file_path + '"'
-        # Command to convert dicom files to nrrd
-        # Writes the result from the processing into a temporary file
-        # rather than the terminal
-        cmd_for_nrrd = 'plastimatch convert --input ' + path + \
-            ' --output-img ' + nrrd_file_path + ' 1>' + path + '/NUL'
-        # Command to delete the temporary file generated before
-        cmd_del_nul = 'rm ' + path + '/NUL'
-        os.system(cmd_for_nrrd)
-        os.system(cmd_del_nul)
-        # Set completed percentage to 25% and blank for ROI name
-        callback(25, '')
-
-    def convert_rois_to_nrrd(self, path, rtss_path, mask_folder_path, callback):
-        """
-        Generate an nrrd file for each region of interest using Plastimatch.
-
-        :param path:                Path to patient directory (str)
-        :param rtss_path:           Path to RT-Struct file (str)
-        :param mask_folder_path:    Folder to which the segmentation masks
-                                    will be saved(str)
-        :param callback:            Function to update progress bar
-        """
-        path = '"' + path + '"'
-        mask_folder_path = '"' + mask_folder_path + '"'
-        rtss_path = '"' + rtss_path + '"'
-        # Command for generating an nrrd file for each region of interest
-        cmd_for_segmask = 'plastimatch convert --input ' + rtss_path + \
-            ' --output-prefix ' + mask_folder_path + \
-            ' --prefix-format nrrd --referenced-ct ' + path + ' 1>' + \
-            path + '/NUL'
-        cmd_del_nul = 'rm ' + path + '/NUL'
-        os.system(cmd_for_segmask)
-        os.system(cmd_del_nul)
-        # Set progress bar percentage to 50%
-        callback(50, '')
-
-    def get_radiomics_df(self, path, patient_hash, nrrd_file_path,
-                         mask_folder_path, callback):
+    def get_radiomics_df(self, path, patient_hash, image, roi_masks,
+                         callback):
         """
         Run pyradiomics and return pandas dataframe with all the computed data.
 
         :param path:                Path to patient directory (str)
         :param patient_hash:        Patient hash ID generated from their
                                     identifiers
-        :param nrrd_file_path:      Path to folder with converted nrrd file
-        :param mask_folder_path:    Path to ROI nrrd files
+        :param image:               SimpleITK image of the patient
+        :param roi_masks:           Dictionary of SimpleITK masks of the
+                                    ROIs, with ROI names as keys
         :param callback:            Function to update progress bar
         :return:                    Pandas dataframe
         """
@@ -171,7 +108,7 @@ class PyradiExtended(QtCore.QThread):
         #   'additionalInfo': True
         extractor = featureextractor.RadiomicsFeatureExtractor()
 
-        num_masks = len([file for file in os.listdir(mask_folder_path)])
+        num_masks = len(roi_masks)
         progress_increment = (50/num_masks)
         progress_percent = 50
 
@@ -181,19 +118,15 @@ class PyradiExtended(QtCore.QThread):
         radiomics_headers = []
         feature_vector = ''
 
-        for file in os.listdir(mask_folder_path):
+        for image_id, roi_mask in roi_masks.items():
             # Contains features for current ROI
             roi_features = []
             roi_features.append(patient_hash)
             roi_features.append(path)
-            # Full path of ROI nrrd file
-            mask_name = mask_folder_path + '/' + file
-            # Name of ROI
-            image_id = file.split('.')[0]
 
             callback(progress_percent, image_id)
 
-            feature_vector = extractor.execute(nrrd_file_path, mask_name)
+            feature_vector = extractor.execute(image, roi_mask)
             roi_features.append(image_id)
 
             # Add first order features to list
@@ -284,6 +284,36 @@ class ImageFusionOptions(object):
             "up to three integer elements in an array. Example [4, 2, 1]")
         self.gridLayout.addWidget(self.smooth_sigmas_qLineEdit, 4, 3)
 
+        # Sampling Strategy
+        self.sampling_strategy_label = QLabel("Sampling Strategy")
+        self.sampling_strategy_label.setAlignment(
+            Qt.AlignLeft | Qt.AlignTrailing | Qt.AlignVCenter)
+        self.gridLayout.addWidget(self.sampling_strategy_label, 5, 2)
+
+        self.sampling_strategy_comboBox = QComboBox()
+        self.sampling_strategy_comboBox.addItem("random")
+        self.sampling_strategy_comboBox.addItem("regular")
+        self.sampling_strategy_comboBox.addItem("none")
+        self.sampling_strategy_comboBox.setToolTip(
+            "How the voxels sampled during each iteration are chosen. "
+            "'none' samples every voxel.")
+        self.gridLayout.addWidget(self.sampling_strategy_comboBox, 5, 3)
+
+        # Number of Threads
+        self.no_of_threads_label = QLabel("Number of Threads")
+        self.no_of_threads_label.setAlignment(
+            Qt.AlignLeft | Qt.AlignTrailing | Qt.AlignVCenter)
+        self.gridLayout.addWidget(self.no_of_threads_label, 6, 0)
+
+        self.no_of_threads_spinBox = QSpinBox(self.gridLayoutWidget)
+        self.no_of_threads_spinBox.setSizePolicy(QSizePolicy.Minimum,
+                                                 QSizePolicy.Fixed)
+        self.no_of_threads_spinBox.setRange(0, 256)
+        self.no_of_threads_spinBox.setToolTip(
+            "Number of threads used for image registration. 0 uses every "
+            "CPU.")
+        self.gridLayout.addWidget(self.no_of_threads_spinBox, 6, 1)
+
         # Label to hold warning labels.
         self.warning_label = QLabel()
 
@@ -397,6 +427,23 @@ class ImageFusionOptions(object):
             msg += 'There was an error setting the Default Number'
             self.warning_label.setText(msg)
 
+        # Settings added after the first imageFusion.json keep their
+        # defaults if the file does not have them
+        index = self.sampling_strategy_comboBox.findText(
+            self.dict.get("sampling_strategy", "random"))
+        if index >= 0:
+            self.sampling_strategy_comboBox.setCurrentIndex(index)
+        else:
+            msg += 'There was an error setting the Sampling Strategy value.\n'
+            self.warning_label.setText(msg)
+
+        try:
+            self.no_of_threads_spinBox.setValue(
+                int(self.dict.get("number_of_threads", 0)))
+        except ValueError:
+            msg += 'There was an error setting the Number of Threads value.\n'
+            self.warning_label.setText(msg)
+
     def get_values_from_UI(self):
         """
         Sets values from the GUI to the dict that will be used to store the
@@ -419,6 +466,9 @@ class ImageFusionOptions(object):
         self.dict[
             "number_of_iterations"] = self.no_of_iterations_spinBox.value()
         self.dict["default_value"] = self.default_number_spinBox.value()
+        self.dict["sampling_strategy"] = \
+            str(self.sampling_strategy_comboBox.currentText())
+        self.dict["number_of_threads"] = self.no_of_threads_spinBox.value()
 
         return self.dict
 
@@ -443,3 +493,5 @@ class ImageFusionOptions(object):
         self.interp_order_spinbox.setValue(2)
         self.no_of_iterations_spinBox.setValue(50)
         self.default_number_spinBox.setValue(-1000)
+        self.sampling_strategy_comboBox.setCurrentIndex(0)
+        self.no_of_threads_spinBox.setValue(0)
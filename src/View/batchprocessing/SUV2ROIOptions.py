@@ -41,9 +41,26 @@ class SUV2ROIOptions(QtWidgets.QWidget):
         self.info_label.setWordWrap(True)
 
         self.main_layout.addWidget(self.info_label)
+        self.create_suv_levels_entry()
         self.create_table_view()
         self.setLayout(self.main_layout)
 
+    def create_suv_levels_entry(self):
+        """
+        Create a line edit to let the user choose the SUV levels to
+        generate ROIs for.
+        """
+        self.suv_levels_layout = QtWidgets.QFormLayout()
+        self.suv_levels_label = QtWidgets.QLabel("SUV Levels:")
+        self.suv_levels_label.setStyleSheet(self.stylesheet)
+        self.suv_levels_entry = QtWidgets.QLineEdit()
+        self.suv_levels_entry.setStyleSheet(self.stylesheet)
+        self.suv_levels_entry.setPlaceholderText(
+            "Every whole SUV level, or e.g. 2.5, 4, 6")
+        self.suv_levels_layout.addRow(self.suv_levels_label,
+                                      self.suv_levels_entry)
+        self.main_layout.addLayout(self.suv_levels_layout)
+
     def create_table_view(self):
         """
         Create a table to display all of the datasets containing PET images
@@ -174,3 +191,26 @@ class SUV2ROIOptions(QtWidgets.QWidget):
             patient_weights[patient_id] = num
 
         return patient_weights
+
+    def get_suv_levels(self):
+        """
+        Returns the SUV levels entered by the user.
+        :return: suv_levels, a list of SUV levels, empty for every whole
+                 SUV level, or None if a level is not a valid (> 0)
+                 number.
+        """
+        suv_levels = []
+        for level in self.suv_levels_entry.text().split(','):
+            if level.strip() == '':
+                continue
+            try:
+                num = float(level)
+                if num <= 0:
+                    raise ValueError
+            # Return if a level is not positive or not a number
+            except ValueError:
+                return None
+            # Whole levels are named as the default levels are
+            suv_levels.append(int(num) if num.is_integer() else num)
+
+        return suv_levels
@@ -9,7 +9,7 @@ from PySide6 import QtWidgets, QtCore, QtGui
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 
 from src.Controller.PathHandler import resource_path
-from src.Model import ImageLoading
+from src.Model import ImageLoading, NativeDVH
 from src.Model.CalculateDVHs import dvh2csv, dvh2rtdose, rtdose2dvh
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.Worker import Worker
@@ -340,11 +340,9 @@ class CalculateDVHProgressWindow(QtWidgets.QDialog):
         dict_thickness = ImageLoading.get_thickness_dict(dataset_rtss, self.patient_dict_container.dataset)
 
         interrupt_flag = threading.Event()
-        fork_safe_platforms = ['Linux']
-        if platform.system() in fork_safe_platforms:
-            worker = Worker(ImageLoading.multi_calc_dvh, dataset_rtss, dataset_rtdose, rois, dict_thickness)
-        else:
-            worker = Worker(ImageLoading.calc_dvhs, dataset_rtss, dataset_rtdose, rois, dict_thickness, interrupt_flag)
+        worker = Worker(NativeDVH.multi_calc_dvhs, dataset_rtss,
+                        dataset_rtdose, rois, dict_thickness,
+                        interrupt_flag=interrupt_flag)
 
         worker.signals.result.connect(self.dvh_calculated)
 
@@ -1,3 +1,5 @@
+from src.Model.Isodose import get_dose_volume, \
+    get_reslice_isodose_polygons
 from src.View.mainpage.DicomView import DicomView
 
 
@@ -24,5 +26,22 @@ class DicomSagittalView(DicomView):
             super().draw_roi_polygons(roi, polygons)
 
     def isodose_display(self):
-        # TODO: Display ISODose on Sagittal View
-        pass
+        """
+        Display isodoses on the sagittal view. The isodoses are contoured on
+        the dose volume, and cached per (view, slice, dose).
+        """
+        slider_id = self.slider.value()
+        aspect = self.patient_dict_container.get("pixmap_aspect")
+        dose_pixluts = self.patient_dict_container.get("dose_pixluts")[
+            self.patient_dict_container.get("dict_uid")[0]]
+
+        # Higher doses paint over lower doses
+        selected_doses = sorted(
+            self.patient_dict_container.get("selected_doses"))
+        slice_isodoses = get_reslice_isodose_polygons(
+            self.get_isodose_cache(), self.slice_view, slider_id,
+            get_dose_volume(self.patient_dict_container), dose_pixluts,
+            selected_doses,
+            self.patient_dict_container.get("rx_dose_in_cgray"),
+            1 / aspect["sagittal"])
+        self.draw_isodose_polygons(selected_doses, slice_isodoses)
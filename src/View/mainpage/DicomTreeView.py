@@ -1,10 +1,16 @@
+import itertools
+
 from PySide6 import QtWidgets, QtGui, QtCore
+from pydicom.sequence import Sequence
 
 from src.Model.GetPatientInfo import DicomTree
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
 class DicomTreeView(QtWidgets.QWidget):
+    # Data role of the key of the sequence or dataset of a node that has
+    # not been expanded yet
+    LAZY_NODE_ROLE = QtCore.Qt.UserRole + 1
 
     def __init__(self):
         QtWidgets.QWidget.__init__(self)
@@ -16,7 +22,10 @@ class DicomTreeView(QtWidgets.QWidget):
 
         self.selector = self.create_selector_combobox()
 
+        self.lazy_nodes = {}
+        self.lazy_node_keys = itertools.count()
         self.tree_view = QtWidgets.QTreeView()
+        self.tree_view.expanded.connect(self.expand_node)
         self.model_tree = QtGui.QStandardItemModel(0, 5)
         self.init_headers_tree()
         self.tree_view.setModel(self.model_tree)
@@ -44,7 +53,6 @@ class DicomTreeView(QtWidgets.QWidget):
         self.tree_view.setEditTriggers(
             QtWidgets.QAbstractItemView.NoEditTriggers | QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tree_view.setAlternatingRowColors(True)
-        self.tree_view.expandAll()
 
     def create_selector_combobox(self):
         combobox = QtWidgets.QComboBox()
@@ -89,68 +97,93 @@ class DicomTreeView(QtWidgets.QWidget):
 
     def update_tree(self, image_slice, id, name):
         """
-        Update the DICOM Tree view.
+        Update the DICOM Tree view. Only the top level elements of the
+        selected dataset are added, the items of a sequence are added
+        when its node is expanded.
         :param image_slice: Boolean indicating if it is an image slice or not
         :param id: ID for the selected file
         :param name: Name of the selected dataset if not an image file
         :return:
         """
         self.model_tree.clear()
+        self.lazy_nodes = {}
 
         if image_slice:
-            filename = self.patient_dict_container.filepaths[id]
-            dicom_tree_slice = DicomTree(filename)
-            dict_tree = dicom_tree_slice.dict
-
-        elif name == "rtdose":
-            dict_tree = self.patient_dict_container.get(
-                "dict_dicom_tree_rtdose")
+            dataset = self.patient_dict_container.dataset[id]
 
         elif name == "rtss":
-            dict_tree = self.patient_dict_container.get("dict_dicom_tree_rtss")
-
-        elif name == "rtplan":
-            dict_tree = self.patient_dict_container.get(
-                "dict_dicom_tree_rtplan")
-
-        elif name == "sr-cd":
-            dict_tree = self.patient_dict_container.get("dict_dicom_tree_sr_cd")
+            dataset = self.patient_dict_container.get("dataset_rtss")
 
-        elif name == "sr-rad":
-            dict_tree = \
-                self.patient_dict_container.get("dict_dicom_tree_sr_pyrad")
+        elif name in self.special_files:
+            dataset = self.patient_dict_container.dataset[name]
 
         else:
-            dict_tree = None
+            dataset = None
             print("Error filename in update_tree function")
 
         parent_item = self.model_tree.invisibleRootItem()
-        self.recurse_build_model(dict_tree, parent_item)
+        if dataset is not None:
+            self.add_dataset_rows(dataset, parent_item)
         self.init_headers_tree()
         self.tree_view.setModel(self.model_tree)
         self.init_parameters_tree()
         self.dicom_tree_layout.addWidget(self.tree_view)
 
-    def recurse_build_model(self, dict_tree, parent):
+    def add_dataset_rows(self, dataset, parent):
         """
-        Update recursively the model used for the DICOM Tree view
-        :param dict_tree: The dictionary to be displayed
+        Add a row for every element of a dataset. The items of sequences
+        are added when the sequence is expanded.
+        :param dataset: The dataset to be displayed
         :param parent: Parent node of the tree
-        :return:
         """
-        for key in dict_tree:
-            value = dict_tree[key]
-            # If the value is a dictionary
-            if isinstance(value, type(dict_tree)):
-                # Recurse until leaf
-                item_child = QtGui.QStandardItem(key)
-                parent.appendRow(self.recurse_build_model(value, item_child))
-            else:
-                # If the value is a simple item, append it
-                item = [QtGui.QStandardItem(key),
-                        QtGui.QStandardItem(str(value[0])),
-                        QtGui.QStandardItem(str(value[1])),
-                        QtGui.QStandardItem(str(value[2])),
-                        QtGui.QStandardItem(str(value[3]))]
+        for data_element in dataset:
+            if data_element.VR == 'SQ':
+                item = QtGui.QStandardItem(data_element.name)
+                self.add_lazy_node(item, data_element.value)
                 parent.appendRow(item)
-        return parent
+            elif data_element.name != 'Pixel Data':
+                value = DicomTree.data_element_to_list(data_element)
+                parent.appendRow([QtGui.QStandardItem(data_element.name)] +
+                                 [QtGui.QStandardItem(str(column))
+                                  for column in value])
+
+    def add_sequence_rows(self, sequence, parent):
+        """
+        Add a row for every item of a sequence. The elements of an item
+        are added when the item is expanded.
+        :param sequence: The sequence to be displayed
+        :param parent: Parent node of the tree
+        """
+        for index, dataset_item in enumerate(sequence):
+            item = QtGui.QStandardItem('item ' + str(index))
+            self.add_lazy_node(item, dataset_item)
+            parent.appendRow(item)
+
+    def add_lazy_node(self, item, value):
+        """
+        Give a node an empty child, so that it can be expanded, and keep
+        the sequence or dataset to add to the node when it is expanded.
+        :param item: The node of the tree
+        :param value: The sequence or dataset of the node
+        """
+        key = next(self.lazy_node_keys)
+        self.lazy_nodes[key] = value
+        item.setData(key, self.LAZY_NODE_ROLE)
+        item.appendRow(QtGui.QStandardItem())
+
+    def expand_node(self, index):
+        """
+        Replace the empty child of an expanded node with the rows of its
+        sequence or dataset.
+        :param index: Model index of the expanded node
+        """
+        item = self.model_tree.itemFromIndex(index)
+        key = item.data(self.LAZY_NODE_ROLE)
+        if key is None or key not in self.lazy_nodes:
+            return
+        value = self.lazy_nodes.pop(key)
+        item.removeRows(0, item.rowCount())
+        if isinstance(value, Sequence):
+            self.add_sequence_rows(value, item)
+        else:
+            self.add_dataset_rows(value, item)
@@ -125,6 +125,48 @@ class DicomView(QtWidgets.QWidget):
         for i in range(len(polygons)):
             self.scene.addPolygon(polygons[i], pen, QtGui.QBrush(color))
 
+    def draw_isodose_polygons(self, selected_doses, slice_isodoses):
+        """
+        Draw isodose polygons on the image slice
+        :param selected_doses: List of selected doses, in the order in
+        which they are drawn
+        :param slice_isodoses: Dictionary of lists of isodose polygons,
+        with the selected doses as keys
+        """
+        with open(data_path('line&fill_configuration'), 'r') as stream:
+            elements = stream.readlines()
+            if len(elements) > 0:
+                iso_line = int(elements[2].replace('\n', ''))
+                iso_opacity = int(elements[3].replace('\n', ''))
+                line_width = float(elements[4].replace('\n', ''))
+            else:
+                iso_line = 2
+                iso_opacity = 5
+                line_width = 2.0
+            stream.close()
+        iso_opacity = int((iso_opacity / 100) * 255)
+
+        for sd in selected_doses:
+            polygons = slice_isodoses[sd]
+            brush_color = self.iso_color[sd]
+            brush_color.setAlpha(iso_opacity)
+            pen_color = QtGui.QColor(
+                brush_color.red(), brush_color.green(), brush_color.blue())
+            pen = self.get_qpen(pen_color, iso_line, line_width)
+            for i in range(len(polygons)):
+                self.scene.addPolygon(
+                    polygons[i], pen, QtGui.QBrush(brush_color))
+
+    def get_isodose_cache(self):
+        """
+        :return: Dictionary of isodose polygons of the patient.
+        """
+        isodose_cache = self.patient_dict_container.get("isodose_cache")
+        if isodose_cache is None:
+            isodose_cache = {}
+            self.patient_dict_container.set("isodose_cache", isodose_cache)
+        return isodose_cache
+
     def get_qpen(self, color, style=1, widthF=1.):
         """
         The color and style for ROI structure and isodose display.
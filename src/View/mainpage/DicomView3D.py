@@ -59,9 +59,10 @@ class DicomView3D(QtWidgets.QWidget):
         convert it to a vtk 3D array
         """
 
-        three_dimension_np_array = np.array(self.patient_dict_container.
-                                            additional_data["pixel_values"])
-        three_dimension_np_array = three_dimension_np_array.astype(np.int16)
+        # pixel_values is already a 3D numpy array, so it is only copied
+        # once when it is cast
+        three_dimension_np_array = np.asarray(
+            self.patient_dict_container.get("pixel_values")).astype(np.int16)
         three_dimension_np_array = (three_dimension_np_array -
                                     (self.patient_dict_container.get("level"))) / \
             self.patient_dict_container.get("window") * 255
@@ -1,5 +1,9 @@
+import threading
+
 from PySide6 import QtWidgets, QtGui, QtCore
+from src.Model.Isodose import calc_isodose_cache, get_dose_volume
 from src.Model.PatientDictContainer import PatientDictContainer
+from src.Model.Worker import Worker
 from src.View.ProgressWindow import ProgressWindow
 from src.Model.ISO2ROI import ISO2ROI
 
@@ -43,6 +47,10 @@ class IsodoseTab(QtWidgets.QWidget):
             self, QtCore.Qt.WindowTitleHint | QtCore.Qt.WindowCloseButtonHint)
         self.progress_window.signal_loaded.connect(self.on_loaded_iso2roi)
 
+        # Isodoses of all slices are calculated in the background
+        self.threadpool = QtCore.QThreadPool()
+        self.isodose_interrupt_flag = threading.Event()
+
     def init_layout(self):
         for i in range(0, len(self.checkboxes)):
             widget_isodose = QtWidgets.QWidget()
@@ -139,6 +147,31 @@ class IsodoseTab(QtWidgets.QWidget):
         # Update the dicom view
         self.request_update_isodoses.emit()
 
+        if state:
+            self.start_isodose_calculation()
+
+    def start_isodose_calculation(self):
+        """
+        Calculate the isodoses of the selected doses of all slices into the
+        isodose cache in a worker thread, stopping any previous
+        calculation. Levels which are already cached are not recalculated.
+        """
+        self.isodose_interrupt_flag.set()
+        self.isodose_interrupt_flag = threading.Event()
+
+        isodose_cache = self.patient_dict_container.get("isodose_cache")
+        if isodose_cache is None:
+            isodose_cache = {}
+            self.patient_dict_container.set("isodose_cache", isodose_cache)
+
+        worker = Worker(calc_isodose_cache, isodose_cache,
+                        get_dose_volume(self.patient_dict_container),
+                        self.patient_dict_container.get("dose_pixluts"),
+                        self.patient_dict_container.get("selected_doses"),
+                        self.patient_dict_container.get("rx_dose_in_cgray"),
+                        self.isodose_interrupt_flag)
+        self.threadpool.start(worker)
+
     def draw_color_square(self, color):
         """
         Create a color square.
@@ -10,7 +10,6 @@ from src.Controller.ROIOptionsController import ROIDelOption, ROIDrawOption, \
 from src.Model.DICOMStructure import Series
 from src.Model import ImageLoading
 from src.Model.CalculateDVHs import dvh2rtdose
-from src.Model.GetPatientInfo import DicomTree
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model.MovingDictContainer import MovingDictContainer
 from src.Model.ROI import ordered_list_rois, get_roi_contour_pixel, \
@@ -105,19 +104,17 @@ class StructureTab(QtWidgets.QWidget):
         """
         roi_color = dict()
         roi_contour_info = dict_container.get(
-            "dict_dicom_tree_rtss")['ROI Contour Sequence']
+            "dataset_rtss").get('ROIContourSequence', [])
 
         if len(roi_contour_info) > 0:
-            for item, roi_dict in roi_contour_info.items():
-                # Note: the keys of roiContourInfo are "item 0", "item 1",
-                # etc. As all the ROI structures are identified by the ROI
+            for id, roi_dict in enumerate(roi_contour_info):
+                # As all the ROI structures are identified by the ROI
                 # numbers in the whole code, we get the ROI number 'roi_id'
                 # by using the member 'list_roi_numbers'
-                id = item.split()[1]
                 roi_id = dict_container.get(
-                    "list_roi_numbers")[int(id)]
-                if 'ROI Display Color' in roi_contour_info[item]:
-                    RGB_list = roi_contour_info[item]['ROI Display Color'][0]
+                    "list_roi_numbers")[id]
+                if 'ROIDisplayColor' in roi_dict:
+                    RGB_list = roi_dict.ROIDisplayColor
                     red = RGB_list[0]
                     green = RGB_list[1]
                     blue = RGB_list[2]
@@ -290,12 +287,6 @@ class StructureTab(QtWidgets.QWidget):
         self.moving_dict_container.set("dict_polygons_coronal", {})
 
         if "draw" in change_description or "transfer" in change_description:
-            dicom_tree_rtss = DicomTree(None)
-            dicom_tree_rtss.dataset = new_dataset
-            dicom_tree_rtss.dict = dicom_tree_rtss.dataset_to_dict(
-                dicom_tree_rtss.dataset)
-            self.moving_dict_container.set(
-                "dict_dicom_tree_rtss", dicom_tree_rtss.dict)
             self.color_dict = self.init_color_roi(self.moving_dict_container)
             self.moving_dict_container.set("roi_color_dict", self.color_dict)
             if self.moving_dict_container.has_attribute("raw_dvh"):
@@ -383,14 +374,10 @@ class StructureTab(QtWidgets.QWidget):
         self.patient_dict_container.set("dict_polygons_axial", {})
         self.patient_dict_container.set("dict_polygons_sagittal", {})
         self.patient_dict_container.set("dict_polygons_coronal", {})
+        # Polygons cached for the previous RTSS are stale
+        self.patient_dict_container.set("roi_polygon_cache", {})
 
         if "draw" in change_description or "transfer" in change_description:
-            dicom_tree_rtss = DicomTree(None)
-            dicom_tree_rtss.dataset = new_dataset
-            dicom_tree_rtss.dict = dicom_tree_rtss.dataset_to_dict(
-                dicom_tree_rtss.dataset)
-            self.patient_dict_container.set(
-                "dict_dicom_tree_rtss", dicom_tree_rtss.dict)
             self.color_dict = self.init_color_roi(self.patient_dict_container)
             self.patient_dict_container.set("roi_color_dict", self.color_dict)
             if self.patient_dict_container.has_attribute("raw_dvh"):
@@ -474,40 +461,14 @@ class StructureTab(QtWidgets.QWidget):
             "dict_polygons_coronal")
         new_dict_polygons_sagittal = self.patient_dict_container.get(
             "dict_polygons_sagittal")
-        aspect = self.patient_dict_container.get("pixmap_aspect")
         roi_name = rois[roi_id]['name']
 
         if state:
-            new_dict_polygons_axial[roi_name] = {}
-            new_dict_polygons_coronal[roi_name] = {}
-            new_dict_polygons_sagittal[roi_name] = {}
-            dict_rois_contours_axial = get_roi_contour_pixel(
-                self.patient_dict_container.get("raw_contour"),
-                [roi_name], self.patient_dict_container.get("pixluts"))
-            dict_rois_contours_coronal, dict_rois_contours_sagittal = \
-                transform_rois_contours(
-                    dict_rois_contours_axial)
-
-            for slice_id in self.patient_dict_container.get(
-                    "dict_uid").values():
-                polygons = calc_roi_polygon(roi_name, slice_id,
-                                            dict_rois_contours_axial)
-                new_dict_polygons_axial[roi_name][slice_id] = polygons
-
-            for slice_id in range(0, len(self.patient_dict_container.get(
-                    "pixmaps_coronal"))):
-                polygons_coronal = calc_roi_polygon(
-                    roi_name, slice_id,
-                    dict_rois_contours_coronal,
-                    aspect["coronal"])
-                polygons_sagittal = calc_roi_polygon(
-                    roi_name, slice_id,
-                    dict_rois_contours_sagittal,
-                    1 / aspect["sagittal"])
-                new_dict_polygons_coronal[roi_name][
-                    slice_id] = polygons_coronal
-                new_dict_polygons_sagittal[roi_name][
-                    slice_id] = polygons_sagittal
+            polygons_axial, polygons_coronal, polygons_sagittal = \
+                self.get_roi_polygons(roi_name)
+            new_dict_polygons_axial[roi_name] = polygons_axial
+            new_dict_polygons_coronal[roi_name] = polygons_coronal
+            new_dict_polygons_sagittal[roi_name] = polygons_sagittal
 
             self.patient_dict_container.set("dict_polygons_axial",
                                             new_dict_polygons_axial)
@@ -520,6 +481,62 @@ class StructureTab(QtWidgets.QWidget):
             new_dict_polygons_coronal.pop(roi_name, None)
             new_dict_polygons_sagittal.pop(roi_name, None)
 
+    def get_roi_polygons(self, roi_name):
+        """
+        Get the axial, coronal and sagittal polygons of an ROI. The
+        polygons are cached by ROI name until the RTSS is modified, so
+        selecting an ROI again after deselecting it does not recalculate
+        them.
+        :param roi_name: Name of the ROI
+        :return: Tuple of dictionaries of axial, coronal and sagittal
+            polygons, with slice ids as keys
+        """
+        roi_polygon_cache = self.patient_dict_container.get(
+            "roi_polygon_cache")
+        if roi_polygon_cache is None:
+            roi_polygon_cache = {}
+            self.patient_dict_container.set("roi_polygon_cache",
+                                            roi_polygon_cache)
+        if roi_name not in roi_polygon_cache:
+            roi_polygon_cache[roi_name] = self.calc_roi_polygons(roi_name)
+        return roi_polygon_cache[roi_name]
+
+    def calc_roi_polygons(self, roi_name):
+        """
+        Calculate the axial, coronal and sagittal polygons of an ROI.
+        :param roi_name: Name of the ROI
+        :return: Tuple of dictionaries of axial, coronal and sagittal
+            polygons, with slice ids as keys
+        """
+        aspect = self.patient_dict_container.get("pixmap_aspect")
+        polygons_axial = {}
+        polygons_coronal = {}
+        polygons_sagittal = {}
+        dict_rois_contours_axial = get_roi_contour_pixel(
+            self.patient_dict_container.get("raw_contour"),
+            [roi_name], self.patient_dict_container.get("pixluts"))
+        dict_rois_contours_coronal, dict_rois_contours_sagittal = \
+            transform_rois_contours(
+                dict_rois_contours_axial)
+
+        for slice_id in self.patient_dict_container.get(
+                "dict_uid").values():
+            polygons_axial[slice_id] = calc_roi_polygon(
+                roi_name, slice_id, dict_rois_contours_axial)
+
+        for slice_id in range(0, len(self.patient_dict_container.get(
+                "pixmaps_coronal"))):
+            polygons_coronal[slice_id] = calc_roi_polygon(
+                roi_name, slice_id,
+                dict_rois_contours_coronal,
+                aspect["coronal"])
+            polygons_sagittal[slice_id] = calc_roi_polygon(
+                roi_name, slice_id,
+                dict_rois_contours_sagittal,
+                1 / aspect["sagittal"])
+
+        return polygons_axial, polygons_coronal, polygons_sagittal
+
     def on_rtss_selected(self, selected_rtss):
         """
         Function to run after a rtss is selected from SelectRTSSPopUp
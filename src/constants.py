@@ -3,3 +3,18 @@ INITIAL_ONE_VIEW_ZOOM = 1
 INITIAL_FOUR_VIEW_ZOOM = 0.5
 INITIAL_DRAWING_TOOL_RADIUS = 19
 CT_RESCALE_INTERCEPT = 1024
+PIXMAP_CACHE_SIZE = 64
+# Maximum number of DVH worker processes, None for the number of CPUs
+DVH_MAX_WORKERS = None
+# Maximum number of SUV2ROI worker processes, None for the number of CPUs
+SUV2ROI_MAX_WORKERS = None
+# Whether ISO2ROI and SUV2ROI segment connected components in 3D instead of
+# contouring every slice on its own
+VOLUMETRIC_SEGMENTATION = False
+# Smallest volume (in cm^3) of a component kept by volumetric segmentation
+MIN_COMPONENT_VOLUME = 0.1
+# Most metric samples per image registration level, so that registration
+# time does not grow with the size of the images
+REGISTRATION_MAX_METRIC_SAMPLES = 200000
+# Fewest voxels along any axis of a shrunk image registration level
+REGISTRATION_MIN_LEVEL_SIZE = 4
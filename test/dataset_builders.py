@@ -0,0 +1,79 @@
+"""
+Builders of small RT Struct and RT Dose datasets for tests that need
+synthetic structures or dose grids rather than the test data.
+"""
+import numpy as np
+from pydicom.dataset import Dataset
+from pydicom.sequence import Sequence
+
+
+def create_contour(points, z, slice_uid=None):
+    """
+    Create a closed planar contour.
+    :param points: List of [x, y] points of the contour.
+    :param z: Position of the plane of the contour.
+    :param slice_uid: SOPInstanceUID of the image slice the contour is on,
+        or None for a contour without a ContourImageSequence.
+    """
+    contour = Dataset()
+    if slice_uid is not None:
+        contour_image = Dataset()
+        contour_image.ReferencedSOPInstanceUID = slice_uid
+        contour.ContourImageSequence = Sequence([contour_image])
+    contour.ContourGeometricType = "CLOSED_PLANAR"
+    contour.NumberOfContourPoints = len(points)
+    contour.ContourData = [value for x, y in points for value in (x, y, z)]
+    return contour
+
+
+def create_rtss(rois):
+    """
+    Create an RT Struct.
+    :param rois: List of tuples (ROI number, ROI name, contours), where
+        contours is a list of contours from create_contour(..), or None for
+        an ROI without a ContourSequence.
+    """
+    rtss = Dataset()
+    structure_set_rois = []
+    roi_contours = []
+    for number, name, contours in rois:
+        roi = Dataset()
+        roi.ROINumber = number
+        roi.ROIName = name
+        structure_set_rois.append(roi)
+        roi_contour = Dataset()
+        roi_contour.ReferencedROINumber = number
+        if contours is not None:
+            roi_contour.ContourSequence = Sequence(contours)
+        roi_contours.append(roi_contour)
+    rtss.StructureSetROISequence = Sequence(structure_set_rois)
+    rtss.ROIContourSequence = Sequence(roi_contours)
+    return rtss
+
+
+def create_rtdose(dose, pixel_spacing, grid_frame_offsets):
+    """
+    Create an axial RT Dose with its first voxel at the origin.
+    :param dose: 3D numpy array (planes, rows, columns) of the dose in mGy.
+    :param pixel_spacing: [row spacing, column spacing] of the voxels.
+    :param grid_frame_offsets: Positions of the planes along z.
+    """
+    rtdose = Dataset()
+    rtdose.ImagePositionPatient = [0, 0, 0]
+    rtdose.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    rtdose.PixelSpacing = pixel_spacing
+    rtdose.GridFrameOffsetVector = grid_frame_offsets
+    rtdose.NumberOfFrames = dose.shape[0]
+    rtdose.Rows = dose.shape[1]
+    rtdose.Columns = dose.shape[2]
+    rtdose.SamplesPerPixel = 1
+    rtdose.PhotometricInterpretation = "MONOCHROME2"
+    rtdose.BitsAllocated = 32
+    rtdose.BitsStored = 32
+    rtdose.HighBit = 31
+    rtdose.PixelRepresentation = 0
+    rtdose.DoseGridScaling = 0.001
+    rtdose.PixelData = np.ascontiguousarray(dose, dtype=np.uint32).tobytes()
+    rtdose.file_meta = Dataset()
+    rtdose.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+    return rtdose
@@ -0,0 +1,126 @@
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from src.Model.CalculateImages import FusedPixmaps, FusedVolume, \
+    convert_raw_data, get_pixmaps, window_volume
+
+
+def test_get_pixmaps_lazy(qtbot):
+    """
+    Test that pixmaps are only rendered for requested slices, and that the
+    number of cached pixmaps is bounded.
+    """
+    pixel_values = [np.full((8, 6), i, dtype=np.int16) for i in range(4)]
+    pixmap_aspect = {"axial": 1, "coronal": 1, "sagittal": 1}
+    axial, coronal, sagittal = \
+        get_pixmaps(pixel_values, 400, 800, pixmap_aspect)
+
+    assert len(axial) == 4
+    assert len(coronal) == 8
+    assert len(sagittal) == 6
+    assert len(axial.cache) == 0
+
+    pixmap = axial[2]
+    assert not pixmap.isNull()
+    assert axial[2] is pixmap
+    assert list(axial.cache.keys()) == [2]
+
+    axial.cache_size = 2
+    axial[0]
+    axial[1]
+    assert list(axial.cache.keys()) == [0, 1]
+
+    # Changing the window discards rendered pixmaps
+    axial.set_window(100, 50)
+    assert len(axial.cache) == 0
+
+
+def test_fused_pixmaps(qtbot):
+    """
+    Test that the fused volumes are windowed once per window and level, and
+    that the pixmaps of the three views are rendered from views of them.
+    """
+    fixed = np.zeros((4, 8, 6), dtype=np.int16)
+    moving = np.zeros((4, 8, 6), dtype=np.int16)
+    fixed[:, :4] = 100
+    moving[:, :, :3] = 100
+    # Level 1074 and window 200 give pixel values from 50 to 250
+    fused_volume = FusedVolume(fixed, moving, 200, 1074)
+    assert fused_volume.windowing == (50, 200)
+    assert fused_volume.fixed_windowed[0, 0, 0] == 0.25
+    assert fused_volume.moving_windowed[0, 7, 5] == 0
+
+    # Brighter fixed pixels are green, brighter moving pixels are purple
+    rgb = fused_volume.get_color_slice("axial", 1)
+    assert rgb.shape == (8, 6, 3) and rgb.dtype == np.uint8
+    assert rgb[0, 0, 0] == rgb[0, 0, 1] == rgb[0, 0, 2]
+    assert rgb[0, 5, 1] > rgb[0, 5, 0]
+    assert rgb[7, 0, 1] < rgb[7, 0, 0]
+    assert fused_volume.get_color_slice("sagittal", 2).shape == (4, 8, 3)
+
+    axial = FusedPixmaps(fused_volume, "axial", 200, 1074)
+    coronal = FusedPixmaps(fused_volume, "coronal", 200, 1074)
+    assert len(axial) == 4 and len(coronal) == 8
+    pixmap = coronal[3]
+    assert not pixmap.isNull() and pixmap.width() == 512
+    assert coronal[3] is pixmap
+
+    # The same window and level are not windowed again
+    fixed_windowed = fused_volume.fixed_windowed
+    axial.set_window(200, 1074)
+    assert fused_volume.fixed_windowed is fixed_windowed
+    coronal.set_window(100, 1074)
+    assert fused_volume.fixed_windowed is not fixed_windowed
+    assert len(coronal.cache) == 0
+
+
+def test_window_volume_without_width():
+    """
+    Test that a window without width thresholds the volume instead of
+    dividing by zero.
+    """
+    volume = np.array([[[-10, 0, 10]]], dtype=np.int16)
+    windowed = window_volume(volume, 0, 0)
+    assert windowed.tolist() == [[[0, 0, 1]]]
+    assert window_volume(volume, 0, -20).tolist() == [[[0, 0, 1]]]
+
+
+def create_image_dataset(value):
+    """
+    Create a minimal uncompressed image dataset filled with the given value.
+    """
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.Rows = 3
+    ds.Columns = 4
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 1
+    ds.RescaleSlope = "2.0"
+    ds.RescaleIntercept = "-10"
+    ds.PixelData = np.full((3, 4), value, dtype=np.int16).tobytes()
+    return ds
+
+
+def test_convert_raw_data_shared_volume():
+    """
+    Test that the pixels are decoded into one volume, and that the pixel
+    arrays of the datasets are views of that volume.
+    """
+    dataset = {0: create_image_dataset(0), 1: create_image_dataset(5),
+               'rtss': Dataset()}
+    volume = convert_raw_data(dataset, False)
+
+    assert volume.shape == (2, 3, 4)
+    assert volume.flags['C_CONTIGUOUS']
+    assert np.all(volume[1] == 0)
+    assert np.all(dataset[0].pixel_array == -10)
+    assert np.shares_memory(dataset[1].pixel_array, volume)
+
+    # Already converted datasets reuse the existing volume
+    assert convert_raw_data(dataset, True) is volume
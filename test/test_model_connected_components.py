@@ -0,0 +1,50 @@
+import numpy as np
+from skimage import measure
+
+from src.Model.ConnectedComponents import calc_component_contours, \
+    get_min_voxels, get_voxel_volume, label_components
+
+
+def create_volume():
+    """
+    Create a volume of 5 slices of 20 x 20 voxels with a box of 3 x 8 x 8
+    voxels, a single voxel and a second box touching the first diagonally.
+    """
+    volume = np.zeros((5, 20, 20), dtype=np.float32)
+    volume[1:4, 2:10, 2:10] = 5
+    volume[2, 15, 15] = 5
+    volume[2, 10:12, 10:12] = 3
+    return volume
+
+
+def test_label_components():
+    volume = create_volume()
+    kept = label_components(volume, 1, min_voxels=2)
+    # The diagonal box belongs to the large box, the single voxel is left
+    assert kept.sum() == 3 * 8 * 8 + 4
+    assert not kept[2, 15, 15]
+    assert label_components(volume, 10).sum() == 0
+
+
+def test_calc_component_contours():
+    volume = create_volume()
+    slice_contours = calc_component_contours(volume, 1, min_voxels=2)
+    assert len(slice_contours) == 5
+    assert slice_contours[0] == [] and slice_contours[4] == []
+
+    # Kept components are contoured as on each slice on its own
+    expected = measure.find_contours(volume[1], 1)
+    assert len(slice_contours[1]) == len(expected)
+    assert np.array_equal(slice_contours[1][0], expected[0])
+    # The boxes touch diagonally, so marching squares gives two contours
+    assert len(slice_contours[2]) == 2
+
+    # Without a minimum size the single voxel is contoured too
+    assert len(calc_component_contours(volume, 1)[2]) == 3
+
+
+def test_get_min_voxels():
+    voxel_volume = get_voxel_volume([2, 2.5], [0, 3, 6, 9])
+    assert np.isclose(voxel_volume, 2 * 2.5 * 3 / 1000)
+    assert get_min_voxels(0.1, voxel_volume) == 7
+    assert get_min_voxels(0, voxel_volume) == 1
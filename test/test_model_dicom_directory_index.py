@@ -0,0 +1,141 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from src.Model import DICOMDirectorySearch
+from src.Model.DICOMDirectoryIndex import DICOMDirectoryIndex
+from src.Model.DICOMDirectorySearch import get_dicom_structure
+
+INDEX_DB_FILE = 'TestDICOMIndex.db'
+
+
+class DummyProgressCallback:
+    def __init__(self):
+        self.progress = []
+
+    def emit(self, progress):
+        self.progress.append(progress)
+
+
+def save_ct_file(file_path, series_uid):
+    """
+    Save a small CT image file.
+    """
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+    ds.SOPInstanceUID = generate_uid()
+    ds.Modality = "CT"
+    ds.PatientID = "TEST"
+    ds.PatientName = "Test^Patient"
+    ds.StudyInstanceUID = "1.2.3"
+    ds.SeriesInstanceUID = series_uid
+    ds.Rows = 2
+    ds.Columns = 2
+    ds.BitsAllocated = 16
+    ds.PixelData = np.zeros((2, 2), dtype=np.int16).tobytes()
+    ds.save_as(file_path, write_like_original=False)
+
+
+@pytest.fixture()
+def index_db():
+    """Remove the test index database after each test."""
+    yield
+    index = DICOMDirectoryIndex(INDEX_DB_FILE)
+    index.close()
+    os.remove(index.db_file_path)
+
+
+def count_reads(monkeypatch):
+    """
+    Record the files read by read_dicom_header.
+    :return: List of the names of the files read.
+    """
+    read_files = []
+    read_dicom_header = DICOMDirectorySearch.read_dicom_header
+
+    def counting_read_dicom_header(file_path):
+        read_files.append(Path(file_path).name)
+        return read_dicom_header(file_path)
+
+    monkeypatch.setattr(DICOMDirectorySearch, "read_dicom_header",
+                        counting_read_dicom_header)
+    return read_files
+
+
+def test_rescan_uses_index(tmp_path, index_db, monkeypatch):
+    series_uid = generate_uid()
+    for i in range(3):
+        save_ct_file(tmp_path.joinpath("ct%s.dcm" % i), series_uid)
+    tmp_path.joinpath("notes.txt").write_text("not a DICOM file")
+
+    structure = get_dicom_structure(tmp_path, threading.Event(),
+                                    DummyProgressCallback(),
+                                    index_db_file=INDEX_DB_FILE)
+    assert len(structure.get_files()) == 3
+
+    index = DICOMDirectoryIndex(INDEX_DB_FILE)
+    entries = index.get_entries(tmp_path)
+    index.close()
+    assert len(entries) == 4
+    assert entries[str(tmp_path.joinpath("notes.txt"))][2] is None
+
+    # Delete a file and add a new one
+    os.remove(tmp_path.joinpath("ct0.dcm"))
+    save_ct_file(tmp_path.joinpath("ct3.dcm"), series_uid)
+
+    read_files = count_reads(monkeypatch)
+    progress_callback = DummyProgressCallback()
+    structure = get_dicom_structure(tmp_path, threading.Event(),
+                                    progress_callback,
+                                    index_db_file=INDEX_DB_FILE)
+    files = structure.get_files()
+    assert sorted(Path(file).name for file in files) == \
+        ["ct1.dcm", "ct2.dcm", "ct3.dcm"]
+    assert progress_callback.progress[-1] == "4"
+    # Only the new file is read, the others come from the index
+    assert read_files == ["ct3.dcm"]
+
+    index = DICOMDirectoryIndex(INDEX_DB_FILE)
+    entries = index.get_entries(tmp_path)
+    index.close()
+    assert str(tmp_path.joinpath("ct0.dcm")) not in entries
+    assert str(tmp_path.joinpath("ct3.dcm")) in entries
+
+
+def test_unopened_files_are_not_indexed(tmp_path, index_db, monkeypatch):
+    save_ct_file(tmp_path.joinpath("ct0.dcm"), generate_uid())
+    save_ct_file(tmp_path.joinpath("ct1.dcm"), generate_uid())
+    read_dicom_header = DICOMDirectorySearch.read_dicom_header
+
+    def read_dicom_header_denied(file_path):
+        if Path(file_path).name == "ct1.dcm":
+            raise PermissionError(file_path)
+        return read_dicom_header(file_path)
+
+    monkeypatch.setattr(DICOMDirectorySearch, "read_dicom_header",
+                        read_dicom_header_denied)
+    structure = get_dicom_structure(tmp_path, threading.Event(),
+                                    DummyProgressCallback(),
+                                    index_db_file=INDEX_DB_FILE)
+    assert len(structure.get_files()) == 1
+
+    index = DICOMDirectoryIndex(INDEX_DB_FILE)
+    entries = index.get_entries(tmp_path)
+    index.close()
+    assert list(entries) == [str(tmp_path.joinpath("ct0.dcm"))]
+
+    # The file is read again once it can be opened
+    monkeypatch.undo()
+    read_files = count_reads(monkeypatch)
+    structure = get_dicom_structure(tmp_path, threading.Event(),
+                                    DummyProgressCallback(),
+                                    index_db_file=INDEX_DB_FILE)
+    assert len(structure.get_files()) == 2
+    assert read_files == ["ct1.dcm"]
@@ -0,0 +1,87 @@
+from io import BytesIO
+
+import numpy as np
+from pydicom import dcmread
+from pydicom.dataelem import RawDataElement
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ImplicitVRLittleEndian
+
+import dataset_builders
+from dataset_builders import create_contour
+from src.Model import ImageLoading
+
+RTSS_SOP_CLASS_UID = "1.2.840.10008.5.1.4.1.1.481.3"
+
+
+def create_rtss():
+    """
+    Create an RT Struct with an ROI of two contours on slice "1.1" and one
+    on slice "1.2", and an ROI without contours, and read it back from
+    a file.
+    """
+    rtss = dataset_builders.create_rtss([
+        (1, "BODY", [create_contour([[0, 0], [10.5, 0], [10.5, -2.25]], 0,
+                                    "1.1"),
+                     create_contour([[1, 1], [2, 1], [2, 2], [1, 2]], 0,
+                                    "1.1"),
+                     create_contour([[0, 0], [5, 0], [5, 5]], 3, "1.2")]),
+        (2, "EMPTY", None)])
+    rtss.file_meta = FileMetaDataset()
+    rtss.file_meta.TransferSyntaxUID = ImplicitVRLittleEndian
+    rtss.file_meta.MediaStorageSOPClassUID = RTSS_SOP_CLASS_UID
+    rtss.file_meta.MediaStorageSOPInstanceUID = "1.2.3"
+    rtss.SOPClassUID = RTSS_SOP_CLASS_UID
+    rtss.SOPInstanceUID = "1.2.3"
+
+    file = BytesIO()
+    rtss.save_as(file, write_like_original=False)
+    file.seek(0)
+    return dcmread(file, force=True)
+
+
+def test_get_raw_contour_data():
+    rtss = create_rtss()
+    dict_roi, dict_numpoints = ImageLoading.get_raw_contour_data(rtss)
+    assert dict_numpoints == {"BODY": 10, "EMPTY": 0}
+    body = dict_roi["BODY"]
+    assert list(body) == ["1.1", "1.2"]
+    assert len(dict_roi["EMPTY"]) == 0
+
+    # The contours are indexed without decoding the ContourData
+    contour = rtss.ROIContourSequence[0].ContourSequence[0]
+    assert isinstance(contour.get_item(ImageLoading.CONTOUR_DATA_TAG),
+                      RawDataElement)
+
+    contours = body["1.1"]
+    assert len(contours) == 2
+    assert np.array_equal(contours[0], [0, 0, 0, 10.5, 0, 0, 10.5, -2.25, 0])
+    assert len(contours[1]) == 12
+    assert body["1.1"] is contours
+    assert isinstance(contour.get_item(ImageLoading.CONTOUR_DATA_TAG),
+                      RawDataElement)
+
+    # Slices without contours have none
+    assert "1.3" not in body
+    assert body["1.3"] == []
+
+
+def test_get_contour_data():
+    contour = create_contour([[0, 1.5]], 2, "1.1")
+    assert np.array_equal(ImageLoading.get_contour_data(contour), [0, 1.5, 2])
+    assert len(ImageLoading.get_contour_data(Dataset())) == 0
+
+    # Converted elements give the same values as raw ones
+    rtss = create_rtss()
+    contour = rtss.ROIContourSequence[0].ContourSequence[2]
+    raw = ImageLoading.get_contour_data(contour)
+    assert len(contour.ContourData) == 9
+    assert np.array_equal(ImageLoading.get_contour_data(contour), raw)
+
+    # Raw values padded with a space or a NUL
+    for value in (b"0\\1.5\\3 ", b"0\\1.5\\3\x00", b" 0\\1.5\\ 3\x00"):
+        contour = Dataset()
+        contour[ImageLoading.CONTOUR_DATA_TAG] = RawDataElement(
+            ImageLoading.CONTOUR_DATA_TAG, "DS", len(value), value, 0,
+            False, True)
+        assert np.array_equal(ImageLoading.get_contour_data(contour),
+                              [0, 1.5, 3])
@@ -0,0 +1,119 @@
+import threading
+
+import numpy as np
+import SimpleITK as sitk
+
+from src.Model import ImageRegistration
+
+
+class ProgressCallback:
+    """
+    Stand-in for a progress signal, which records the emitted progress and
+    can set an interrupt flag after a number of emits.
+    """
+
+    def __init__(self, interrupt_flag=None, interrupt_after=None):
+        self.progress = []
+        self.interrupt_flag = interrupt_flag
+        self.interrupt_after = interrupt_after
+
+    def emit(self, progress):
+        self.progress.append(progress)
+        if len(self.progress) == self.interrupt_after:
+            self.interrupt_flag.set()
+
+
+def create_images():
+    """
+    Create a smooth fixed image of an ellipsoid with a brighter box inside,
+    and a moving image of it rotated and shifted.
+    """
+    z, y, x = np.mgrid[:40, :96, :96]
+    volume = np.where(((x - 48) ** 2 + (y - 50) ** 2) / 30 ** 2
+                      + ((z - 20) / 12) ** 2 < 1, 0, -1000)
+    volume[10:30, 40:60, 30:40] += 500
+    fixed = sitk.SmoothingRecursiveGaussian(
+        sitk.GetImageFromArray(volume.astype(np.float32)), 3)
+    fixed.SetSpacing((1, 1, 2.5))
+    transform = sitk.Euler3DTransform((48, 50, 50), 0, 0, 0.05, (4, -3, 2))
+    moving = sitk.Resample(fixed, fixed, transform, sitk.sitkLinear, -1000)
+    return fixed, moving
+
+
+def test_get_pyramid_schedule():
+    # Levels are ordered from coarse to fine
+    assert ImageRegistration.get_pyramid_schedule(
+        (512, 512, 100), [1, 8, 2], [0, 4, 2]) == ([8, 2, 1], [4, 2, 0])
+    # No axis is shrunk below 4 voxels, and levels are not repeated
+    assert ImageRegistration.get_pyramid_schedule(
+        (512, 512, 10), [8, 4, 1], [4, 2, 0]) == ([2, 1], [4, 0])
+
+
+def test_get_sampling_percentages():
+    percentages = ImageRegistration.get_sampling_percentages(
+        (512, 512, 200), [8, 2, 1], 0.25)
+    assert percentages[0] == 0.25
+    # Fine levels sample at most the same number of voxels
+    assert np.isclose(percentages[2] * 512 * 512 * 200,
+                      ImageRegistration.REGISTRATION_MAX_METRIC_SAMPLES)
+
+
+def test_register_images():
+    fixed, moving = create_images()
+    settings = dict(ImageRegistration.DEFAULT_REGISTRATION_SETTINGS)
+    progress_callback = ProgressCallback()
+    registered_image, transform = ImageRegistration.register_images(
+        fixed, moving, settings, progress_callback, threading.Event(),
+        (50, 100))
+
+    fixed_array = sitk.GetArrayFromImage(fixed)
+    error = np.abs(sitk.GetArrayFromImage(registered_image) - fixed_array)
+    initial_error = np.abs(sitk.GetArrayFromImage(moving) - fixed_array)
+    assert error.mean() < initial_error.mean() / 5
+    assert transform.GetNumberOfTransforms() == 2
+
+    assert len(progress_callback.progress) > 2
+    values = [value for text, value in progress_callback.progress]
+    assert values == sorted(values)
+    assert values[0] >= 50 and values[-1] == 100
+
+
+def test_register_images_interrupted():
+    fixed, moving = create_images()
+    settings = dict(ImageRegistration.DEFAULT_REGISTRATION_SETTINGS)
+    interrupt_flag = threading.Event()
+    progress_callback = ProgressCallback(interrupt_flag, 3)
+    assert ImageRegistration.register_images(
+        fixed, moving, settings, progress_callback, interrupt_flag) is None
+    # The registration stops at the next iteration
+    assert len(progress_callback.progress) == 3
+
+
+def test_transform_cache():
+    settings = dict(ImageRegistration.DEFAULT_REGISTRATION_SETTINGS)
+    key = ImageRegistration.get_transform_cache_key("1.2", "1.3", settings)
+    # Settings which do not change the transform share the key
+    settings["number_of_threads"] = 2
+    assert ImageRegistration.get_transform_cache_key(
+        "1.2", "1.3", settings) == key
+    settings["shrink_factors"] = [4]
+    assert ImageRegistration.get_transform_cache_key(
+        "1.2", "1.3", settings) != key
+    assert ImageRegistration.get_transform_cache_key(
+        "1.3", "1.2", ImageRegistration.DEFAULT_REGISTRATION_SETTINGS) != key
+
+    versor = sitk.VersorRigid3DTransform()
+    versor.SetParameters((0.01, 0.02, 0.03, 1.5, -2, 3))
+    transform = sitk.CompositeTransform(
+        [sitk.Euler3DTransform((1, 2, 3), 0, 0, 0, (4, 5, 6)), versor])
+    path = ImageRegistration.get_transform_cache_path(key)
+    try:
+        assert ImageRegistration.load_cached_transform(key) is None
+        ImageRegistration.save_cached_transform(key, transform)
+        cached = ImageRegistration.load_cached_transform(key)
+        assert cached.GetNumberOfTransforms() == 2
+        assert cached.GetNthTransform(1).GetParameters() \
+            == versor.GetParameters()
+    finally:
+        if path.exists():
+            path.unlink()
@@ -0,0 +1,111 @@
+import threading
+
+import numpy as np
+
+import dataset_builders
+from src.Model import Isodose
+
+
+def create_rtdose():
+    """
+    Create an RT Dose of 3 planes of 20 x 20 voxels at z = 0, 2 and 4, with
+    a dose in a box over rows 5 to 14 and columns 5 to 14 of every plane of
+    10 Gy, and of 20 Gy on the last plane.
+    """
+    dose = np.zeros((3, 20, 20), dtype=np.uint32)
+    dose[:, 5:15, 5:15] = 10000
+    dose[2, 5:15, 5:15] = 20000
+    return dataset_builders.create_rtdose(dose, [2, 2], [0, 2, 4])
+
+
+def test_dose_volume():
+    rtdose = create_rtdose()
+    slices = [("1", -3), ("2", 0.2), ("3", 3), ("4", 3.8), ("5", 7)]
+    dose_volume = Isodose.DoseVolume(rtdose, slices)
+
+    # Slices inside the dose grid match get_dose_grid(..)
+    for uid, z in slices[1:4]:
+        assert np.allclose(dose_volume.dose_at_slice(uid),
+                           Isodose.get_dose_grid(rtdose, z))
+    assert dose_volume.dose_at_slice("3")[10, 10] == 15000
+    assert len(dose_volume.dose_at_slice("1")) == 0
+    assert len(dose_volume.dose_at_slice("5")) == 0
+
+    # Image pixels are twice the size of dose voxels, and the dose grid
+    # starts at image pixel 4
+    dose_pixluts = (np.arange(20) * 2 + 4, np.arange(20) * 2 + 4)
+    image_dose = dose_volume.dose_at_image_slice("2", dose_pixluts, 50, 50)
+    assert image_dose.shape == (50, 50)
+    assert image_dose[24, 24] == 10000
+    assert image_dose[12, 24] == 0
+    assert image_dose[2, 2] == 0
+    assert image_dose[45, 45] == 0
+
+
+def test_calc_isodose_cache():
+    rtdose = create_rtdose()
+    # Image pixels are twice the size of dose voxels
+    dose_pixluts = (np.arange(20) * 2, np.arange(20) * 2)
+    slices = [("1", 0), ("2", 2), ("3", 4)]
+    dose_volume = Isodose.DoseVolume(rtdose, slices)
+    dict_dose_pixluts = {uid: dose_pixluts for uid, z in slices}
+
+    # 50% and 100% of a 10 Gy prescription
+    isodose_cache = Isodose.calc_isodose_cache(
+        {}, dose_volume, dict_dose_pixluts, [50, 100], 1000)
+    assert len(isodose_cache) == 6
+    polygons = isodose_cache[("2", 50, 1000)]
+    assert len(polygons) == 1
+    rect = polygons[0].boundingRect()
+    assert 8 <= rect.left() <= 10 and 28 <= rect.right() <= 30
+
+    # Only the levels which are not cached are calculated, and a new
+    # prescription dose does not reuse the old levels
+    slice_isodoses = Isodose.get_isodose_polygons(
+        isodose_cache, "2", dose_volume, dose_pixluts, [50, 100], 1000)
+    assert slice_isodoses[50] is polygons
+    Isodose.get_isodose_polygons(isodose_cache, "2", dose_volume,
+                                 dose_pixluts, [75], 2000)
+    assert len(isodose_cache) == 7
+    # 75% of 20 Gy is not reached on the second plane
+    assert isodose_cache[("2", 75, 2000)] == []
+
+
+def test_calc_isodose_cache_interrupted():
+    interrupt_flag = threading.Event()
+    interrupt_flag.set()
+    dose_volume = Isodose.DoseVolume(create_rtdose(), [("1", 0)])
+    isodose_cache = Isodose.calc_isodose_cache(
+        {}, dose_volume, {}, [50], 1000, interrupt_flag)
+    assert isodose_cache == {}
+
+
+def test_reslice_isodose_polygons():
+    rtdose = create_rtdose()
+    dose_volume = Isodose.DoseVolume(
+        rtdose, [("1", -2), ("2", 0), ("3", 2), ("4", 4), ("5", 6)])
+    # Image pixels are twice the size of dose voxels
+    dose_pixluts = (np.arange(20) * 2, np.arange(20) * 2)
+
+    # The 10 Gy box spans dose columns 5 to 14, i.e. image x 10 to 28, and
+    # the image slices 1 to 3 inside the dose grid
+    isodose_cache = {}
+    slice_isodoses = Isodose.get_reslice_isodose_polygons(
+        isodose_cache, "coronal", 20, dose_volume, dose_pixluts, [50], 1000)
+    assert len(slice_isodoses[50]) == 1
+    rect = slice_isodoses[50][0].boundingRect()
+    assert 8 <= rect.left() <= 10 and 28 <= rect.right() <= 30
+    assert 0 <= rect.top() <= 1 and 3 <= rect.bottom() <= 4
+    assert ("coronal", 20, 50, 1000) in isodose_cache
+
+    # The slice positions are scaled by the aspect ratio
+    slice_isodoses = Isodose.get_reslice_isodose_polygons(
+        isodose_cache, "sagittal", 20, dose_volume, dose_pixluts, [50], 1000,
+        2)
+    rect = slice_isodoses[50][0].boundingRect()
+    assert 0 <= rect.top() <= 2 and 6 <= rect.bottom() <= 8
+
+    # Image rows outside the dose grid have no isodoses
+    slice_isodoses = Isodose.get_reslice_isodose_polygons(
+        isodose_cache, "coronal", 45, dose_volume, dose_pixluts, [50], 1000)
+    assert slice_isodoses[50] == []
@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+
+import dataset_builders
+from dataset_builders import create_contour
+from src.Model import NativeDVH
+
+
+def create_rtdose():
+    """
+    Create an RT Dose of 5 planes of 40 x 40 voxels of 2 x 2.5 mm, where
+    the dose of a voxel is 2 Gy times its column.
+    """
+    dose = np.broadcast_to(np.arange(40) * 2000, (5, 40, 40))
+    return dataset_builders.create_rtdose(dose, [2.5, 2], [0, 2, 4, 6, 8])
+
+
+def create_rtss():
+    """
+    Create an RT Struct with a box ROI over columns 5 to 9 and rows 4 to 11
+    of the planes at z = 2, 4 and 6, and an ROI with a hole.
+    """
+    box = [[9.1, 9.1], [18.9, 9.1], [18.9, 28.9], [9.1, 28.9]]
+    hole = [[11.1, 11.6], [16.9, 11.6], [16.9, 26.4], [11.1, 26.4]]
+    return dataset_builders.create_rtss([
+        (1, "BOX", [create_contour(box, z) for z in (2, 4, 6)]),
+        (2, "RING", [create_contour(box, 4), create_contour(hole, 4)])])
+
+
+def test_fill_polygons():
+    square = np.array([[0.5, 0.5], [3.5, 0.5], [3.5, 3.5], [0.5, 3.5]])
+    mask = NativeDVH.fill_polygons((5, 5), [square])
+    assert mask.sum() == 9
+    assert mask[1:4, 1:4].all()
+
+    # Overlapping polygons leave a hole
+    hole = np.array([[1.5, 1.5], [2.5, 1.5], [2.5, 2.5], [1.5, 2.5]])
+    mask = NativeDVH.fill_polygons((5, 5), [square, hole])
+    assert mask.sum() == 8
+    assert not mask[2, 2]
+
+
+def test_calc_dvhs():
+    rois = {1: {'name': "BOX"}, 2: {'name': "RING"}}
+    dict_dvh = NativeDVH.calc_dvhs(create_rtss(), create_rtdose(), rois, {})
+
+    # 5 columns x 8 rows x 3 planes of 2 x 2.5 x 2 mm voxels
+    box = dict_dvh[1]
+    assert box.name == "BOX"
+    assert np.isclose(box.volume, 120 * 10 / 1000)
+    assert np.isclose(box.mean, 14, atol=0.01)
+    assert np.isclose(box.max, 18, atol=0.01)
+
+    # The hole removes 3 columns x 6 rows, and a single plane of the ROI
+    # has no thickness unless one is given
+    dict_dvh = NativeDVH.calc_dvhs(create_rtss(), create_rtdose(), rois,
+                                   {2: 2})
+    ring = dict_dvh[2]
+    assert np.isclose(ring.volume, (40 - 18) * 10 / 1000)
+    assert np.isclose(ring.mean, 14, atol=0.01)
+
+
+def test_calc_dvhs_interrupted():
+    interrupt_flag = threading.Event()
+    interrupt_flag.set()
+    assert NativeDVH.calc_dvhs(create_rtss(), create_rtdose(),
+                               {1: {'name': "BOX"}}, {},
+                               interrupt_flag) is None
+
+
+def test_multi_calc_dvhs():
+    rois = {1: {'name': "BOX"}, 2: {'name': "RING"}}
+    expected = NativeDVH.calc_dvhs(create_rtss(), create_rtdose(), rois,
+                                   {2: 2})
+    dict_dvh = NativeDVH.multi_calc_dvhs(create_rtss(), create_rtdose(),
+                                         rois, {2: 2}, max_workers=2,
+                                         chunk_size=1)
+    assert list(dict_dvh) == [1, 2]
+    for roi in rois:
+        assert dict_dvh[roi].name == expected[roi].name
+        assert np.isclose(dict_dvh[roi].volume, expected[roi].volume)
+        assert np.allclose(dict_dvh[roi].counts, expected[roi].counts)
+
+
+def test_multi_calc_dvhs_interrupted():
+    interrupt_flag = threading.Event()
+    interrupt_flag.set()
+    rois = {1: {'name': "BOX"}, 2: {'name': "RING"}}
+    assert NativeDVH.multi_calc_dvhs(create_rtss(), create_rtdose(), rois,
+                                     {}, interrupt_flag,
+                                     max_workers=2) is None
@@ -0,0 +1,94 @@
+import numpy as np
+import SimpleITK as sitk
+from pydicom.dataset import Dataset
+
+import dataset_builders
+from dataset_builders import create_contour
+from src.Model import Radiomics
+from src.Model.CalculateImages import convert_raw_data
+
+
+def create_image_slices():
+    """
+    Create 4 CT slices of 10 x 12 pixels of 2 x 1 mm, 2.5 mm apart,
+    where the value of a pixel is its index plus the slice number.
+    """
+    datasets = {}
+    for slice_id in range(4):
+        image_slice = Dataset()
+        image_slice.SOPInstanceUID = "1." + str(slice_id)
+        image_slice.ImagePositionPatient = [-10, -20, 5 + 2.5 * slice_id]
+        image_slice.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        image_slice.PixelSpacing = [2, 1]
+        image_slice.Rows = 10
+        image_slice.Columns = 12
+        image_slice.SamplesPerPixel = 1
+        image_slice.PhotometricInterpretation = "MONOCHROME2"
+        image_slice.BitsAllocated = 16
+        image_slice.BitsStored = 16
+        image_slice.HighBit = 15
+        image_slice.PixelRepresentation = 0
+        image_slice.RescaleSlope = 1
+        image_slice.RescaleIntercept = -1024
+        image_slice.PixelData = (np.arange(120, dtype=np.uint16)
+                                 + slice_id).tobytes()
+        image_slice.file_meta = Dataset()
+        image_slice.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+        datasets[slice_id] = image_slice
+    datasets['rtss'] = Dataset()
+    return datasets
+
+
+def create_rtss():
+    """
+    Create an RT Struct with a box ROI over columns 3 to 6 and rows 3 to 5
+    of slices 1 and 2, and an ROI outside the image.
+    """
+    box = [[-7.5, -15], [-3.5, -15], [-3.5, -9], [-7.5, -9]]
+    return dataset_builders.create_rtss([
+        (1, "BOX", [create_contour(box, z, slice_uid) for z, slice_uid
+                    in ((7.5, "1.1"), (10, "1.2"))]),
+        (2, "OUTSIDE", [create_contour([[50, 50], [60, 50], [60, 60]], 7.5,
+                                       "1.1")])])
+
+
+def test_create_image():
+    image_slices = Radiomics.get_image_slices(create_image_slices())
+    assert len(image_slices) == 4
+    image = Radiomics.create_image(image_slices)
+    assert image.GetSize() == (12, 10, 4)
+    assert np.allclose(image.GetSpacing(), (1, 2, 2.5))
+    assert np.allclose(image.GetOrigin(), (-10, -20, 5))
+    # Pixel values are rescaled
+    volume = sitk.GetArrayFromImage(image)
+    assert volume[2, 3, 4] == 3 * 12 + 4 + 2 - 1024
+
+
+def test_create_image_scaled():
+    # Pixel arrays rescaled on loading, with the CT shift for CT images
+    for slope, intercept, is_ct in ((1, -1000, True), (2, -1024, True),
+                                    (1.5, 0, False), (1, -1000.5, True)):
+        datasets = create_image_slices()
+        for key in range(4):
+            datasets[key].RescaleSlope = slope
+            datasets[key].RescaleIntercept = intercept
+        convert_raw_data(datasets, False, is_ct)
+        image = Radiomics.create_image(
+            Radiomics.get_image_slices(datasets), True, is_ct)
+        volume = sitk.GetArrayFromImage(image)
+        assert np.isclose(volume[2, 3, 4], (3 * 12 + 4 + 2) * slope
+                          + intercept)
+
+
+def test_create_roi_masks():
+    image_slices = Radiomics.get_image_slices(create_image_slices())
+    image = Radiomics.create_image(image_slices)
+    roi_masks = Radiomics.create_roi_masks(image, image_slices, create_rtss())
+
+    # ROIs which do not cover any voxel are left out
+    assert list(roi_masks) == ["BOX"]
+    mask = roi_masks["BOX"]
+    assert mask.GetOrigin() == image.GetOrigin()
+    voxels = sitk.GetArrayFromImage(mask)
+    assert voxels.sum() == 2 * 3 * 4
+    assert voxels[1:3, 3:6, 3:7].all()
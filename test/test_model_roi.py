@@ -13,7 +13,9 @@ from pydicom.tag import Tag
 
 from src.Model import ImageLoading
 from src.Model.PatientDictContainer import PatientDictContainer
-from src.Model.ROI import add_to_roi, calculate_matrix, create_roi, roi_to_geometry, \
+from src.Model.ROI import add_to_roi, calculate_matrix, create_roi, create_rois, roi_to_geometry, \
+    calculate_pixels, calculate_pixels_of_contours, transform_rois_contours, \
+    pixel_to_rcs, pixels_to_rcs, \
     get_roi_contour_pixel, manipulate_rois, geometry_to_roi, create_initial_rtss_from_ct
 
 
@@ -102,6 +104,71 @@ def test_calculate_matrix():
     assert np.all(array_y == np.array([0, 1, 2, 3]))
 
 
+def test_get_pixluts_shared_geometry():
+    read_data_dict = {}
+    for i, z in enumerate([0, 2.5]):
+        image_ds = dataset.Dataset()
+        image_ds.SOPInstanceUID = "1.2.3.%s" % i
+        image_ds.PixelSpacing = [0.5, 2]
+        image_ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        image_ds.ImagePositionPatient = [-10, 5, z]
+        image_ds.Rows = 3
+        image_ds.Columns = 2
+        read_data_dict[i] = image_ds
+    dict_pixluts = ImageLoading.get_pixluts(read_data_dict)
+
+    # Slices at different z positions share the same lookup tables
+    assert dict_pixluts["1.2.3.0"] is dict_pixluts["1.2.3.1"]
+    array_x, array_y = dict_pixluts["1.2.3.0"]
+    assert np.allclose(array_x, [-10, -9.5])
+    assert np.allclose(array_y, [5, 7, 9])
+
+
+def test_calculate_pixels():
+    pixlut = (np.array([0., 1., 2., 3.]), np.array([0., 1., 2., 3.]))
+    contour = [1, 1.5, 0, 2.5, 3, 0, 5, -1, 0]
+    assert calculate_pixels(pixlut, contour) == [[2, 2], [3, 0], [0, 0]]
+    assert calculate_pixels(pixlut, contour, feetfirst=True) == \
+        [[1, 2], [3, 0], [0, 0]]
+    assert calculate_pixels(pixlut, contour, prone=True) == \
+        [[1, 2], [3, 3], [0, 0]]
+
+    # All contours of a slice are converted in one pass
+    contours = [contour, contour[:3]]
+    assert calculate_pixels_of_contours(pixlut, contours) == \
+        [[[2, 2], [3, 0], [0, 0]], [[2, 2]]]
+
+
+def test_pixels_to_rcs():
+    pixlut = (list(np.linspace(-250, 250, 512)),
+              list(np.linspace(-200, 300, 512)))
+    points = np.random.default_rng(0).uniform(0, 511, (100, 2))
+    points[0] = [2.5, 3.5]
+
+    expected = []
+    for x, y in points:
+        rcs = pixel_to_rcs(pixlut, round(x), round(y))
+        expected += [rcs[0], rcs[1], -12.5]
+    assert pixels_to_rcs(pixlut, points, -12.5) == expected
+    assert pixels_to_rcs(pixlut, [], -12.5) == []
+
+
+def test_transform_rois_contours():
+    patient_dict_container = PatientDictContainer()
+    patient_dict_container.clear()
+    patient_dict_container.set_initial_values(
+        None, None, None, dict_uid={0: "1.1", 1: "1.2", 2: "1.3"})
+    square = [[2, 3], [6, 3], [6, 7], [2, 7]]
+    coronal, sagittal = transform_rois_contours(
+        {"ROI": {"1.1": [square], "1.2": [square], "1.3": []}})
+
+    # One outline per row / column of the square, spanning both slices
+    assert sorted(coronal["ROI"].keys()) == [3, 4, 5, 6, 7]
+    assert sorted(sagittal["ROI"].keys()) == [2, 3, 4, 5, 6]
+    assert coronal["ROI"][3] == [[[2, 0], [2, 1], [6, 1], [6, 0]]]
+    assert sagittal["ROI"][2] == [[[3, 0], [3, 1], [7, 1], [7, 0]]]
+
+
 def test_add_to_roi():
     rt_ss = dataset.Dataset()
 
@@ -184,6 +251,47 @@ def test_create_roi():
     assert (rt_ss.RTROIObservationsSequence[0].RTROIInterpretedType == "ORGAN")
 
 
+def test_create_rois():
+    rt_ss = dataset.Dataset()
+    rt_ss.StructureSetROISequence = []
+    rt_ss.ROIContourSequence = []
+    rt_ss.RTROIObservationsSequence = []
+
+    image_ds = dataset.Dataset()
+    image_ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+    image_ds.SOPInstanceUID = "1.2.3.4.5.6.7.8.9"
+    image_ds.FrameOfReferenceUID = "1.2.3"
+    # a closed right triangle
+    closed = [0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0]
+    # an open right triangle
+    opened = [0, 0, 0, 0, 1, 0, 1, 0, 0]
+
+    updated_rtss = create_rois(rt_ss, {
+        "FirstROI": [{'coords': closed, 'ds': image_ds}] * 3,
+        "SecondROI": [{'coords': opened, 'ds': image_ds}],
+        "EmptyROI": []}, "DOSE_REGION")
+    # Contours of an existing ROI are added to it
+    updated_rtss = create_rois(updated_rtss, {
+        "FirstROI": [{'coords': opened, 'ds': image_ds}]})
+
+    assert [roi.ROIName for roi in updated_rtss.StructureSetROISequence] \
+        == ["FirstROI", "SecondROI"]
+    assert [roi.ROINumber for roi in updated_rtss.StructureSetROISequence] \
+        == [1, 2]
+    first_contours = updated_rtss.ROIContourSequence[0].ContourSequence
+    assert [contour.ContourNumber for contour in first_contours] \
+        == [1, 2, 3, 4]
+    assert first_contours[2].ContourGeometricType == "CLOSED_PLANAR"
+    assert first_contours[2].NumberOfContourPoints == 3
+    assert first_contours[3].ContourGeometricType == "OPEN_PLANAR"
+    second_contours = updated_rtss.ROIContourSequence[1].ContourSequence
+    assert second_contours[0].ContourImageSequence[0]\
+        .ReferencedSOPInstanceUID == image_ds.SOPInstanceUID
+    assert updated_rtss.ROIContourSequence[1].ReferencedROINumber == 2
+    assert updated_rtss.RTROIObservationsSequence[1].RTROIInterpretedType \
+        == "DOSE_REGION"
+
+
 def test_roi_to_geometry(test_object):
     roi_names = [roi['name']
                  for roi in test_object.
@@ -0,0 +1,125 @@
+import numpy as np
+import SimpleITK as sitk
+
+import dataset_builders
+from dataset_builders import create_contour
+from src.Model import ROITransfer
+
+
+def create_image():
+    """
+    Create an image of 6 slices of 20 x 16 pixels, with a +z direction as
+    read from a series sorted by descending slice location.
+    """
+    image = sitk.Image(16, 20, 6, sitk.sitkInt16)
+    image.SetSpacing((1, 2, 3))
+    image.SetOrigin((10, 20, 30))
+    return image
+
+
+def create_rtss(count):
+    """
+    Create an RT Struct with overlapping boxes, where box i covers rows i to
+    i + 5 and columns 4 to 9 of slices 1 to 3, an ROI without contours
+    and an ROI with bad contours.
+    """
+    rois = []
+    for number in range(count):
+        points = [[14, 20 + 2 * number], [19, 20 + 2 * number],
+                  [19, 30 + 2 * number], [14, 30 + 2 * number]]
+        rois.append((number + 1, "BOX " + str(number),
+                     [create_contour(points, z) for z in (33, 36, 39)]))
+
+    # A contour across slices, one above and one below the image, and one
+    # on slice 4
+    points = [[14, 24], [19, 24], [19, 30]]
+    bad_contours = [create_contour(points, z) for z in (33, 60, 27, 42)]
+    bad_contours[0].ContourData[-1] = 36
+    rois.append((count + 1, "EMPTY", None))
+    rois.append((count + 2, "BAD", bad_contours))
+    return dataset_builders.create_rtss(rois)
+
+
+def test_physical_points_to_index():
+    image = create_image()
+    # Points half way between voxels are rounded up
+    points = np.array([[12.5, 27, 25.5], [9.5, 20, 43.5]])
+    assert np.array_equal(
+        ROITransfer.physical_points_to_index(image, points),
+        [[3, 4, -1], [0, 0, 5]])
+
+    image.SetDirection(
+        sitk.Euler3DTransform((0, 0, 0), 0.1, 0.2, 0.3).GetMatrix())
+    points = np.random.default_rng(0).uniform(-10, 60, (200, 3))
+    expected = [image.TransformPhysicalPointToIndex(point)
+                for point in points]
+    assert np.array_equal(
+        ROITransfer.physical_points_to_index(image, points), expected)
+
+
+def test_transform_point_set_from_dicom_struct(caplog):
+    image = create_image()
+    names = ["BOX_" + str(number) for number in range(10)]
+    roi_labels, roi_names = \
+        ROITransfer.transform_point_set_from_dicom_struct(
+            image, create_rtss(10), names + ["EMPTY", "BAD"])
+    # ROIs without contours are left out, and more ROIs than bits in one
+    # label component share the labels
+    assert roi_names == names + ["BAD"]
+    assert roi_labels.GetNumberOfComponentsPerPixel() == 2
+    assert roi_labels.GetOrigin() == image.GetOrigin()
+
+    labels = ROITransfer.resample_roi_labels(roi_labels, sitk.Transform(),
+                                             image)
+    assert labels.shape == (6, 20, 16, 2)
+    for roi_index in range(10):
+        mask = ROITransfer.get_roi_mask(labels, roi_index)
+        assert mask.sum() == 3 * 6 * 6
+        assert mask[1:4, roi_index:roi_index + 6, 4:10].all()
+
+    # Only the contour on slice 4 is kept from the bad ROI
+    mask = ROITransfer.get_roi_mask(labels, 10)
+    assert mask.any(axis=(1, 2)).tolist() == [False] * 4 + [True, False]
+    assert len(caplog.records) == 3
+    assert "Slice index -1 of structure BAD" in caplog.text
+
+    assert ROITransfer.transform_point_set_from_dicom_struct(
+        image, create_rtss(1), ["EMPTY"]) == (None, [])
+
+
+def test_resample_roi_labels():
+    image = create_image()
+    roi_labels, roi_names = \
+        ROITransfer.transform_point_set_from_dicom_struct(
+            image, create_rtss(3), ["BOX_0", "BOX_1", "BOX_2"])
+    transform = sitk.TranslationTransform(3, (1.2, -2, 3))
+    labels = ROITransfer.resample_roi_labels(roi_labels, transform, image)
+    identity = ROITransfer.resample_roi_labels(roi_labels, sitk.Transform(),
+                                               image)
+    # Each ROI is the same as resampling its mask on its own
+    for roi_index in range(len(roi_names)):
+        roi_mask = sitk.GetImageFromArray(
+            ROITransfer.get_roi_mask(identity, roi_index).astype(np.uint8))
+        roi_mask.CopyInformation(image)
+        expected = sitk.Resample(roi_mask, image, transform,
+                                 sitk.sitkNearestNeighbor, 0)
+        assert np.array_equal(ROITransfer.get_roi_mask(labels, roi_index),
+                              sitk.GetArrayFromImage(expected) > 0)
+
+
+def test_calc_mask_contours():
+    mask = np.zeros((3, 8, 8), dtype=bool)
+    mask[1, 2:5, 3:6] = True
+    # Masks touching the edge of the slice have closed contours on it
+    mask[2, :3, :] = True
+    slice_contours = ROITransfer.calc_mask_contours(mask)
+    assert list(slice_contours) == [1, 2]
+
+    contour = slice_contours[1][0]
+    assert np.array_equal(contour[0], contour[-1])
+    assert contour[:, 0].min() == 1.5 and contour[:, 0].max() == 4.5
+    assert contour[:, 1].min() == 2.5 and contour[:, 1].max() == 5.5
+
+    contour = slice_contours[2][0]
+    assert np.array_equal(contour[0], contour[-1])
+    assert contour[:, 1].min() == 0 and contour[:, 1].max() == 7
@@ -1,8 +1,9 @@
 import os
+import threading
 import numpy
 import pytest
 
-from src.Model.SUV2ROI import SUV2ROI
+from src.Model.SUV2ROI import SUV2ROI, calc_suv_contours
 from src.Model.PatientDictContainer import PatientDictContainer
 from src.Model import ImageLoading
 
@@ -198,3 +199,35 @@ def test_generate_roi_from_suv(test_object):
     # Assert ROI points exist
     assert len(single_array) == 15
     assert len(single_array) == 3 * len(contours)
+
+
+def test_calc_suv_contours():
+    """
+    Test contouring an SUV volume at many SUV levels, with and without
+    worker processes.
+    """
+    suv_volume = numpy.zeros((4, 10, 10), dtype=numpy.float32)
+    suv_volume[1, 2:8, 2:8] = 3.5
+    suv_volume[2, 4:6, 4:6] = 1.5
+
+    slice_contours = calc_suv_contours(suv_volume, [1, 2, 3, 4],
+                                       max_workers=1)
+    assert len(slice_contours) == 4
+    assert slice_contours[0] == {}
+    # Only levels below the maximum SUV of a slice are contoured
+    assert sorted(slice_contours[1]) == [1, 2, 3]
+    assert sorted(slice_contours[2]) == [1]
+    assert len(slice_contours[1][3]) == 1
+
+    parallel_contours = calc_suv_contours(suv_volume, [1, 2, 3, 4],
+                                          max_workers=2, chunk_size=1)
+    assert [sorted(contours) for contours in parallel_contours] == \
+        [sorted(contours) for contours in slice_contours]
+    assert numpy.array_equal(parallel_contours[1][3][0],
+                             slice_contours[1][3][0])
+
+    # Interrupted contouring stops without waiting for every chunk
+    interrupt_flag = threading.Event()
+    interrupt_flag.set()
+    assert calc_suv_contours(suv_volume, [1, 2, 3, 4], interrupt_flag,
+                             max_workers=2, chunk_size=1) is None
@@ -32,18 +32,23 @@ def get_dicom_files(directory):
     return dicom_files
 
 
-def recursive_search(dict_tree, parent):
+def recursive_search(dict_tree, parent, dicom_tree):
     """
     Recursive Function to test all rows match the data from the dictionary
     :param dict_tree: The dictionary to be compared to
     :param parent: Parent node of the DICOM Tree
+    :param dicom_tree: The DICOM Tree view, which adds the rows of a
+        sequence node when it is expanded
     """
     count = 0  # Keep track of rows
     for key in dict_tree:
         value = dict_tree[key]  # get value from dict tree
         if isinstance(value, type(dict_tree)):  # if dict_tree object in row
             child = parent.child(count)
-            recursive_search(value, child)
+            assert child.text() == key
+            dicom_tree.expand_node(child.index())
+            assert child.rowCount() == len(value)
+            recursive_search(value, child, dicom_tree)
         else:
             # Check row matches
             assert parent.child(count, 0).text() == key
@@ -125,34 +130,32 @@ def test_file_components(test_obj):
         current_text = test_obj.dicom_tree.selector.currentText()
 
         # Make New Tree to compare
+        container = test_obj.dicom_tree.patient_dict_container
         if i > len(test_obj.dicom_tree.special_files):
             index = i - len(test_obj.dicom_tree.special_files) - 1
-            name = test_obj.dicom_tree.patient_dict_container.filepaths[index]
-            dicom_tree_slice = DicomTree(name)
-            dict_tree = dicom_tree_slice.dict
+            dataset = container.dataset[index]
             text = "Image Slice " + str(index + 1)
             assert current_text == text
 
         elif test_obj.dicom_tree.special_files[i - 1] == "rtss":
-            dict_tree = test_obj.dicom_tree.patient_dict_container.get(
-                "dict_dicom_tree_rtss")
+            dataset = container.get("dataset_rtss")
             assert current_text == "RT Structure Set"
 
         elif test_obj.dicom_tree.special_files[i - 1] == "rtdose":
-            dict_tree = test_obj.dicom_tree.patient_dict_container.get(
-                "dict_dicom_tree_rtdose")
+            dataset = container.dataset["rtdose"]
             assert current_text == "RT Dose"
 
         elif test_obj.dicom_tree.special_files[i - 1] == "rtplan":
-            dict_tree = test_obj.dicom_tree.patient_dict_container.get(
-                "dict_dicom_tree_rtplan")
+            dataset = container.dataset["rtplan"]
             assert current_text == "RT Plan"
 
         else:
-            dict_tree = None
+            dataset = None
             print("Error filename in update_tree function")
+        dict_tree = DicomTree(None).dataset_to_dict(dataset)
 
         # Loop Through Each Row
         parent = test_obj.dicom_tree.model_tree.invisibleRootItem()
         total_count = test_obj.dicom_tree.model_tree.rowCount()
-        assert recursive_search(dict_tree, parent) == total_count
+        assert recursive_search(dict_tree, parent, test_obj.dicom_tree) \
+            == total_count
@@ -11,7 +11,7 @@ from pydicom import dcmread
 from pydicom.errors import InvalidDicomError
 
 from src.Controller.GUIController import MainWindow
-from src.Model import ImageLoading
+from src.Model import ImageLoading, NativeDVH
 from src.Model.PatientDictContainer import PatientDictContainer
 
 
@@ -72,7 +72,7 @@ class TestDVHTab:
         self.main_window = MainWindow()
         self.dvh_tab = self.main_window.dvh_tab
         self.new_polygons = {}
-        self.raw_dvh = ImageLoading.multi_calc_dvh(dataset_rtss, dataset_rtdose, self.rois, dict_thickness)
+        self.raw_dvh = NativeDVH.multi_calc_dvhs(dataset_rtss, dataset_rtdose, self.rois, dict_thickness)
         self.dvh_x_y = ImageLoading.converge_to_0_dvh(self.raw_dvh)
 
 
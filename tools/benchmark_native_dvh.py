@@ -0,0 +1,72 @@
+"""
+Benchmark of the native DVH calculation against dicompyler.
+
+Calculates the DVHs of every ROI of an RT Struct with both
+NativeDVH.calc_dvhs(..) and dicompylercore.dvhcalc.get_dvh(..), and prints
+the time taken by each and the differences between the DVHs.
+
+Usage, from the root of the repository:
+    PYTHONPATH=. python tools/benchmark_native_dvh.py rtss.dcm rtdose.dcm
+"""
+import sys
+import time
+
+import numpy as np
+from dicompylercore import dvhcalc
+from pydicom import dcmread
+
+from src.Model import ImageLoading, NativeDVH
+
+
+def benchmark(rtss_path, rtdose_path):
+    """
+    :param rtss_path: Path of the RT Struct file.
+    :param rtdose_path: Path of the RT Dose file.
+    """
+    dataset_rtss = dcmread(rtss_path)
+    dataset_rtdose = dcmread(rtdose_path)
+    rois = ImageLoading.get_roi_info(dataset_rtss)
+
+    start = time.perf_counter()
+    dicompyler_dvhs = {roi: dvhcalc.get_dvh(dataset_rtss, dataset_rtdose, roi)
+                       for roi in rois}
+    dicompyler_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    native_dvhs = NativeDVH.calc_dvhs(dataset_rtss, dataset_rtdose, rois, {})
+    native_time = time.perf_counter() - start
+
+    print("%-24s %12s %12s %12s %12s" % ("ROI", "volume cm3", "d volume",
+                                         "mean Gy", "d mean"))
+    max_count_difference = 0
+    for roi in rois:
+        dicompyler_dvh = dicompyler_dvhs[roi]
+        native_dvh = native_dvhs[roi]
+        size = max(dicompyler_dvh.counts.size, native_dvh.counts.size)
+        difference = np.abs(
+            np.pad(dicompyler_dvh.counts,
+                   (0, size - dicompyler_dvh.counts.size))
+            - np.pad(native_dvh.counts, (0, size - native_dvh.counts.size)))
+        if dicompyler_dvh.volume:
+            max_count_difference = max(
+                max_count_difference,
+                difference.max() / dicompyler_dvh.volume)
+        print("%-24s %12.3f %12.3g %12.3f %12.3g" % (
+            rois[roi]['name'][:24], dicompyler_dvh.volume,
+            native_dvh.volume - dicompyler_dvh.volume, dicompyler_dvh.mean,
+            native_dvh.mean - dicompyler_dvh.mean))
+
+    print()
+    print("ROIs: %s" % len(rois))
+    print("dicompyler: %.2f s" % dicompyler_time)
+    print("native: %.2f s (%.1fx)" % (native_time,
+                                      dicompyler_time / native_time))
+    print("Largest difference of a cumulative DVH: %.3g%% of the volume"
+          % (max_count_difference * 100))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    benchmark(sys.argv[1], sys.argv[2])